@@ -22,6 +22,8 @@ Usage:
     - Selecciona una fecha a través del calendario.
     - Selecciona y modifica trabajos en la lista.
     - Confirma los trabajos para aplicar los cambios.
+    - Con la variable de entorno CONTROLM_TRAZA=traza.json se guarda una traza de las etapas de la corrida, se abre con
+      chrome://tracing (ver controlm.traza).
 
 Version History:
     0.1 - Primera versión funcional con selección de fechas y jobs, y modificación básica de jobs.
@@ -50,6 +52,7 @@ import requests
 import re
 import tkinter as tk
 
+from controlm import traza
 from controlm.structures import ControlmFolder
 from tkinter import messagebox, filedialog, Checkbutton, BooleanVar
 from tkcalendar import DateEntry, Calendar
@@ -57,14 +60,31 @@ from datetime import datetime
 from datetime import timedelta
 from PIL import Image, ImageTk
 from controlm.structures import MallaMaxi
+from controlm.structures import ReglasAmbientacion
+from controlm.record import RecorderTmp
+from controlm.validaciones import tmp_enlaces, tmp_parametros
+from controlm.utils import AsignadorJobnames
 
 
 api_url = f'https://myapi-wine.vercel.app/'
 fechas_json = os.path.join('Sources','fechas_nolaborables.json')
+reglas_json = os.path.join('Sources','reglas_ambientacion.json')  # Opcional, pisa las reglas por defecto de ambientacion
+export_productivo_xml = os.path.join('Sources','export_productivo.xml')  # Opcional, export con las mallas productivas
+registro_jobnames = os.path.join('Sources','jobnames_temporales.txt')  # Jobnames ya asignados a temporales
 
 fechas_seleccionadas = []
+m_max = None
+carpetas_generadas = set()  # Temporales generadas en la sesion, no se reutilizan sus nombres
+jobnames_ocupados = None  # Jobnames que las temporales no pueden repetir, ver cargar_jobnames_ocupados
 selected_jobs_global = set()
 
+# Modos de generar la temporal: texto en la interfaz -> modo, ver modificar_malla
+MODOS_TEMPORAL = {
+    "Replicar por fecha": "replicar",
+    "Iterar de a una fecha": "iterar",
+    "Iterar fechas en paralelo": "iterar_concurrente",
+}
+
 REGEX_MAILS = r'[^@ \t\r\n]+@[^@ \t\r\n]+\.[^@ \t\r\n]+'
 REGEX_LEGAJO = r'^[A-Za-z]\d+$'
 
@@ -144,7 +164,30 @@ def obtener_fechas_optimizado(current_date, end_date, fechas_pross, fechas_manua
     # Por defecto, retornar todas las fechas en el rango
     return generar_dates(start_date =current_date, end_date=end_date)
 
-def modificar_malla(filename, mail_personal, start_date, end_date, selected_jobs, caso_de_uso, fechas_pross,legajo,var_force,fechas_manual=None):
+def cargar_jobnames_ocupados():
+    """
+    Junta los jobnames que las temporales no pueden repetir: los del export productivo (si está) y los asignados en
+    corridas anteriores (ver registro_jobnames). Se carga una sola vez por sesión
+    """
+    global jobnames_ocupados
+
+    if jobnames_ocupados is None:
+        asignador = AsignadorJobnames()
+        if os.path.exists(export_productivo_xml):
+            asignador.cargar_export(export_productivo_xml)
+        asignador.cargar_registro(registro_jobnames)
+        jobnames_ocupados = asignador.ocupados
+    return jobnames_ocupados
+
+def registrar_jobnames_asignados():
+    """
+    Persiste los jobnames asignados por la temporal en memoria para que las próximas corridas no los repitan
+    """
+    cargar_jobnames_ocupados().update(m_max.asignador_jobnames.ocupados)
+    m_max.asignador_jobnames.guardar_registro(registro_jobnames)
+
+@traza.trazada(atributos=lambda filename, *args, **kwargs: {'path': filename})
+def modificar_malla(filename, mail_personal, start_date, end_date, selected_jobs, caso_de_uso, fechas_pross,legajo,var_force,fechas_manual=None,modo="replicar",carriles=None):
     """
     Función para modificar la malla.
 
@@ -154,20 +197,39 @@ def modificar_malla(filename, mail_personal, start_date, end_date, selected_jobs
     :param mail_personal: toma el mail ingresado
     :param fechas_pross: toma el fechas de la opcion
     :param fechas: Lista de fechas seleccionadas. Si no se pasan, se usará la variable global fechas_seleccionadas.
+    :param modo: Uno de MODOS_TEMPORAL: replicar la cadena por cada fecha, o generarla una sola vez e iterar las fechas
+        de a una o todas en paralelo (ver MallaMaxi.replicar_iterando_odates)
+    :param carriles: Al replicar, cantidad de fechas que corren en paralelo (ver MallaMaxi.replicar_y_enlazar). None
+        para una sola linea
     """
     global new_filename, xml_buffer, new_folder_name,m_max
 
-    nro_malla = str(random.randint(10, 99))
-    new_folder_name = f"CR-AR{malla.uuaa}TMP-T{nro_malla}"
-
     fechas_a_iterar = obtener_fechas_optimizado(start_date, end_date, fechas_pross, fechas_manual)
     jobs_to_duplicate = [job for job in malla.jobs() if job.name in selected_jobs]
 
+    # Si solo cambiaron los jobs o las fechas, se actualiza la temporal anterior en vez de generarla de nuevo
+    if modo == "replicar" and carriles is None and m_max is not None and m_max.admite_actualizacion(malla, mail_personal, caso_de_uso, legajo, var_force):
+        m_max.actualizar(jobs_to_duplicate, fechas_a_iterar)
+        registrar_jobnames_asignados()
+        return new_folder_name
+
+    libres = [nro for nro in range(10, 100) if f"CR-AR{malla.uuaa}TMP-T{nro}" not in carpetas_generadas]
+    nro_malla = str(random.choice(libres or range(10, 100)))
+    new_folder_name = f"CR-AR{malla.uuaa}TMP-T{nro_malla}"
+
     # Comienza la salsa
-    m_max = MallaMaxi(jobs_to_duplicate, malla)
+    reglas = ReglasAmbientacion.desde_json(reglas_json) if os.path.exists(reglas_json) else None
+    m_max = MallaMaxi(jobs_to_duplicate, malla, jobnames_ocupados=cargar_jobnames_ocupados(),
+                      reglas_ambientacion=reglas)
     m_max.ordenar()
-    m_max.replicar_y_enlazar(fechas_a_iterar)
+    if modo == "replicar":
+        m_max.replicar_y_enlazar(fechas_a_iterar, carriles)
+    else:
+        m_max.replicar_iterando_odates(fechas_a_iterar, concurrente=modo == "iterar_concurrente")
     m_max.ambientar(mail_personal, new_folder_name, caso_de_uso, legajo,var_force)
+    m_max.particionar(carpetas_ocupadas=carpetas_generadas)
+    carpetas_generadas.update(nombre for nombre, _ in m_max.particiones)
+    registrar_jobnames_asignados()
 
     return new_folder_name
 
@@ -202,6 +264,16 @@ def select_attached_file():
 
 
 
+def obtener_carriles():
+    """
+    Cantidad de fechas que corren en paralelo al replicar la cadena, None para una sola linea (1 o un valor invalido)
+    """
+    try:
+        carriles = int(carriles_var.get())
+    except ValueError:
+        return None
+    return carriles if carriles > 1 else None
+
 def confirmar_seleccion():
 
     global modified_file_path, selected_jobs_listbox, caso_uso_var, mail_entry, start_date_entry, end_date_entry, job_listbox
@@ -220,7 +292,8 @@ def confirmar_seleccion():
     if selected_jobs and attached_file_path and caso_uso_var.get() and mail_entry.get() and seleccion_var.get() != "carga_manual":
         modified_file_path = modificar_malla(attached_file_path, mail_entry.get(), start_date_entry.get_date(),
                                              end_date_entry.get_date(), selected_jobs, caso_uso_var.get(),
-                                             seleccion_var.get(), legajo_var.get(),var_force.get(), None)
+                                             seleccion_var.get(), legajo_var.get(),var_force.get(), None,
+                                             MODOS_TEMPORAL[modo_var.get()], obtener_carriles())
         messagebox.showinfo("Éxito", "La malla ha sido modificada y guardada temporalmente.")
         if not new_folder_name:
             messagebox.showwarning("Advertencia", "No hay malla modificada para descargar o el archivo no existe.")
@@ -229,13 +302,26 @@ def confirmar_seleccion():
         save_path = filedialog.asksaveasfilename(defaultextension=".xml", filetypes=[("XML files", "*.xml")],
                                                  initialfile=os.path.basename(modified_file_path))
 
-        m_max.exportar(save_path)
-        messagebox.showinfo("Éxito", f"Malla descargada en: {save_path}")
+        # Validamos la temporal en memoria, antes de exportarla
+        recorder_tmp = RecorderTmp()
+        with traza.span('validacion_temporal', carpeta=new_folder_name):
+            for vista in m_max.vistas():
+                tmp_parametros(vista, recorder_tmp)
+            tmp_enlaces(m_max, recorder_tmp)
+
+        paths = m_max.exportar(save_path)
+        messagebox.showinfo("Éxito", "Malla descargada en: " + ", ".join(paths))
+
+        if recorder_tmp.hay_errores():
+            log_path = os.path.splitext(save_path)[0] + '.log'
+            recorder_tmp.write_log(log_path)
+            messagebox.showwarning("Advertencia", f"La malla temporal tiene errores, ver: {log_path}")
 
     elif selected_jobs and attached_file_path and caso_uso_var.get() and mail_entry.get() and seleccion_var.get() == "carga_manual":
         modified_file_path = modificar_malla(attached_file_path, mail_entry.get(), None,
                                              None, selected_jobs, caso_uso_var.get(),
-                                             seleccion_var.get(), legajo_var.get(),var_force.get(),fechas_seleccionadas)
+                                             seleccion_var.get(), legajo_var.get(),var_force.get(),fechas_seleccionadas,
+                                             MODOS_TEMPORAL[modo_var.get()], obtener_carriles())
 
     elif not caso_uso_var.get() or not mail_entry.get():
         messagebox.showwarning("Advertencia", "Por favor, completar todos los campos.")
@@ -359,7 +445,7 @@ def seleccionar_todos():
 def interfaz_seleccion_job():
     global job_listbox, selected_jobs_global, entry_buscar, caso_uso_var,\
         mail_entry, original_jobs, selected_jobs_listbox,legajo_var,var_seleccion,\
-        var_force,check_force,check_button
+        var_force,check_force,check_button,modo_var,carriles_var
 
     tk.Label(dias_jobs_frame, text="Mail:", font=("Arial", 12,"bold"),  bg="#131c46", fg ="white").grid(row=5, column=2, sticky="e", pady=5,
                                                                                  padx=5)
@@ -379,6 +465,23 @@ def interfaz_seleccion_job():
     caso_uso_var = tk.Entry(dias_jobs_frame, font=("Arial", 12))
     caso_uso_var.grid(row=7, column=3, pady=5, padx=(0,120))
 
+    # Iterando las fechas la temporal siempre se configura con force, ver MallaMaxi.replicar_iterando_odates
+    tk.Label(dias_jobs_frame, text="Modo:", font=("Arial", 12, "bold"), bg="#131c46", fg="white").grid(row=8, column=2,
+                                                                                                       sticky="e",
+                                                                                                       pady=5, padx=5)
+    modo_var = tk.StringVar(value=next(iter(MODOS_TEMPORAL)))
+    modo_menu = tk.OptionMenu(dias_jobs_frame, modo_var, *MODOS_TEMPORAL)
+    modo_menu.config(font=("Arial", 11), bg="#3c4c8f", fg="white", width=22, highlightthickness=0)
+    modo_menu.grid(row=8, column=3, pady=5, padx=(0,120))
+
+    # Solo al replicar: las fechas de a N en paralelo, cada job con el recurso ARD-TMP
+    carriles_frame = tk.Frame(dias_jobs_frame, bg="#131c46")
+    carriles_frame.grid(row=8, column=1, padx=(20,0), pady=2)
+    tk.Label(carriles_frame, text="Fechas en paralelo:", font=("Arial", 12, "bold"), bg="#131c46",
+             fg="white").grid(row=0, column=0, padx=5)
+    carriles_var = tk.Spinbox(carriles_frame, from_=1, to=10, width=4, font=("Arial", 12), state="readonly")
+    carriles_var.grid(row=0, column=1)
+
     attachment_button = tk.Button(dias_jobs_frame, text="ADJUNTAR MALLA", command=select_attached_file,
                                   font=("Arial", 12,"bold"), bg="#3c4c8f",fg ="white")
     attachment_button.grid(row=0, column=3, pady=(0,45),padx=(120,0))
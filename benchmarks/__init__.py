@@ -0,0 +1 @@
+"""Generador de exports sinteticos de Control-M y benchmarks de todo el proceso (ver benchmarks.suite)"""
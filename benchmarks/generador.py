@@ -0,0 +1,182 @@
+"""
+Generador determinístico de exports sinteticos de Control-M. Con los mismos parametros (y la misma semilla) genera
+siempre el mismo xml, por lo que sirve para medir y comparar el rendimiento entre versiones sin depender de exports
+reales.
+
+Cada carpeta tiene una o varias cadenas independientes y cada cadena se arma por niveles (su profundidad): cada job
+espera a fan_in jobs del nivel anterior y agrega marcas a fan_out jobs del siguiente, con el estandar ORIGEN-TO-DESTINO
+y eliminando las marcas que espera.
+"""
+
+import math
+import random
+import string
+from xml.etree.ElementTree import Element, SubElement, ElementTree
+
+_BASE36 = string.digits + string.ascii_uppercase
+_TIPOS = 'CTPSVW'
+_FASES = ['staging', 'raw', 'master']
+
+# Grupos ON que se agregan a cada job, en orden, segun grupos_on
+_GRUPOS_ON = [
+    ('OK', 'DOMAIL'),
+    ('NOTOK', 'DOMAIL'),
+    ('COMPSTAT=7', 'DOCOND'),
+    ('NOTOK', 'DOACTION'),
+]
+
+
+def _uuaa(indice: int) -> str:
+    letras = string.ascii_uppercase
+    return letras[indice // 676 % 26] + letras[indice // 26 % 26] + letras[indice % 26]
+
+
+def _jobname(uuaa: str, tipo: str, indice: int) -> str:
+    sufijo = _BASE36[indice // 1296 % 36] + _BASE36[indice // 36 % 36] + _BASE36[indice % 36]
+    return f"A{uuaa}{tipo}P{indice // 46656 % 10}{sufijo}"
+
+
+def _niveles(jobs: range, profundidad: int) -> list[range]:
+    profundidad = max(1, min(profundidad, len(jobs)))
+    ancho = math.ceil(len(jobs) / profundidad)
+    return [range(inicio, min(inicio + ancho, jobs.stop)) for inicio in range(jobs.start, jobs.stop, ancho)]
+
+
+def _agregar_job(carpeta: Element, jobname: str, uuaa: str, indice: int, prerequisitos: list[str],
+                 marcas_out: list[str], variables_por_job: int, grupos_on: int, recursos: tuple[str, ...],
+                 cambios: random.Random | None, proporcion_cambios: float):
+    fase = _FASES[indice % len(_FASES)]
+    tabla = f"t_{uuaa.lower()}_tabla_{indice}"
+    atributos = {
+        'JOBNAME': jobname,
+        'APPLICATION': f"{uuaa}-AR-DATIO",
+        'SUB_APPLICATION': f"{uuaa}-DATIO-CCR",
+        'DESCRIPTION': f"Ingesta {fase} de la tabla {tabla}",
+        'PARENT_FOLDER': carpeta.get('FOLDER_NAME'),
+        'CMDLINE': '/opt/datio/sentry-ar/dataproc_sentry.py %%DPID',
+        'TASKTYPE': 'Job',
+        'MAXWAIT': '3',
+        'CREATED_BY': 'XP00000',
+    }
+    variables = {
+        '%%MAIL': f"{uuaa.lower()}@bbva.com",
+        '%%DPID': f"{uuaa.lower()}-ar-krb-inr-{tabla.replace('_', '')}-01",
+        '%%NAMESPACE': f"ar.{uuaa.lower()}.app-id-1.pro",
+        '%%ODATE_PROCESO': '%%$ODATE',
+        '%%TABLENAME': tabla,
+    }
+    for nro in range(max(0, variables_por_job - len(variables))):
+        variables[f"%%PARAM_{nro:02}"] = f"valor_{indice}_{nro}"
+
+    # Diferencias deterministicas para poder comparar dos exports (ej: las funciones de diferencia)
+    if cambios is not None and cambios.random() < proporcion_cambios:
+        atributos['MAXWAIT'] = '5'
+        atributos['DESCRIPTION'] += ' (modificado)'
+        variables['%%MAIL'] = f"{uuaa.lower()}.nuevo@bbva.com"
+
+    job = SubElement(carpeta, 'JOB', atributos)
+    for nombre, valor in variables.items():
+        SubElement(job, 'VARIABLE', {'NAME': nombre, 'VALUE': valor})
+    for marca in prerequisitos:
+        SubElement(job, 'INCOND', {'NAME': marca, 'ODATE': 'ODAT', 'AND_OR': 'A'})
+    for marca in marcas_out:
+        SubElement(job, 'OUTCOND', {'NAME': marca, 'ODATE': 'ODAT', 'SIGN': '+'})
+    for marca in prerequisitos:
+        SubElement(job, 'OUTCOND', {'NAME': marca, 'ODATE': 'ODAT', 'SIGN': '-'})
+    for recurso in recursos:
+        SubElement(job, 'QUANTITATIVE', {'NAME': recurso, 'QUANT': '1'})
+
+    for codigo, accion in _GRUPOS_ON[:grupos_on]:
+        on = SubElement(job, 'ON', {'STMT': '*', 'CODE': codigo})
+        if accion == 'DOMAIL':
+            mensaje = f"El job {jobname} finalizo {codigo}"
+            SubElement(on, 'DOMAIL', {'URGENCY': 'R', 'DEST': '%%MAIL', 'SUBJECT': f"{codigo} %%JOBNAME",
+                                      'ATTACH_SYSOUT': 'Y', 'MESSAGE': f"{len(mensaje):04}{mensaje}"})
+        elif accion == 'DOCOND':
+            SubElement(on, 'DOCOND', {'NAME': f"{jobname}-TO-{jobname}", 'ODATE': 'ODAT', 'SIGN': '+'})
+        else:
+            SubElement(on, 'DOACTION', {'ACTION': 'OK'})
+
+
+def generar_export(cant_carpetas: int = 1, jobs_por_carpeta: int = 100, cadenas: int = 1, profundidad: int = 10,
+                   fan_in: int = 1, fan_out: int = 1, variables_por_job: int = 6, grupos_on: int = 2,
+                   recursos: tuple[str, ...] = ('ARD',), semilla: int = 0, proporcion_cambios: float = 0.0,
+                   semilla_cambios: int = 1) -> Element:
+    """
+    Genera un export sintetico
+
+    :param cant_carpetas: Cantidad de carpetas (mallas), cada una con su UUAA
+    :param jobs_por_carpeta: Cantidad de jobs de cada carpeta
+    :param cadenas: Cantidad de cadenas independientes de cada carpeta, los jobs se reparten entre ellas
+    :param profundidad: Cantidad de niveles de cada cadena
+    :param fan_in: Cantidad de jobs del nivel anterior que espera cada job
+    :param fan_out: Cantidad de jobs del nivel siguiente a los que les agrega marca cada job
+    :param variables_por_job: Cantidad de variables de cada job
+    :param grupos_on: Cantidad de grupos ON de cada job (OK y NOTOK con DOMAIL, COMPSTAT=7 con DOCOND, NOTOK con
+        DOACTION)
+    :param recursos: Recursos cuantitativos de cada job, ej: ('ARD', 'ARD-TMP')
+    :param semilla: Semilla de la estructura del export
+    :param proporcion_cambios: Proporcion de jobs con atributos y variables modificados, sin cambiar la estructura.
+        Sirve para generar la version 'work' de un export generado con la misma semilla
+    :param semilla_cambios: Semilla de los cambios
+    :return: Elemento raiz (DEFTABLE) del export
+    """
+
+    aleatorio = random.Random(semilla)
+    cambios = random.Random(semilla_cambios) if proporcion_cambios else None
+    raiz = Element('DEFTABLE')
+
+    for nro_carpeta in range(cant_carpetas):
+        uuaa = _uuaa(nro_carpeta)
+        carpeta = SubElement(raiz, 'FOLDER', {
+            'FOLDER_NAME': f"CR-AR{uuaa}DIA-T02",
+            'DATACENTER': 'CTM_CTRLMCCR',
+            'FOLDER_ORDER_METHOD': 'SYSTEM',
+        })
+        jobnames = [_jobname(uuaa, _TIPOS[indice % len(_TIPOS)], indice) for indice in range(jobs_por_carpeta)]
+
+        # Aristas entre niveles consecutivos, sin repetir
+        predecesores = [[] for _ in jobnames]
+        sucesores = [[] for _ in jobnames]
+        tamanio_cadena = math.ceil(jobs_por_carpeta / max(1, cadenas))
+        for inicio in range(0, jobs_por_carpeta, tamanio_cadena):
+            niveles = _niveles(range(inicio, min(inicio + tamanio_cadena, jobs_por_carpeta)), profundidad)
+            for anterior, actual in zip(niveles, niveles[1:]):
+                for destino in actual:
+                    for origen in aleatorio.sample(anterior, min(fan_in, len(anterior))):
+                        predecesores[destino].append(origen)
+                        sucesores[origen].append(destino)
+                for origen in anterior:
+                    for destino in aleatorio.sample(actual, min(fan_out, len(actual))):
+                        if origen not in predecesores[destino]:
+                            predecesores[destino].append(origen)
+                            sucesores[origen].append(destino)
+
+        for indice, jobname in enumerate(jobnames):
+            _agregar_job(
+                carpeta,
+                jobname,
+                uuaa,
+                indice,
+                prerequisitos=[f"{jobnames[origen]}-TO-{jobname}" for origen in predecesores[indice]],
+                marcas_out=[f"{jobname}-TO-{jobnames[destino]}" for destino in sucesores[indice]],
+                variables_por_job=variables_por_job,
+                grupos_on=grupos_on,
+                recursos=recursos,
+                cambios=cambios,
+                proporcion_cambios=proporcion_cambios,
+            )
+
+    return raiz
+
+
+def escribir_export(path: str, **parametros) -> str:
+    """
+    Genera un export sintetico y lo escribe en disco
+
+    :param path: Path del xml a generar
+    :param parametros: Ver generar_export
+    :return: El path del xml generado
+    """
+    ElementTree(generar_export(**parametros)).write(path, encoding='utf-8', xml_declaration=True)
+    return path
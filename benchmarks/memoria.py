@@ -0,0 +1,212 @@
+"""
+Medicion de memoria por etapa con tracemalloc: parseo de la carpeta, decodificacion de los jobs, armado del digrafo,
+replicacion de la temporal, ambientacion, export y carga del mismo xml como contenedor. Por cada etapa se informa el pico de memoria, lo que queda retenido al finalizar y los lugares
+del codigo que más memoria retienen. Los resultados se guardan en un json y se pueden comparar contra una corrida base
+generada con el mismo export sintetico, informando las etapas que crecieron más de lo tolerado.
+
+Es opt-in: tracemalloc hace todo bastante más lento, por eso no se activa en ningun otro lado.
+
+Uso:
+    python -m benchmarks.memoria --escala 1000 --salida benchmarks/resultados/memoria_base.json
+    python -m benchmarks.memoria --escala 1000 --base benchmarks/resultados/memoria_base.json
+    python -m benchmarks.memoria --xml CR-ARMOLDIA-T02.xml
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import controlm
+from benchmarks.generador import escribir_export
+from controlm.structures import ControlmContainer, ControlmDigrafo, ControlmFolder, MallaMaxi
+
+ODATES = ['2024-10-14', '2024-10-15', '2024-10-16']
+_DIRECTORIO_REPO = os.path.dirname(os.path.dirname(os.path.abspath(controlm.__file__)))
+
+
+class MedidorMemoria:
+    """
+    Registra el uso de memoria de cada etapa que se ejecute dentro de MedidorMemoria.etapa(nombre). Las etapas se
+    pueden ejecutar una detras de otra, los objetos que se arman en una (ej: la malla) siguen vivos en las siguientes
+    """
+
+    def __init__(self, cant_lugares: int = 10, profundidad_traza: int = 1):
+        """
+        Constructor
+
+        :param cant_lugares: Cantidad de lugares del codigo (archivo:linea) que más memoria retienen a informar por etapa
+        :param profundidad_traza: Cantidad de frames que guarda tracemalloc por cada asignacion. Con más de uno, además
+            del lugar de la asignacion (que suele ser de la libreria estandar, ej: copy.py) se informa desde qué linea
+            del repo se llegó a él
+        """
+        self.cant_lugares = cant_lugares
+        self.profundidad_traza = profundidad_traza
+        self.etapas: dict[str, dict] = {}
+
+    @contextlib.contextmanager
+    def etapa(self, nombre: str):
+        """
+        Mide la memoria de todo lo que se ejecute dentro del bloque with
+
+        :param nombre: Nombre de la etapa
+        """
+        iniciado_aca = not tracemalloc.is_tracing()
+        if iniciado_aca:
+            tracemalloc.start(self.profundidad_traza)
+
+        antes = tracemalloc.take_snapshot()
+        memoria_antes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            memoria_despues, pico = tracemalloc.get_traced_memory()
+            despues = tracemalloc.take_snapshot()
+            filtros = [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, contextlib.__file__),
+            ]
+            agrupar_por = 'traceback' if self.profundidad_traza > 1 else 'lineno'
+            diferencias = despues.filter_traces(filtros).compare_to(antes.filter_traces(filtros), agrupar_por)
+            self.etapas[nombre] = {
+                'pico': pico - memoria_antes,
+                'retenido': memoria_despues - memoria_antes,
+                'lugares': [
+                    self._lugar(diferencia) for diferencia in diferencias[:self.cant_lugares] if diferencia.size_diff > 0
+                ],
+            }
+            if iniciado_aca:
+                tracemalloc.stop()
+
+    @staticmethod
+    def _lugar(diferencia: tracemalloc.StatisticDiff) -> dict:
+        frames = list(diferencia.traceback)  # Del más viejo al más reciente
+        lugar = {
+            'lugar': f"{frames[-1].filename}:{frames[-1].lineno}",
+            'bytes': diferencia.size_diff,
+            'bloques': diferencia.count_diff,
+        }
+        if frames[-1].filename.startswith(_DIRECTORIO_REPO):
+            return lugar
+        for frame in reversed(frames[:-1]):
+            if frame.filename.startswith(_DIRECTORIO_REPO):
+                lugar['origen'] = f"{frame.filename}:{frame.lineno}"
+                break
+        return lugar
+
+    def __str__(self):
+        lineas = []
+        for nombre, datos in self.etapas.items():
+            lineas.append(f"{nombre:<30} pico {datos['pico'] / 2 ** 20:9.2f} MiB  retenido {datos['retenido'] / 2 ** 20:9.2f} MiB")
+            for lugar in datos['lugares']:
+                origen = f" (desde {lugar['origen']})" if 'origen' in lugar else ''
+                lineas.append(f"\t{lugar['bytes'] / 2 ** 10:10.1f} KiB  {lugar['bloques']:8} bloques  {lugar['lugar']}{origen}")
+        return '\n'.join(lineas)
+
+
+def medir(path_xml: str, save_path: str, medidor: MedidorMemoria = None) -> MedidorMemoria:
+    """
+    Mide la memoria de todas las etapas de la generacion de una temporal con todos los jobs de la carpeta
+
+    :param path_xml: Export con la carpeta origen
+    :param save_path: Path donde se exporta la temporal
+    :param medidor: Medidor donde se registran las etapas, si no se provee se crea uno
+    :return: El medidor con todas las etapas registradas
+    """
+    medidor = medidor or MedidorMemoria()
+    tracemalloc.start(medidor.profundidad_traza)
+    try:
+        with medidor.etapa('ControlmFolder'):
+            malla = ControlmFolder(path_xml)
+        with medidor.etapa('ControlmJob.decodificar'):
+            for job in malla.jobs():
+                job.marcasin  # Variables, marcas, recursos y acciones se decodifican la primera vez que se piden
+        with medidor.etapa('ControlmDigrafo'):
+            digrafo = ControlmDigrafo(malla.jobs())
+        with medidor.etapa('MallaMaxi.ordenar'):
+            m_max = MallaMaxi(malla.jobs(), malla, digrafo=digrafo)
+            m_max.ordenar()
+        with medidor.etapa('MallaMaxi.replicar_y_enlazar'):
+            m_max.replicar_y_enlazar(ODATES)
+        with medidor.etapa('MallaMaxi.ambientar'):
+            m_max.ambientar('benchmark@bbva.com', f"CR-AR{malla.uuaa}TMP-T11", 'benchmark', 'XP00000', False)
+            m_max.particionar()
+        with medidor.etapa('MallaMaxi.exportar'):
+            m_max.exportar(save_path)
+        # Con todos los jobs decodificados (lo hace el indice de marcas), incluye los strings internados
+        with medidor.etapa('ControlmContainer'):
+            contenedor = ControlmContainer(path_xml)
+        medidor.etapas['ControlmContainer']['strings_internados'] = len(contenedor.internado)
+    finally:
+        tracemalloc.stop()
+    return medidor
+
+
+def comparar(actual: dict, base: dict, tolerancia: float) -> list[str]:
+    """
+    Compara el pico y lo retenido de cada etapa contra una corrida base
+
+    :param actual: Etapas de la corrida actual
+    :param base: Etapas de la corrida base
+    :param tolerancia: Crecimiento tolerado, ej: 0.1 es un 10% más que la base
+    :return: Un renglon por cada etapa/medida que creció más de lo tolerado
+    """
+    crecimientos = []
+    for nombre, datos in actual.items():
+        if nombre not in base:
+            continue
+        for medida in ('pico', 'retenido'):
+            anterior = base[nombre][medida]
+            if anterior > 0 and datos[medida] > anterior * (1 + tolerancia):
+                crecimientos.append(
+                    f"{nombre} ({medida}): {anterior / 2 ** 20:.2f} MiB -> {datos[medida] / 2 ** 20:.2f} MiB "
+                    f"(+{datos[medida] / anterior - 1:.0%})"
+                )
+    return crecimientos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria por etapa de la generacion de una temporal")
+    parser.add_argument('--escala', type=int, default=1000, help="Cantidad de jobs del export sintetico")
+    parser.add_argument('--xml', help="Export a medir en lugar del sintetico")
+    parser.add_argument('--lugares', type=int, default=10, help="Lugares del codigo a informar por etapa")
+    parser.add_argument('--profundidad', type=int, default=1, help="Frames a guardar por cada asignacion")
+    parser.add_argument('--salida', help="Json donde se guardan los resultados")
+    parser.add_argument('--base', help="Json de una corrida base contra el cual comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.1, help="Crecimiento tolerado respecto de la base")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        path_xml = args.xml or escribir_export(
+            os.path.join(directorio, f"memoria_{args.escala}.xml"), jobs_por_carpeta=args.escala,
+            cadenas=max(1, args.escala // 50), profundidad=10, fan_in=2, variables_por_job=8, grupos_on=4,
+            recursos=('ARD', 'ARD-TMP'))
+        medidor = medir(path_xml, os.path.join(directorio, 'temporal.xml'), MedidorMemoria(args.lugares, args.profundidad))
+    print(medidor)
+
+    resultados = {'entrada': args.xml or f"sintetico_{args.escala}", 'etapas': medidor.etapas}
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=4)
+
+    if args.base:
+        with open(args.base, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        if base['entrada'] != resultados['entrada']:
+            print(f"WARNING: La base [{args.base}] se generó con otra entrada [{base['entrada']}], la comparacion no es valida")
+        crecimientos = comparar(resultados['etapas'], base['etapas'], args.tolerancia)
+        if crecimientos:
+            print(f"\nEtapas que crecieron más de un {args.tolerancia:.0%} respecto de [{args.base}]:")
+            for crecimiento in crecimientos:
+                print(f"\t{crecimiento}")
+            sys.exit(1)
+        print(f"\nSin crecimientos respecto de [{args.base}]")
+
+
+if __name__ == '__main__':
+    main()
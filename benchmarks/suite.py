@@ -0,0 +1,263 @@
+"""
+Benchmarks de todo el proceso sobre exports sinteticos (ver benchmarks.generador) a distintas escalas: carga de
+carpetas y contenedores, armado y recorridos del digrafo, generacion de la temporal (ordenar, replicar_y_enlazar,
+ambientar, exportar), cada validacion y cada funcion de diferencia. Los resultados se guardan en un json para poder
+compararlos entre corridas.
+
+Uso:
+    python -m benchmarks.suite --escalas 100 1000 10000 --salida benchmarks/resultados/actual.json
+    python -m benchmarks.suite --comparar benchmarks/resultados/base.json --salida benchmarks/resultados/actual.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+import controlm.diferencia as diferencia
+import controlm.validaciones as validaciones
+from benchmarks.generador import escribir_export
+from controlm.record import ControlRecorder, DiffRecorder, RecorderTmp
+from controlm.structures import ControlmContainer, ControlmDigrafo, ControlmFolder, MallaMaxi
+
+ESCALAS = [100, 1000, 10000]
+ODATES = ['2024-10-14', '2024-10-15', '2024-10-16']
+
+VALIDACIONES_JOB = [
+    validaciones.jobname,
+    validaciones.application,
+    validaciones.subapp,
+    validaciones.atributos,
+    validaciones.variables,
+    validaciones.marcas_in,
+    validaciones.marcas_out,
+    validaciones.acciones,
+    validaciones.recursos_cuantitativos,
+    validaciones.tipo,
+]
+
+DIFERENCIAS_JOB = [
+    diferencia.atributos,
+    diferencia.variables,
+    diferencia.marcas,
+    diferencia.acciones,
+    diferencia.recursos_cuantitativos,
+]
+
+
+def _medir(funcion: Callable, preparar: Callable = None, repeticiones: int = 3) -> dict[str, float]:
+    """
+    Mide el tiempo de una funcion, sin contar lo que tarda en prepararse
+
+    :param funcion: Funcion a medir, recibe lo que devuelve preparar (si hay)
+    :param preparar: Funcion que arma los argumentos de cada repeticion, ej: una MallaMaxi nueva para ambientar
+    :param repeticiones: Cantidad de veces que se ejecuta la funcion
+    :return: Tiempos minimo y mediana, en segundos
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        argumentos = preparar() if preparar is not None else ()
+        inicio = time.perf_counter()
+        funcion(*argumentos)
+        tiempos.append(time.perf_counter() - inicio)
+    return {'min': min(tiempos), 'mediana': statistics.median(tiempos)}
+
+
+def _malla_maxi(malla: ControlmFolder, hasta: str) -> MallaMaxi:
+    """Arma una MallaMaxi con todos los jobs de la malla y la avanza hasta la etapa indicada (sin incluirla)"""
+    etapas = ['ordenar', 'replicar_y_enlazar', 'ambientar', 'exportar']
+    m_max = MallaMaxi(malla.jobs(), malla)
+    for etapa in etapas[:etapas.index(hasta)]:
+        if etapa == 'ordenar':
+            m_max.ordenar()
+        elif etapa == 'replicar_y_enlazar':
+            m_max.replicar_y_enlazar(ODATES)
+        else:
+            m_max.ambientar('benchmark@bbva.com', f"CR-AR{malla.uuaa}TMP-T11", 'benchmark', 'XP00000', False)
+            m_max.particionar()
+    return m_max
+
+
+def medir_escala(jobs_por_carpeta: int, cant_carpetas: int, directorio: str, repeticiones: int) -> dict[str, dict]:
+    """
+    Ejecuta todos los benchmarks para una escala
+
+    :param jobs_por_carpeta: Cantidad de jobs de cada carpeta
+    :param cant_carpetas: Cantidad de carpetas del contenedor
+    :param directorio: Directorio donde se generan los xml
+    :param repeticiones: Repeticiones de cada medicion
+    :return: Etapa -> tiempos
+    """
+    # Cadenas de ~50 jobs, como en una malla real: MallaMaxi.ordenar es cuadratica en el tamaño de cada cadena
+    parametros = dict(jobs_por_carpeta=jobs_por_carpeta, cadenas=max(1, jobs_por_carpeta // 50), profundidad=10,
+                      fan_in=2, fan_out=1, variables_por_job=8, grupos_on=4, recursos=('ARD', 'ARD-TMP'))
+    path_live = escribir_export(os.path.join(directorio, f"live_{jobs_por_carpeta}.xml"), **parametros)
+    path_work = escribir_export(os.path.join(directorio, f"work_{jobs_por_carpeta}.xml"), proporcion_cambios=0.1,
+                                **parametros)
+    path_contenedor = escribir_export(os.path.join(directorio, f"contenedor_{jobs_por_carpeta}.xml"),
+                                      cant_carpetas=cant_carpetas, **parametros)
+
+    resultados = {}
+
+    # Carga y digrafo
+    resultados['ControlmFolder'] = _medir(lambda: ControlmFolder(path_live), repeticiones=repeticiones)
+    # Los hijos de cada job (variables, marcas, recursos, acciones) se decodifican la primera vez que se piden
+    resultados['ControlmJob.decodificar'] = _medir(
+        lambda m: [job.marcasin for job in m.jobs()], lambda: (ControlmFolder(path_live),), repeticiones)
+    malla = ControlmFolder(path_live)
+    malla_work = ControlmFolder(path_work)
+    jobs = malla.jobs()
+    resultados['ControlmDigrafo'] = _medir(lambda: ControlmDigrafo(jobs), repeticiones=repeticiones)
+    digrafo = ControlmDigrafo(jobs)
+    muestra = malla.jobnames()[::max(1, len(jobs) // 50)]
+    resultados['ControlmDigrafo.recorrer_cadena'] = _medir(
+        lambda: [digrafo.recorrer_cadena(jobname) for jobname in muestra], repeticiones=repeticiones)
+    resultados['ControlmDigrafo.recorrer_cadena_inversa'] = _medir(
+        lambda: [digrafo.recorrer_cadena_inversa(jobname) for jobname in muestra], repeticiones=repeticiones)
+    # Con un digrafo nuevo en cada repeticion, asi se incluye el armado del indice de alcance
+    resultados['ControlmDigrafo.recorrer_cadena_completa'] = _medir(
+        lambda d: [d.recorrer_cadena_completa(jobname) for jobname in muestra], lambda: (ControlmDigrafo(jobs),),
+        repeticiones)
+    resultados['ControlmDigrafo.obtener_arboles'] = _medir(digrafo.obtener_arboles, repeticiones=repeticiones)
+    resultados['ControlmDigrafo.ciclos'] = _medir(lambda: list(digrafo.ciclos()), repeticiones=repeticiones)
+
+    # Temporal
+    path_tmp = os.path.join(directorio, f"tmp_{jobs_por_carpeta}.xml")
+    resultados['MallaMaxi.ordenar'] = _medir(
+        lambda m: m.ordenar(), lambda: (_malla_maxi(malla, 'ordenar'),), repeticiones)
+    resultados['MallaMaxi.replicar_y_enlazar'] = _medir(
+        lambda m: m.replicar_y_enlazar(ODATES), lambda: (_malla_maxi(malla, 'replicar_y_enlazar'),), repeticiones)
+    resultados['MallaMaxi.ambientar'] = _medir(
+        lambda m: m.ambientar('benchmark@bbva.com', f"CR-AR{malla.uuaa}TMP-T11", 'benchmark', 'XP00000', False),
+        lambda: (_malla_maxi(malla, 'ambientar'),), repeticiones)
+    m_max = _malla_maxi(malla, 'exportar')
+    resultados['MallaMaxi.exportar'] = _medir(lambda: m_max.exportar(path_tmp), repeticiones=repeticiones)
+
+    # Validaciones
+    for validacion in VALIDACIONES_JOB:
+        resultados[f"validaciones.{validacion.__name__}"] = _medir(
+            lambda cr: [validacion(job, malla, cr) for job in jobs], lambda: (ControlRecorder(),), repeticiones)
+    resultados['validaciones.cadenas_malla'] = _medir(
+        lambda cr: validaciones.cadenas_malla(malla, cr), lambda: (ControlRecorder(),), repeticiones)
+    resultados['validaciones.tmp_enlaces'] = _medir(
+        lambda rt: validaciones.tmp_enlaces(m_max, rt), lambda: (RecorderTmp(),), repeticiones)
+    resultados['validaciones.tmp_parametros'] = _medir(
+        lambda rt: [validaciones.tmp_parametros(vista, rt) for vista in m_max.vistas()], lambda: (RecorderTmp(),),
+        repeticiones)
+
+    # Diferencias
+    pares = [(malla_work.obtener_job(job.name), job) for job in jobs]
+    resultados['diferencia.jobnames'] = _medir(
+        lambda dr: diferencia.jobnames(malla_work.jobnames(), malla.jobnames(), dr), lambda: (DiffRecorder(),),
+        repeticiones)
+    resultados['diferencia.job_nuevo'] = _medir(
+        lambda dr: [diferencia.job_nuevo(job, dr) for job in jobs], lambda: (DiffRecorder(),), repeticiones)
+    for funcion in DIFERENCIAS_JOB:
+        resultados[f"diferencia.{funcion.__name__}"] = _medir(
+            lambda dr: [funcion(workjob, livejob, dr) for workjob, livejob in pares], lambda: (DiffRecorder(),),
+            repeticiones)
+
+    # Contenedor
+    resultados['ControlmContainer'] = _medir(lambda: ControlmContainer(path_contenedor), repeticiones=repeticiones)
+    contenedor = ControlmContainer(path_contenedor)
+    # Con un contenedor nuevo en cada repeticion, la tabla se arma la primera vez que se pide
+    resultados['ControlmContainer.tabla_jobs'] = _medir(
+        lambda c: c.tabla_jobs, lambda: (ControlmContainer(path_contenedor),), repeticiones)
+    resultados['ControlmTablaJobs.contar'] = _medir(
+        lambda: contenedor.tabla_jobs.contar(('malla', 'tipo', 'fase')), repeticiones=repeticiones)
+    resultados['ControlmContainer.consulta'] = _medir(
+        lambda: [contenedor.consulta(uuaa=uuaa, tipo='C', recurso='ARD').jobnames()
+                 for uuaa in contenedor.indice_jobs.valores('uuaa')], repeticiones=repeticiones)
+    path_indice_texto = os.path.join(directorio, 'indice_texto.json')
+    resultados['ControlmContainer.indice_texto'] = _medir(
+        lambda: ControlmContainer(path_contenedor, indice_texto=True), repeticiones=repeticiones)
+    ControlmContainer(path_contenedor, indice_texto=path_indice_texto)
+    resultados['ControlmContainer.indice_texto_guardado'] = _medir(
+        lambda: ControlmContainer(path_contenedor, indice_texto=path_indice_texto), repeticiones=repeticiones)
+    indice_texto = ControlmContainer(path_contenedor, indice_texto=True).indice_texto
+    resultados['ControlmIndiceTexto.buscar_prefijo'] = _medir(
+        lambda: [indice_texto.buscar_prefijo(f"t_{uuaa.lower()}_") for uuaa in contenedor.indice_jobs.valores('uuaa')],
+        repeticiones=repeticiones)
+    resultados['ControlmContainer.linaje'] = _medir(
+        lambda c: c.linaje, lambda: (ControlmContainer(path_contenedor),), repeticiones)
+    resultados['ControlmLinaje.aguas_arriba_y_abajo'] = _medir(
+        lambda: [(contenedor.linaje.aguas_arriba(tabla), contenedor.linaje.aguas_abajo(tabla))
+                 for tabla in contenedor.linaje.tablas()], repeticiones=repeticiones)
+    resultados['validaciones.global_marcas'] = _medir(
+        lambda cr: validaciones.global_marcas(contenedor, cr), lambda: (ControlRecorder(),), repeticiones)
+    directorio_actual = os.getcwd()
+    os.chdir(directorio)  # cadenas_global escribe sus csv en el directorio actual
+    try:
+        resultados['validaciones.cadenas_global'] = _medir(
+            lambda: validaciones.cadenas_global(contenedor.digrafo, contenedor), repeticiones=repeticiones)
+    finally:
+        os.chdir(directorio_actual)
+
+    return resultados
+
+
+def comparar(actual: dict, base: dict) -> list[str]:
+    """
+    Compara dos corridas de la suite
+
+    :param actual: Resultados de la corrida actual
+    :param base: Resultados de la corrida contra la cual comparar
+    :return: Un renglon por etapa con ambos tiempos (minimos) y la relacion entre ellos
+    """
+    renglones = []
+    for escala, etapas in actual['resultados'].items():
+        etapas_base = base['resultados'].get(escala, {})
+        for etapa, tiempos in etapas.items():
+            if etapa not in etapas_base:
+                continue
+            anterior = etapas_base[etapa]['min']
+            relacion = tiempos['min'] / anterior if anterior else float('inf')
+            renglones.append(f"[{escala:>6}] {etapa:<45} {anterior:10.4f}s -> {tiempos['min']:10.4f}s ({relacion:.2f}x)")
+    return renglones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks sobre exports sinteticos de Control-M")
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS, help="Cantidad de jobs por carpeta")
+    parser.add_argument('--carpetas', type=int, default=10, help="Cantidad de carpetas del contenedor")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--salida', help="Json donde se guardan los resultados")
+    parser.add_argument('--comparar', help="Json de una corrida anterior contra el cual comparar")
+    args = parser.parse_args()
+
+    resultados = {
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'carpetas': args.carpetas,
+        'repeticiones': args.repeticiones,
+        'resultados': {},
+    }
+    with tempfile.TemporaryDirectory() as directorio:
+        for escala in args.escalas:
+            print(f"Escala {escala} jobs por carpeta")
+            etapas = medir_escala(escala, args.carpetas, directorio, args.repeticiones)
+            for etapa, tiempos in etapas.items():
+                print(f"\t{etapa:<45} {tiempos['min']:10.4f}s")
+            resultados['resultados'][str(escala)] = etapas
+
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=4)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        print(f"\nComparacion contra [{args.comparar}] ({base['fecha']})")
+        for renglon in comparar(resultados, base):
+            print(renglon)
+
+
+if __name__ == '__main__':
+    main()
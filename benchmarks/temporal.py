@@ -0,0 +1,35 @@
+"""
+Arma una temporal de prueba con todos los jobs de un export sintetico (ver benchmarks.generador), igual que
+python -m controlm.structures con un export real, y muestra los paths de las carpetas generadas.
+
+Uso:
+    python -m benchmarks.temporal
+    python -m benchmarks.temporal --jobs 1000
+"""
+
+import argparse
+import os
+import tempfile
+
+from benchmarks.generador import generar_export
+from controlm.structures import ControlmFolder, MallaMaxi
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temporal de prueba sobre un export sintetico")
+    parser.add_argument('--jobs', type=int, default=20, help="Cantidad de jobs del export sintetico")
+    args = parser.parse_args()
+
+    malla = ControlmFolder(generar_export(jobs_por_carpeta=args.jobs, cadenas=max(1, args.jobs // 50), profundidad=5))
+    m_max = MallaMaxi(malla.jobs(), malla)
+    m_max.ordenar()
+    m_max.replicar_y_enlazar(['2024-10-14', '2024-10-15', '2024-10-16', '2024-10-17', '2024-10-20'])
+    m_max.ambientar('jemonjelos@bbva.com', f"CR-AR{malla.uuaa}TMP-T99", 'caso_test', 'O00000', False)
+    m_max.particionar()
+
+    for path_generado in m_max.exportar(os.path.join(tempfile.gettempdir(), 'temporal_test.xml')):
+        print(path_generado)
+
+
+if __name__ == '__main__':
+    main()
@@ -32,10 +32,12 @@ class Regex:
     JOBNAME = r'^(?P<pais>[A-Z])(?P<uuaa>K?[A-Z0-9]{3,4})(?P<tipo>[NEDRTCWAVMBPGSD])(?P<entorno>[PBDTCM])(?P<periodicidad>\d)[0-9A-Z]{3}$'
     MAILS = r'[^@ \t\r\n]+@[^@ \t\r\n]+\.[^@ \t\r\n]+'
     TABLA = r'^t_(?P<uuaa>k?[a-z0-9]{3,4})_.+$'
+    VARIABLE = r'%%(?:\.|[A-Za-z0-9_$#@]+)'  # %%. es el operador de concatenacion de control m
 
 
 class Limits:
     MAX_JOBS_TMP = 30
+    MAX_JOBS_CARPETA_TMP = 250  # Por encima de esta cantidad la temporal se parte en varias carpetas
 
 
 ATRIBUTOS_NO_RELEVANTES = [
@@ -56,6 +58,19 @@ ATRIBUTOS_NO_RELEVANTES = [
     'IS_CURRENT_VERSION'
 ]
 
+# Atributos (de jobs y de acciones) cuyo valor es practicamente unico por job, no tiene sentido compartirlos entre jobs.
+# Ver structures.TablaInternado
+ATRIBUTOS_SIN_INTERNAR = [
+    'DESCRIPTION',
+    'CMDLINE',
+    'JOBISN',
+    'SUBJECT',
+    'MESSAGE',
+]
+
+# Variables (sin los %%) con las que un job indica la tabla sobre la que trabaja
+VARIABLES_TABLA = ['TABLENAME', 'TABLE_NAME', 'TABLE', 'TABLA']
+
 # Este diccionario es una correspondencia entre el dígito de periodicidad de un jobname y la periodicidad de una malla
 # se formó en base al manual de estandares de control m. Hay más pero por lo que veo solo se usan estos
 MAPEO_PERJOBNAME_PERMALLA = {
@@ -63,3 +78,61 @@ MAPEO_PERJOBNAME_PERMALLA = {
     '4': 'MEN',
     '9': 'EVE'
 }
+
+# Recurso cuantitativo que limita cuántos jobs temporales corren a la vez. Los jobs de las temporales que corren en
+# paralelo (carriles o ODATES iterados a la vez) lo llevan siempre, aunque las reglas de ambientacion no lo asignen
+RECURSO_TEMPORALES = 'ARD-TMP'
+
+# Reglas con las que MallaMaxi ambienta cada job temporal, ver structures.ReglasAmbientacion. Los textos pueden usar
+# {mail}, {folder_name}, {caso_d_uso} y {legajo}; las variables además {odate}, que se resuelve por cada replica.
+# Se pueden pisar secciones completas desde un .json con la misma estructura
+REGLAS_AMBIENTACION = {
+    # Texto que se agrega al final del atributo
+    'atributos_agregados': {
+        'DESCRIPTION': '. Creado automáticamente por generador de mallas temporales {caso_d_uso}',
+    },
+    'atributos_eliminados': ['DAYSCAL', 'DAYS'],
+    'atributos': {
+        'SUB_APPLICATION': 'DATIO-AR-P',
+        'MAXWAIT': '0',
+        'PARENT_FOLDER': '{folder_name}',
+        'CREATED_BY': '{legajo}',
+    },
+    # Por cada variable se aplica solamente la primera regla cuyo patron esté en su valor
+    'variables': [
+        {'patron': '%%$ODATE', 'reemplazo': '{odate}'},
+        {'patron': '%%MAIL', 'reemplazo': '{mail}'},
+        {'patron': '.dev', 'reemplazo': '.pro'},
+    ],
+    'recursos_cuantitativos': ['ARD', 'ARD-TMP'],
+    # Acciones por codigo de finalizacion, reemplazan a las que tenga el job. El MESSAGE de los DOMAIL lleva como
+    # prefijo su longitud, se agrega al compilar
+    'acciones': {
+        'NOTOK': [
+            {
+                'accion': 'DOMAIL',
+                'atributos': {
+                    'URGENCY': 'R',
+                    'DEST': 'datio-procesos-live.group@bbva.com',
+                    'CC_DEST': '{mail}',
+                    'SUBJECT': 'Cancelo %%JOBNAME {caso_d_uso} - Temporal',
+                    'MESSAGE': 'Finalizo NOTOK %%JOBNAME {caso_d_uso}. Malla creada automaticamente por el generador de mallas temporales',
+                    'ATTACH_SYSOUT': 'Y'
+                }
+            }
+        ],
+        'OK': [
+            {
+                'accion': 'DOMAIL',
+                'atributos': {
+                    'URGENCY': 'R',
+                    'DEST': 'datio-procesos-live.group@bbva.com',
+                    'CC_DEST': '{mail}',
+                    'SUBJECT': 'OK %%JOBNAME {caso_d_uso} - Temporal',
+                    'MESSAGE': 'Finalizo OK %%JOBNAME {caso_d_uso}. Malla creada automaticamente por el generador de mallas temporales',
+                    'ATTACH_SYSOUT': 'Y'
+                }
+            }
+        ],
+    },
+}
@@ -3,6 +3,7 @@ Este módulo informa aquellos items de elementos de un job que difieren en ambas
 nuevas, cuáles se eliminaron y cuáles se modificaron (ABM). Las diferencias las registra un DiffRecorder
 """
 
+import controlm.traza as traza
 import controlm.utils as utils
 from controlm.constantes import ATRIBUTOS_NO_RELEVANTES
 
@@ -12,6 +13,7 @@ from controlm.structures import ControlmAction
 from controlm.record import DiffRecorder
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def job_nuevo(job: ControlmJob, df: DiffRecorder):
     """
     Genera una 'tabla' que en realizad es una lista de renglones (strings), formateados para que al ser pasados
@@ -47,6 +49,7 @@ def job_nuevo(job: ControlmJob, df: DiffRecorder):
     df.add_listado(job.name, "Job nuevo", tabla)
 
 
+@traza.trazada
 def jobnames(work_jobnames: list, live_jobnames: list, dr: DiffRecorder) -> list:
     """
     Informa ABM de jobnames.
@@ -67,6 +70,7 @@ def jobnames(work_jobnames: list, live_jobnames: list, dr: DiffRecorder) -> list
     return jobs_nuevos
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def atributos(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
     """
     Informa ABM de toodos aquellos aritubos del job que no se encuentren en los no relevantes. Ademas hace una
@@ -106,6 +110,7 @@ def atributos(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
             dr.add_item(workjob.name, f"Se eliminó el atributo [{live_key}] valor: [{livejob.atributos.get(live_key)}]")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def variables(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
     """
     Informa ABM de todas las variables
@@ -128,6 +133,7 @@ def variables(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
             dr.add_item(workjob.name, f"Se eliminó la variable [{live_key}] valor: [{live_value}]")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def marcas(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
     """
     Informa ABM de las marcas In y las OUT
@@ -160,6 +166,7 @@ def marcas(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
         dr.add_listado(workjob.name, f"Se ELIMINARON las siguientes marcas-out", operacion)
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def acciones(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
     """
     Analiza las diferencias entre las condiciones y las acciones agrupadas bajo la misma condicion. Se incluyeron
@@ -310,6 +317,7 @@ def acciones(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
                 # TODO: Falta informar cuando una acción o condición está en LIVE pero no en WORK... pucha
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def recursos_cuantitativos(workjob: ControlmJob, livejob: ControlmJob, dr: DiffRecorder):
 
     # Si no tiene recursos cuantitativos, salir
@@ -0,0 +1,210 @@
+"""
+Estimacion de la duracion de cadenas de jobs a partir de duraciones historicas: ruta critica, inicio más temprano y más
+tardío de cada job y duracion total (makespan). Sirve tanto para la malla origen como para una temporal generada, así
+se puede comparar la linea unica contra los carriles (ver MallaMaxi.replicar_y_enlazar) y dimensionar un reproceso
+contra la ventana batch.
+
+No tiene en cuenta los recursos cuantitativos (ej: ARD-TMP), es decir que supone que todos los jobs que pueden correr en
+paralelo lo hacen.
+"""
+
+import csv
+import sqlite3
+import statistics
+from collections import deque
+
+from controlm.structures import ControlmDigrafo, MallaMaxi
+
+AGREGACIONES = {
+    'media': statistics.fmean,
+    'mediana': statistics.median,
+    'maximo': max,
+    'p90': lambda valores: statistics.quantiles(valores, n=10, method='inclusive')[-1] if len(valores) > 1 else valores[0],
+}
+
+
+def _agregar(historico: dict[str, list[float]], agregacion: str) -> dict[str, float]:
+    try:
+        funcion = AGREGACIONES[agregacion]
+    except KeyError:
+        raise ValueError(f"Agregacion [{agregacion}] invalida, las posibles son {list(AGREGACIONES)}") from None
+    return {jobname: funcion(valores) for jobname, valores in historico.items()}
+
+
+def cargar_duraciones_csv(path: str, agregacion: str = 'media', columna_jobname: str = 'JOBNAME',
+                          columna_duracion: str = 'DURACION') -> dict[str, float]:
+    """
+    Carga duraciones historicas desde un .csv con encabezado, puede haber varias filas (ejecuciones) por job
+
+    :param path: Path del .csv
+    :param agregacion: Cómo se resumen las ejecuciones de un job, ver AGREGACIONES
+    :param columna_jobname: Nombre de la columna con el jobname
+    :param columna_duracion: Nombre de la columna con la duracion, en segundos
+    :return: Diccionario jobname -> duracion estimada en segundos
+    """
+    historico: dict[str, list[float]] = {}
+    with open(path, newline='', encoding='utf-8') as archivo:
+        for fila in csv.DictReader(archivo):
+            duracion = fila[columna_duracion].strip()
+            if not duracion:
+                continue
+            historico.setdefault(fila[columna_jobname].strip(), []).append(float(duracion))
+    return _agregar(historico, agregacion)
+
+
+def _identificador_sqlite(nombre: str) -> str:
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def cargar_duraciones_sqlite(path: str, agregacion: str = 'media', tabla: str = 'duraciones',
+                             columna_jobname: str = 'jobname', columna_duracion: str = 'duracion') -> dict[str, float]:
+    """
+    Igual que cargar_duraciones_csv pero desde una base SQLite, una fila por ejecucion. La tabla y las columnas se
+    validan contra las de la base antes de armar la consulta
+    """
+    historico: dict[str, list[float]] = {}
+    with sqlite3.connect(path) as conexion:
+        columnas = {fila[0] for fila in conexion.execute('SELECT name FROM pragma_table_info(?)', (tabla,))}
+        if not columnas:
+            raise ValueError(f"La tabla [{tabla}] no existe en la base [{path}]")
+        # Como en SQLite, los nombres de las columnas no distinguen mayusculas
+        faltantes = [columna for columna in (columna_jobname, columna_duracion)
+                     if columna.lower() not in {nombre.lower() for nombre in columnas}]
+        if faltantes:
+            raise ValueError(f"Las columnas {faltantes} no existen en la tabla [{tabla}], las posibles son {sorted(columnas)}")
+
+        jobname, duracion = _identificador_sqlite(columna_jobname), _identificador_sqlite(columna_duracion)
+        filas = conexion.execute(
+            f'SELECT {jobname}, {duracion} FROM {_identificador_sqlite(tabla)} WHERE {duracion} IS NOT NULL'
+        )
+        for jobname, duracion in filas:
+            historico.setdefault(jobname, []).append(float(duracion))
+    return _agregar(historico, agregacion)
+
+
+class Estimacion:
+    """
+    Resultado de estimar una cadena, todos los tiempos en segundos desde el inicio de la cadena
+    """
+
+    def __init__(self, duraciones: dict[str, float], inicio_temprano: dict[str, float],
+                 inicio_tardio: dict[str, float], ruta_critica: list[str], sin_historico: list[str]):
+        self.duraciones = duraciones
+        self.inicio_temprano = inicio_temprano
+        self.inicio_tardio = inicio_tardio
+        self.ruta_critica = ruta_critica
+        self.sin_historico = sin_historico  # Jobs para los que se usó la duracion por defecto
+
+    @property
+    def duracion_total(self) -> float:
+        """Makespan: cuándo termina el último job"""
+        return max((self.inicio_temprano[j] + self.duraciones[j] for j in self.duraciones), default=0.0)
+
+    def holgura(self, jobname: str) -> float:
+        """Cuánto se puede demorar el job sin demorar la cadena, 0 para los de la ruta critica"""
+        return self.inicio_tardio[jobname] - self.inicio_temprano[jobname]
+
+    def entra_en_ventana(self, segundos: float) -> bool:
+        return self.duracion_total <= segundos
+
+    def __str__(self):
+        return (f"Duracion total: {self.duracion_total:.0f}s, ruta critica de {len(self.ruta_critica)} jobs: "
+                f"{' -> '.join(self.ruta_critica)}")
+
+
+def estimar(aristas: dict[str, list[str]], duraciones: dict[str, float], duracion_por_defecto: float = 0.0,
+            claves: dict[str, str] = None) -> Estimacion:
+    """
+    Calcula la ruta critica de un digrafo en O(V+E): recorre los jobs en orden topologico calculando el inicio más
+    temprano de cada uno y luego en orden inverso el más tardío
+
+    :param aristas: Diccionario jobname -> jobnames que le siguen. Los sucesores que no son claves se ignoran
+    :param duraciones: Duracion estimada de cada job, ver cargar_duraciones_csv
+    :param duracion_por_defecto: Duracion de los jobs sin historico
+    :param claves: Jobname con el que se busca la duracion de cada job, si no es el propio (ej: el job original de
+        un job temporal)
+    :return: Estimacion de la cadena
+    """
+    claves = claves or {}
+    sin_historico = []
+    duracion = {}
+    for jobname in aristas:
+        clave = claves.get(jobname, jobname)
+        if clave in duraciones:
+            duracion[jobname] = duraciones[clave]
+        else:
+            duracion[jobname] = duracion_por_defecto
+            sin_historico.append(jobname)
+
+    sucesores = {jobname: [s for s in dict.fromkeys(hijos) if s in aristas] for jobname, hijos in aristas.items()}
+    cant_padres = dict.fromkeys(aristas, 0)
+    for hijos in sucesores.values():
+        for hijo in hijos:
+            cant_padres[hijo] += 1
+
+    orden = []
+    pendientes = deque(jobname for jobname, cantidad in cant_padres.items() if cantidad == 0)
+    inicio_temprano = dict.fromkeys(aristas, 0.0)
+    predecesor_critico: dict[str, str | None] = dict.fromkeys(aristas)
+    while pendientes:
+        jobname = pendientes.popleft()
+        orden.append(jobname)
+        fin = inicio_temprano[jobname] + duracion[jobname]
+        for hijo in sucesores[jobname]:
+            if predecesor_critico[hijo] is None or fin > inicio_temprano[hijo]:
+                inicio_temprano[hijo] = fin
+                predecesor_critico[hijo] = jobname
+            cant_padres[hijo] -= 1
+            if cant_padres[hijo] == 0:
+                pendientes.append(hijo)
+
+    if len(orden) != len(aristas):
+        ciclicos = [jobname for jobname, cantidad in cant_padres.items() if cantidad > 0]
+        raise Exception(f"No se puede estimar la cadena debido a que los jobs {ciclicos} tienen una dependencia circular")
+
+    duracion_total = max((inicio_temprano[j] + duracion[j] for j in orden), default=0.0)
+    inicio_tardio = {}
+    for jobname in reversed(orden):
+        fin_tardio = min((inicio_tardio[hijo] for hijo in sucesores[jobname]), default=duracion_total)
+        inicio_tardio[jobname] = fin_tardio - duracion[jobname]
+
+    ruta_critica = []
+    if orden:
+        actual = max(orden, key=lambda j: inicio_temprano[j] + duracion[j])
+        while actual is not None:
+            ruta_critica.append(actual)
+            actual = predecesor_critico[actual]
+        ruta_critica.reverse()
+
+    return Estimacion(duracion, inicio_temprano, inicio_tardio, ruta_critica, sin_historico)
+
+
+def estimar_digrafo(digrafo: ControlmDigrafo, duraciones: dict[str, float], jobnames: list[str] = None,
+                    duracion_por_defecto: float = 0.0) -> Estimacion:
+    """
+    Estima una malla (o parte de ella) a partir de su digrafo
+
+    :param digrafo: Digrafo de la malla o del contenedor
+    :param duraciones: Duracion estimada de cada job
+    :param jobnames: Jobs a estimar (ej: una cadena, ver ControlmDigrafo.recorrer_cadena_completa), por defecto todos
+    :param duracion_por_defecto: Duracion de los jobs sin historico
+    """
+    csr = digrafo.grafo_csr()
+    ids = range(len(csr)) if jobnames is None else (csr.ids[jobname] for jobname in jobnames if jobname in csr.ids)
+    aristas = {csr.nombres[i]: [csr.nombres[h] for h in csr.vecinos(i)] for i in ids}
+    return estimar(aristas, duraciones, duracion_por_defecto)
+
+
+def estimar_temporal(malla_maxi: MallaMaxi, duraciones: dict[str, float], duracion_por_defecto: float = 0.0) -> Estimacion:
+    """
+    Estima una temporal generada (en linea, con carriles o iterando ODATES). La duracion de cada job temporal es la de
+    su job original. Con la temporal iterando ODATES solamente se estima una iteracion
+
+    :param malla_maxi: Temporal ya generada
+    :param duraciones: Duracion estimada de cada job original
+    :param duracion_por_defecto: Duracion de los jobs sin historico
+    """
+    claves = {
+        job.name: getattr(job, 'jobname_plantilla', job.name) for job in malla_maxi.cadena_completa_temporal
+    }
+    return estimar(malla_maxi.aristas_temporal(), duraciones, duracion_por_defecto, claves)
@@ -2,6 +2,8 @@
 
 from abc import abstractmethod
 
+import controlm.traza as traza
+
 
 class Recorder:
     """
@@ -104,6 +106,7 @@ class DiffRecorder(Recorder):
         except KeyError:
             self.info[key] = [item]
 
+    @traza.trazada(atributos=lambda self, filename, *_: {'path': filename})
     def write_log(self, filename: str, info_extra: dict) -> None:
         """
         Escribe en un .log todas las diferencias encontradas. Por cada key tiene sus items
@@ -167,6 +170,7 @@ class ControlRecorder(Recorder):
         """
         self.listados_generales[identificador][1].append(jobname)
 
+    @traza.trazada(atributos=lambda self, filename, *_: {'path': filename})
     def write_log(self, filename: str, info_extra: dict):
         """
         Escribe en un .log todas las controles fallidos. Cada key tiene sus items.
@@ -257,6 +261,11 @@ class RecorderTmp:
         except KeyError:
             self.info[key] = [mensaje_final + '\n']
 
+    def hay_errores(self) -> bool:
+        """Indica si se registró algún control fallido, sin contar los items iniciales"""
+        return any(items for key, items in self.info.items() if key != 'INICIAL')
+
+    @traza.trazada(atributos=lambda self, filename, *_: {'path': filename})
     def write_log(self, filename: str) -> None:
         """Escribe en un .log todos los controles"""
 
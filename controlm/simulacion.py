@@ -0,0 +1,410 @@
+"""
+Simulador de eventos discretos de la ejecucion de una malla (o de una temporal generada) en Control-M. Sirve para
+ver, sin subir nada al servidor, cómo se va a ejecutar: cuánto tarda cada ODATE, cuánto esperan los jobs por los
+recursos cuantitativos (ARD, ARD-TMP, ARD-STG) y qué jobs quedan esperando marcas que nunca llegan.
+
+Semantica que se simula:
+    - Un job arranca cuando están todas las marcas que espera (INCOND, siempre AND) y hay capacidad en todos sus
+      recursos cuantitativos, cada job toma 1 unidad de cada uno
+    - Las marcas son por ODATE: 'ODAT' es el ODATE del job, cualquier otro valor (ej: 'STAT' o una fecha MMDD) se
+      toma literal. Como en control-M, de un ODATE solo cuentan el dia y el mes. El ODATE de un DOFORCEJOB puede ser una variable del job (ej: %%ODATE_ITERACION_01), se resuelve con
+      las variables del job que ordena
+    - Cada ejecucion termina con un codigo de retorno: 0 es OK y cualquier otro NOTOK (ver Simulador, prob_fallo,
+      retornos_fallo y retornos). Al finalizar OK se agregan/eliminan las OUTCOND
+    - Las acciones de los ON se ejecutan según cómo finalizó el job: 'OK', 'NOTOK', '*' (siempre) y las comparaciones
+      contra el codigo de retorno (ej: 'COMPSTAT=7', 'COMPSTAT EQ 7', 'COMPSTAT>0', 'COMPSTAT EQ EVEN'). DOCOND
+      agrega/elimina marcas y DOFORCEJOB ordena una nueva ejecucion del job indicado. Los ON con otros codigos (ej: los
+      que buscan un texto en la salida del job) no se simulan, se informan en ResultadoSimulacion.on_no_simulados
+    - Los jobs Dummy duran 0
+    - Un job se ordena a lo sumo max_ordenes_por_job veces (ver Simulador), si no un DOFORCEJOB sobre sí mismo (ej: un
+      reintento ante un codigo de retorno que siempre se repite) no terminaría nunca. Los jobs que llegaron al limite
+      se informan en ResultadoSimulacion.limitados
+"""
+
+import heapq
+import operator
+import random
+import re
+from collections import deque
+
+from controlm.structures import ControlmJob, MallaMaxi
+
+_REGEX_COMPSTAT = re.compile(r'^COMPSTAT\s*(?P<operador>!=|<>|<=|>=|=|<|>|EQ|NE|LE|GE|LT|GT)\s*(?P<valor>\d+|EVEN|ODD)$')
+_OPERADORES_COMPSTAT = {
+    '=': operator.eq, 'EQ': operator.eq, '!=': operator.ne, '<>': operator.ne, 'NE': operator.ne,
+    '<': operator.lt, 'LT': operator.lt, '<=': operator.le, 'LE': operator.le,
+    '>': operator.gt, 'GT': operator.gt, '>=': operator.ge, 'GE': operator.ge,
+}
+
+
+def _aplica_on(codigo_on: str, codigo: str, retorno: int) -> bool | None:
+    """
+    :param codigo_on: Codigo de un ON, ej: 'NOTOK' o 'COMPSTAT=7'
+    :param codigo: Como finalizó el job, 'OK' o 'NOTOK'
+    :param retorno: Codigo de retorno del job
+    :return: Si se ejecutan las acciones del ON, None si el codigo no se puede simular
+    """
+    if codigo_on in ('OK', 'NOTOK'):
+        return codigo_on == codigo
+    if codigo_on == '*':
+        return True
+
+    match = _REGEX_COMPSTAT.match(codigo_on.strip())
+    if match is None:
+        return None
+    operador, valor = match.group('operador'), match.group('valor')
+    if valor in ('EVEN', 'ODD'):
+        if _OPERADORES_COMPSTAT[operador] not in (operator.eq, operator.ne):
+            return None
+        return _OPERADORES_COMPSTAT[operador](retorno % 2 == 0, valor == 'EVEN')
+    return _OPERADORES_COMPSTAT[operador](retorno, int(valor))
+
+
+class _Ejecucion:
+    """Una orden de un job (el mismo job puede ordenarse varias veces, ej: por DOFORCEJOB)"""
+
+    __slots__ = ('job', 'odate', 'replica', 'faltantes', 'recursos', 'llegada', 'inicio', 'fin', 'codigo', 'retorno',
+                 'encolada')
+
+    def __init__(self, job: ControlmJob, odate: str, recursos: tuple[str, ...]):
+        self.job = job
+        self.odate = odate  # ODATE con el que se ordenó, es el que se usa para las marcas
+        self.replica = getattr(job, 'odate', None) or odate  # ODATE de la replica, en los jobs de una temporal
+        self.faltantes: set[tuple[str, str]] = set()
+        self.recursos = recursos
+        self.llegada = None  # Momento en el que quedó lista (con todas sus marcas) para arrancar
+        self.inicio = None
+        self.fin = None
+        self.codigo = None
+        self.retorno = None
+        self.encolada = False
+
+
+class ResultadoSimulacion:
+    """
+    Resultado de una simulacion, todos los tiempos en segundos desde que se ordena la malla
+    """
+
+    def __init__(self, ejecuciones: list[_Ejecucion], recursos: dict[str, dict[str, float]],
+                 bloqueadas: list[_Ejecucion], on_no_simulados: list[tuple[str, str]] = None,
+                 limitados: list[str] = None):
+        self._ejecuciones = ejecuciones
+        self.recursos = recursos  # Nombre -> espera_total, espera_maxima, cola_maxima, utilizacion
+        self._bloqueadas = bloqueadas
+        self.on_no_simulados = on_no_simulados or []  # (jobname, codigo del ON) de los ON que no se pudieron simular
+        self.limitados = limitados or []  # Jobnames que se dejaron de ordenar al llegar a max_ordenes_por_job
+
+    @property
+    def ejecuciones(self) -> list[tuple[str, str, float, float, str]]:
+        """(jobname, odate, inicio, fin, codigo) de cada ejecucion, en orden de inicio"""
+        return [(e.job.name, e.odate, e.inicio, e.fin, e.codigo) for e in self._ejecuciones]
+
+    @property
+    def duracion_total(self) -> float:
+        return max((e.fin for e in self._ejecuciones), default=0.0)
+
+    @property
+    def throughput(self) -> float:
+        """Jobs finalizados por hora"""
+        return len(self._ejecuciones) * 3600 / self.duracion_total if self.duracion_total else 0.0
+
+    @property
+    def fin_por_odate(self) -> dict[str, float]:
+        """Momento en el que termina el último job de cada ODATE (en una temporal, de cada replica)"""
+        fines = {}
+        for ejecucion in self._ejecuciones:
+            fines[ejecucion.replica] = max(fines.get(ejecucion.replica, 0.0), ejecucion.fin)
+        return dict(sorted(fines.items()))
+
+    @property
+    def bloqueados(self) -> dict[tuple[str, str], list[str]]:
+        """(jobname, odate) -> marcas que esperaba y nunca llegaron, para los jobs que no llegaron a ejecutar"""
+        return {(e.job.name, e.odate): sorted(marca for marca, _ in e.faltantes) for e in self._bloqueadas}
+
+    @property
+    def fallidos(self) -> list[tuple[str, str]]:
+        return [(e.job.name, e.odate) for e in self._ejecuciones if e.codigo != 'OK']
+
+    @property
+    def retornos(self) -> dict[tuple[str, str], int]:
+        """(jobname, odate) -> codigo de retorno de la ultima ejecucion"""
+        return {(e.job.name, e.odate): e.retorno for e in self._ejecuciones}
+
+    def __str__(self):
+        lineas = [
+            f"Ejecuciones: {len(self._ejecuciones)}, fallidas: {len(self.fallidos)}, bloqueadas: {len(self._bloqueadas)}",
+            f"Duracion total: {self.duracion_total:.0f}s, throughput: {self.throughput:.1f} jobs/h",
+        ]
+        for odate, fin in self.fin_por_odate.items():
+            lineas.append(f"\tODATE [{odate}] finaliza a los {fin:.0f}s")
+        if self.on_no_simulados:
+            lineas.append(f"\tON no simulados: {len(self.on_no_simulados)} (ej: {self.on_no_simulados[0]})")
+        if self.limitados:
+            lineas.append(f"\tJobs que llegaron al limite de ordenes: {self.limitados}")
+        for nombre, metricas in self.recursos.items():
+            lineas.append(
+                f"\tRecurso [{nombre}]: espera total {metricas['espera_total']:.0f}s, espera maxima "
+                f"{metricas['espera_maxima']:.0f}s, cola maxima {metricas['cola_maxima']:.0f}, utilizacion "
+                f"{metricas['utilizacion']:.0%}"
+            )
+        return '\n'.join(lineas)
+
+
+class Simulador:
+    """
+    Simula la ejecucion de un conjunto de jobs, ver el docstring del modulo
+    """
+
+    def __init__(self, jobs: list[ControlmJob], capacidades: dict[str, int] = None, duraciones: dict[str, float] = None,
+                 duracion_por_defecto: float = 60.0, variacion: float = 0.0, prob_fallo: float = 0.0,
+                 retornos_fallo: tuple[int, ...] = (1,), retornos: dict[str, int] = None, semilla: int = 0,
+                 max_ordenes_por_job: int = 100):
+        """
+        Constructor
+
+        :param jobs: Jobs que se pueden ordenar
+        :param capacidades: Capacidad de cada recurso cuantitativo, ej: {'ARD-TMP': 5}. Los que no figuran son
+            ilimitados
+        :param duraciones: Duracion de cada job en segundos (ver estimacion.cargar_duraciones_csv). A los jobs
+            temporales se les busca la de su job original
+        :param duracion_por_defecto: Duracion de los jobs sin historico
+        :param variacion: Variacion aleatoria de las duraciones, ej: 0.2 es +-20%
+        :param prob_fallo: Probabilidad de que un job finalice NOTOK
+        :param retornos_fallo: Codigos de retorno posibles de un job que finaliza NOTOK, se elige uno al azar
+        :param retornos: Codigo de retorno fijo de algunos jobs, ej: {'AMOLCP0001': 7}. A los jobs temporales se les
+            busca el de su job original. Tiene prioridad sobre prob_fallo
+        :param semilla: Semilla para que la simulacion sea reproducible
+        :param max_ordenes_por_job: Cantidad maxima de veces que se ordena cada job, las ordenes siguientes se
+            descartan. Evita que la simulacion no termine nunca, ej: un job que se ordena a sí mismo en el NOTOK y
+            siempre falla
+        """
+        self._jobs = {job.name: job for job in jobs}
+        self._capacidades = dict(capacidades or {})
+        self._duraciones = duraciones or {}
+        self._duracion_por_defecto = duracion_por_defecto
+        self._variacion = variacion
+        self._prob_fallo = prob_fallo
+        self._retornos_fallo = tuple(retornos_fallo)
+        if not self._retornos_fallo or 0 in self._retornos_fallo:
+            raise ValueError(f"Los codigos de retorno de fallo deben ser distintos de 0, valor obtenido [{retornos_fallo}]")
+        self._retornos = retornos or {}
+        self._random = random.Random(semilla)
+        if max_ordenes_por_job < 1:
+            raise ValueError(f"La cantidad maxima de ordenes por job debe ser mayor a 0, valor obtenido [{max_ordenes_por_job}]")
+        self._max_ordenes_por_job = max_ordenes_por_job
+
+    def _duracion(self, job: ControlmJob) -> float:
+        if job.atributos.get('TASKTYPE') == 'Dummy':
+            return 0.0
+        duracion = self._duraciones.get(getattr(job, 'jobname_plantilla', job.name), self._duracion_por_defecto)
+        if self._variacion:
+            duracion *= self._random.uniform(1 - self._variacion, 1 + self._variacion)
+        return duracion
+
+    def _retorno(self, job: ControlmJob) -> int:
+        retorno = self._retornos.get(getattr(job, 'jobname_plantilla', job.name))
+        if retorno is not None:
+            return retorno
+        if self._random.random() < self._prob_fallo:
+            return self._random.choice(self._retornos_fallo)
+        return 0
+
+    @staticmethod
+    def _odate_marca(odate_marca: str | None, odate_job: str, job: ControlmJob = None) -> str:
+        if odate_marca is not None and job is not None and '%%' in odate_marca:
+            odate_marca = job.expandir_string(odate_marca)  # Ej: el ODATE de los DOFORCEJOB del job iterador
+        return odate_job if odate_marca in (None, 'ODAT') else odate_marca
+
+    @staticmethod
+    def _clave_marca(nombre: str, odate_marca: str) -> tuple[str, str]:
+        """Las marcas de control-M guardan la fecha como MMDD, sin año"""
+        if len(odate_marca) == 8 and odate_marca.isdigit():
+            odate_marca = odate_marca[4:]
+        return nombre, odate_marca
+
+    def simular(self, iniciales: list[str] = None, odate: str = '00000000') -> ResultadoSimulacion:
+        """
+        Ejecuta la simulacion
+
+        :param iniciales: Jobnames que se ordenan al comienzo, por defecto todos (como al ordenar la malla)
+        :param odate: ODATE con el que se ordenan los jobs iniciales
+        :return: Resultado de la simulacion
+        """
+        capacidades = self._capacidades
+        libres = dict(capacidades)
+        metricas = {
+            nombre: {'espera_total': 0.0, 'espera_maxima': 0.0, 'cola_maxima': 0, 'utilizacion': 0.0, '_ocupado': 0.0}
+            for nombre in capacidades
+        }
+
+        presentes: set[tuple[str, str]] = set()
+        esperando: dict[tuple[str, str], set[_Ejecucion]] = {}  # Marca -> ejecuciones sin arrancar que la esperan
+        colas: dict[tuple[str, ...], deque[_Ejecucion]] = {}  # Por combinacion de recursos limitados, FIFO
+        encoladas_por_recurso = dict.fromkeys(capacidades, 0)
+        eventos: list[tuple[float, int, _Ejecucion]] = []
+        secuencia = 0
+        finalizadas: list[_Ejecucion] = []
+        pendientes: set[_Ejecucion] = set()
+        on_no_simulados: dict[tuple[str, str], None] = {}  # Como un set, respeta el orden en que aparecen
+        ordenes: dict[str, int] = {}
+        limitados: dict[str, None] = {}
+        ahora = 0.0
+
+        def ordenar(job: ControlmJob, odate_orden: str):
+            if ordenes.get(job.name, 0) >= self._max_ordenes_por_job:
+                limitados[job.name] = None
+                return
+            ordenes[job.name] = ordenes.get(job.name, 0) + 1
+            recursos = tuple(sorted({r.name for r in job.recursos_cuantitativos if r.name in capacidades}))
+            ejecucion = _Ejecucion(job, odate_orden, recursos)
+            for marca_in in job.marcasin or []:
+                marca = self._clave_marca(marca_in.name, self._odate_marca(marca_in.odate, odate_orden))
+                esperando.setdefault(marca, set()).add(ejecucion)
+                if marca not in presentes:
+                    ejecucion.faltantes.add(marca)
+            pendientes.add(ejecucion)
+            if not ejecucion.faltantes:
+                encolar(ejecucion)
+
+        def encolar(ejecucion: _Ejecucion):
+            if ejecucion.encolada:
+                return
+            ejecucion.encolada = True
+            ejecucion.llegada = ahora
+            colas.setdefault(ejecucion.recursos, deque()).append(ejecucion)
+            for recurso in ejecucion.recursos:
+                encoladas_por_recurso[recurso] += 1
+                metricas[recurso]['cola_maxima'] = max(metricas[recurso]['cola_maxima'], encoladas_por_recurso[recurso])
+
+        def arrancar_posibles():
+            nonlocal secuencia
+            while True:
+                # Entre las colas cuya cabeza tiene capacidad, arranca la que llegó primero
+                elegida = None
+                for recursos, cola in colas.items():
+                    while cola and (cola[0].faltantes or not cola[0].encolada):
+                        descartada = cola.popleft()  # Le eliminaron una marca mientras esperaba recursos
+                        descartada.encolada = False
+                        for recurso in descartada.recursos:
+                            encoladas_por_recurso[recurso] -= 1
+                    if cola and all(libres[r] > 0 for r in recursos):
+                        if elegida is None or cola[0].llegada < elegida[0].llegada:
+                            elegida = cola
+                if elegida is None:
+                    return
+
+                ejecucion = elegida.popleft()
+                ejecucion.encolada = False
+                for recurso in ejecucion.recursos:
+                    libres[recurso] -= 1
+                    encoladas_por_recurso[recurso] -= 1
+                    espera = ahora - ejecucion.llegada
+                    metricas[recurso]['espera_total'] += espera
+                    metricas[recurso]['espera_maxima'] = max(metricas[recurso]['espera_maxima'], espera)
+                pendientes.discard(ejecucion)
+                for marca_in in ejecucion.job.marcasin or []:
+                    esperando[self._clave_marca(marca_in.name, self._odate_marca(marca_in.odate, ejecucion.odate))].discard(ejecucion)
+
+                ejecucion.inicio = ahora
+                ejecucion.fin = ahora + self._duracion(ejecucion.job)
+                ejecucion.retorno = self._retorno(ejecucion.job)
+                ejecucion.codigo = 'OK' if ejecucion.retorno == 0 else 'NOTOK'
+                secuencia += 1
+                heapq.heappush(eventos, (ejecucion.fin, secuencia, ejecucion))
+
+        def cambiar_marca(nombre: str, odate_marca: str, signo: str):
+            marca = self._clave_marca(nombre, odate_marca)
+            if signo == '+':
+                if marca in presentes:
+                    return
+                presentes.add(marca)
+                for ejecucion in esperando.get(marca, ()):
+                    ejecucion.faltantes.discard(marca)
+                    if not ejecucion.faltantes:
+                        encolar(ejecucion)
+            elif marca in presentes:
+                presentes.discard(marca)
+                for ejecucion in esperando.get(marca, ()):
+                    ejecucion.faltantes.add(marca)
+
+        def finalizar(ejecucion: _Ejecucion):
+            job = ejecucion.job
+            for recurso in ejecucion.recursos:
+                libres[recurso] += 1
+                metricas[recurso]['_ocupado'] += ejecucion.fin - ejecucion.inicio
+
+            acciones = []
+            for codigo_on, actions in job.onconditions.items():
+                aplica = _aplica_on(codigo_on, ejecucion.codigo, ejecucion.retorno)
+                if aplica is None:
+                    on_no_simulados[(job.name, codigo_on)] = None
+                elif aplica:
+                    acciones.extend(actions)
+            # Las DOCOND ya vienen como marcasout al parsear el xml, pero se aplican solamente como acciones
+            docond = {
+                (action.attrs.get('NAME'), action.attrs.get('SIGN'))
+                for actions in job.onconditions.values() for action in actions if action.id == 'DOCOND'
+            }
+
+            if ejecucion.codigo == 'OK':
+                for marca_out in job.marcasout or []:
+                    if marca_out.mediante_accion and (marca_out.name, marca_out.signo) in docond:
+                        continue
+                    cambiar_marca(marca_out.name, self._odate_marca(marca_out.odate, ejecucion.odate), marca_out.signo)
+
+            for action in acciones:
+                if action.id == 'DOCOND':
+                    cambiar_marca(action.attrs.get('NAME'), self._odate_marca(action.attrs.get('ODATE'), ejecucion.odate),
+                                  action.attrs.get('SIGN'))
+                elif action.id == 'DOFORCEJOB' and action.attrs.get('NAME') in self._jobs:
+                    ordenar(self._jobs[action.attrs['NAME']],
+                            self._odate_marca(action.attrs.get('ODATE'), ejecucion.odate, job))
+
+        for jobname in (self._jobs if iniciales is None else iniciales):
+            ordenar(self._jobs[jobname], odate)
+        arrancar_posibles()
+
+        while eventos:
+            ahora, _, ejecucion = heapq.heappop(eventos)
+            finalizar(ejecucion)
+            finalizadas.append(ejecucion)
+            # Procesamos todos los jobs que terminan en el mismo instante antes de asignar recursos
+            while eventos and eventos[0][0] == ahora:
+                _, _, ejecucion = heapq.heappop(eventos)
+                finalizar(ejecucion)
+                finalizadas.append(ejecucion)
+            arrancar_posibles()
+
+        duracion_total = max((e.fin for e in finalizadas), default=0.0)
+        for nombre, valores in metricas.items():
+            ocupado = valores.pop('_ocupado')
+            capacidad_total = capacidades[nombre] * duracion_total
+            valores['utilizacion'] = ocupado / capacidad_total if capacidad_total else 0.0
+
+        finalizadas.sort(key=lambda e: (e.inicio, e.fin))
+        if on_no_simulados:
+            print(f"WARNING: No se simularon las acciones de {len(on_no_simulados)} ON con codigos que no dependen del "
+                  f"codigo de retorno, ej: {next(iter(on_no_simulados))}")
+        if limitados:
+            print(f"WARNING: Se dejaron de ordenar los jobs {list(limitados)} al llegar a {self._max_ordenes_por_job} "
+                  f"ordenes cada uno")
+        return ResultadoSimulacion(finalizadas, metricas, sorted(pendientes, key=lambda e: (e.job.name, e.odate)),
+                                   list(on_no_simulados), list(limitados))
+
+
+def simular_temporal(malla_maxi: MallaMaxi, capacidades: dict[str, int] = None, **kwargs) -> ResultadoSimulacion:
+    """
+    Simula una temporal generada. Si los jobs se ordenan entre sí (configurada con force o iterando ODATES) al
+    comienzo se ordenan solamente los jobs que no ordena ningun otro, si no se ordenan todos como al ordenar la malla
+
+    :param malla_maxi: Temporal ya ambientada
+    :param capacidades: Capacidad de cada recurso cuantitativo, ej: {'ARD-TMP': 5}
+    :param kwargs: Ver Simulador
+    """
+    jobs = malla_maxi.cadena_completa_temporal
+    forzados = {
+        action.attrs.get('NAME')
+        for job in jobs for actions in job.onconditions.values() for action in actions if action.id == 'DOFORCEJOB'
+    }
+    iniciales = [job.name for job in jobs if job.name not in forzados] if forzados else None
+    return Simulador(jobs, capacidades, **kwargs).simular(iniciales)
@@ -5,59 +5,200 @@ Modulo que contiene todas las clases correspondientes a elementos notables de co
 from __future__ import annotations
 
 import itertools
+import json
 import os
 import re
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections import OrderedDict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import BooleanVar
 
+from typing import Iterable
 from typing import Literal
 from copy import deepcopy
+from functools import cached_property
+from operator import itemgetter
 from xml.etree.ElementTree import Element
 from xml.etree.ElementTree import ParseError
 from xml.etree.ElementTree import parse
 
+import controlm.traza as traza
 import controlm.utils as utils
 from controlm.constantes import Regex
 from controlm.constantes import TagXml
 from controlm.constantes import Limits
+from controlm.constantes import REGLAS_AMBIENTACION
+from controlm.constantes import RECURSO_TEMPORALES
+from controlm.constantes import ATRIBUTOS_SIN_INTERNAR
+from controlm.constantes import VARIABLES_TABLA
+
+_REGEX_VARIABLE = re.compile(Regex.VARIABLE)
+_REGEX_JOBNAME = re.compile(Regex.JOBNAME)
+_REGEX_APPLICATION = re.compile(Regex.APPLICATION)
+_REGEX_DATAPROC_JOB_ID = re.compile(Regex.DATAPROC_JOB_ID)
+_REGEX_DATAPROC_NAMESPACE = re.compile(Regex.DATAPROC_NAMESPACE)
+_ATRIBUTOS_SIN_INTERNAR = frozenset(ATRIBUTOS_SIN_INTERNAR)
+# Tokens del indice de texto: variables (%%NOMBRE) y lo que queda entre separadores (espacios, /, =, comillas, etc)
+_REGEX_TOKEN_TEXTO = re.compile(r"%%[A-Za-z0-9_$#@]+|[^\s/\\=,;:'\"()\[\]{}<>|%]+")
+_REGEX_PARTES_TOKEN = re.compile(r'[.\-]+')
+
+
+class TablaInternado(dict):
+    """
+    Tabla de strings compartidos entre los jobs que se cargan de un mismo export. ElementTree devuelve un string nuevo
+    por cada atributo de cada elemento, aunque se repitan en todos los jobs (ej: APPLICATION, NODEID, RUN_AS, los
+    nombres de los atributos y variables, los RRCC, los ODATE de las marcas). Pasando cada string por la tabla, todos
+    los jobs referencian al mismo objeto y el resto se libera junto con el xml.
+
+    Se usa como un diccionario: tabla[string] devuelve el string ya guardado igual a este, o lo guarda si es el primero
+    """
+
+    def __missing__(self, string: str) -> str:
+        self[string] = string
+        return string
 
 
 class ControlmContainer:
+    """
+    Contenedor de todas las mallas de un export de control m (ej: el global de produccion). Sobre este se realizan
+    los controles globales, es decir, aquellos que necesitan informacion de varias mallas a la vez
+    """
+
+    @traza.trazada(nombre='ControlmContainer', atributos=lambda self, *_, **__: {'mallas': len(self.mallas), 'jobs': len(self._jobs)})
+    def __init__(self, workspace: str | Element, digrafo_compacto: bool = False, indice_texto: bool | str = False):
+        """
+        Constructor
+
+        :param workspace: Path o elemento raiz (DEFTABLE) del xml exportado que contiene todas las mallas
+        :param digrafo_compacto: Si es True el digrafo global se guarda con ids enteros y arrays CSR (ver
+            ControlmDigrafoCompacto), recomendable para el global de produccion
+        :param indice_texto: Si es True se arma, junto con la carga, el indice de texto de las variables, comandos y
+            descripciones de los jobs (ver ControlmIndiceTexto). Si es un path, además se guarda en él, y si ya existe
+            uno guardado para el mismo export (mismo archivo, tamaño y fecha de modificacion) se carga en lugar de
+            armarlo
+        """
+
+        huella = ControlmIndiceTexto.huella_export(workspace) if isinstance(workspace, str) else None
+        self.indice_texto: ControlmIndiceTexto | None = None
+        if isinstance(indice_texto, str):
+            self.indice_texto = ControlmIndiceTexto.cargar(indice_texto, huella)
+        armar_indice_texto = indice_texto is not False and self.indice_texto is None
+        if armar_indice_texto:
+            self.indice_texto = ControlmIndiceTexto()
 
-    def __init__(self, workspace: Element):
+        if isinstance(workspace, str):
+            try:
+                workspace = parse(workspace).getroot()
+            except ParseError as error_xml:
+                mensaje = f"Archivo xml [{workspace}] corrupto o mal formado. Revisar que posea el formato correcto de xml y respete la estructura de un export de Control-m"
+                raise ParseError(mensaje) from error_xml
 
         self.mallas = []
         self._jobs = dict()
-        for malla_productiva in workspace.findall('FOLDER'):
-            malla_obj = ControlmFolder(malla_productiva)
+        self._mallas_jobs: dict[str, ControlmFolder] = dict()
+        self._mallas_por_nombre: dict[str, ControlmFolder] = dict()
+        self.indice_marcas = ControlmIndiceMarcas()
+        self.internado = TablaInternado()  # Compartida entre todas las mallas
+        for malla_productiva in workspace.findall(TagXml.FOLDER):
+            malla_obj = ControlmFolder(malla_productiva, self.internado)
             self.mallas.append(malla_obj)
+            self._mallas_por_nombre.setdefault(malla_obj.name, malla_obj)
 
             for job in malla_obj.jobs():
                 self._jobs[job.name] = job
+                self._mallas_jobs[job.name] = malla_obj
+                self.indice_marcas.agregar_job(job)
+                if armar_indice_texto:
+                    self.indice_texto.agregar_job(job)
+
+        if armar_indice_texto and isinstance(indice_texto, str):
+            self.indice_texto.guardar(indice_texto, huella)
+
+        # Digrafo global, las cadenas pueden atravesar varias mallas
+        clase_digrafo = ControlmDigrafoCompacto if digrafo_compacto else ControlmDigrafo
+        self.digrafo = clase_digrafo(
+            list(self._jobs.values()),
+            indice_marcas=self.indice_marcas,
+            mallas={jobname: malla.name for jobname, malla in self._mallas_jobs.items()}
+        )
+
+        # Indices, tabla columnar y linaje de tablas para los analisis globales, se arman recién cuando se piden. Asi
+        # la carga no paga la inferencia de fase, dataproc, etc de todos los jobs si no se consultan
+        self._indice_jobs: ControlmIndiceJobs | None = None
+        self._tabla_jobs: ControlmTablaJobs | None = None
+        self._linaje: ControlmLinaje | None = None
+
+    @property
+    def indice_jobs(self) -> ControlmIndiceJobs:
+        """Indices de los jobs del contenedor (ver ControlmIndiceJobs), se arman la primera vez que se piden"""
+        if self._indice_jobs is None:
+            self._indice_jobs = ControlmIndiceJobs(
+                list(self._jobs.values()),
+                {jobname: malla.name for jobname, malla in self._mallas_jobs.items()}
+            )
+        return self._indice_jobs
+
+    @property
+    def tabla_jobs(self) -> ControlmTablaJobs:
+        """Tabla columnar de los jobs del contenedor (ver ControlmTablaJobs), se arma la primera vez que se pide"""
+        if self._tabla_jobs is None:
+            self._tabla_jobs = ControlmTablaJobs(
+                list(self._jobs.values()),
+                {jobname: malla.name for jobname, malla in self._mallas_jobs.items()}
+            )
+        return self._tabla_jobs
+
+    @property
+    def linaje(self) -> ControlmLinaje:
+        """Linaje de las tablas de los jobs del contenedor (ver ControlmLinaje), se arma la primera vez que se pide"""
+        if self._linaje is None:
+            self._linaje = ControlmLinaje(self._jobs, self.digrafo, self._indice_jobs)  # Si ya está armado lo usa
+        return self._linaje
 
     def get_malla(self, nombre_malla) -> ControlmFolder | None:
-        for malla in self.mallas:
-            if malla.name == nombre_malla:
-                return malla
-        return None
+        return self._mallas_por_nombre.get(nombre_malla)  # Si hay dos con el mismo nombre, la primera
+
+    def consulta(self, **condiciones) -> ControlmConsulta:
+        """
+        Consulta sobre los indices de jobs del contenedor, ver ControlmConsulta. Ej:
+        contenedor.consulta(uuaa='AMOL', ruta_critica=True).jobs()
+
+        :param condiciones: campo=valor o campo=[valores], ver ControlmIndiceJobs.campos
+        :return: La consulta, se resuelve al pedir sus jobnames o jobs
+        """
+        return ControlmConsulta(self.indice_jobs, self._jobs).donde(**condiciones)
 
     def get_job(self, jobname: str) -> ControlmJob:
         return self._jobs[jobname]  # Para acceso O(1)
 
-    def get_prerequisitos_globales(self) -> dict[str, str]:
-        prerequisitos_globales = dict()
-        for malla in self.mallas:
-            for job in malla.jobs():
-                for prereq in job.get_prerequisitos():
-                    prerequisitos_globales[job.name] = prereq
-        return prerequisitos_globales
+    def get_malla_job(self, jobname: str) -> ControlmFolder:
+        """
+        Devuelve la malla a la que pertenece un job del contenedor
+
+        :param jobname: Jobname del job a buscar
+        :return: La malla que contiene al job
+        """
+        return self._mallas_jobs[jobname]
+
+    def get_prerequisitos_globales(self) -> dict[str, list[str]]:
+        """
+        Devuelve todos los prerequisitos de todos los jobs del contenedor
+
+        :return: Diccionario jobname -> lista de prerequisitos del job
+        """
+        return {jobname: job.get_prerequisitos() for jobname, job in self._jobs.items()}
+
+    def get_acciones_marca_globales(self) -> dict[str, list[str]]:
+        """
+        Devuelve todas las marcas out (acciones) de todos los jobs del contenedor
 
-    def get_acciones_marca_globales(self) -> dict[str, ControlmMarcaOut]:
-        prerequisitos_globales = dict()
-        for malla in self.mallas:
-            for job in malla.jobs():
-                for prereq in job.get_acciones_marcas():
-                    prerequisitos_globales[job.name] = prereq
-        return prerequisitos_globales
+        :return: Diccionario jobname -> lista de marcas out del job
+        """
+        return {jobname: job.get_acciones_marcas() for jobname, job in self._jobs.items()}
 
 
 class ControlmFolder:
@@ -65,11 +206,15 @@ class ControlmFolder:
     Representacion de una malla de control M que contiene jobs
     """
 
-    def __init__(self, xml_input: str | Element):
+    @traza.trazada(nombre='ControlmFolder', atributos=lambda self, *_: {'carpeta': self.name, 'jobs': len(self._jobs)})
+    def __init__(self, xml_input: str | Element, internado: TablaInternado = None):
         """
-        Constructor
+        Constructor. Del xml solamente se guardan los atributos de la carpeta y los elementos de los jobs que todavía
+        no se decodificaron (ver ControlmJob), asi el resto del arbol se libera apenas se carga la malla
 
         :param xml_input: Path o elemento al archivo xml donde se encuentra la malla de control m exportada
+        :param internado: Tabla de strings compartidos entre los jobs, ej: la de un ControlmContainer. Si no se provee
+            la malla usa una propia
         """
         # TODO: Migrar atributos a propiedades
 
@@ -78,18 +223,18 @@ class ControlmFolder:
             self.filename = xml_input
 
             try:
-                self._tree = parse(xml_input)
-                self._root = self._tree.getroot()
-                self._base = self._root.find(TagXml.FOLDER)
-                self.name = self._base.get(TagXml.NOMBRE_MALLA)
+                base = parse(xml_input).getroot().find(TagXml.FOLDER)
+                self.name = base.get(TagXml.NOMBRE_MALLA)
             except (ParseError, AttributeError) as error_xml:
                 mensaje = f"Archivo xml [{xml_input}] corrupto o mal formado. Revisar que posea el formato correcto de xml y respete la estructura de malla exportada de Control-m"
                 raise ParseError(mensaje) from error_xml
 
         elif isinstance(xml_input, Element):
+            self.filename = None
             try:
-                self._base = xml_input.find(TagXml.FOLDER)
-                self.name = self._base.get(TagXml.NOMBRE_MALLA)
+                # Puede venir el DEFTABLE con la malla o directamente la malla, ej: desde un ControlmContainer
+                base = xml_input if xml_input.tag == TagXml.FOLDER else xml_input.find(TagXml.FOLDER)
+                self.name = base.get(TagXml.NOMBRE_MALLA)
             except (ParseError, AttributeError) as error_xml:
                 mensaje = f"Elemento [{xml_input}] corrupto o mal formado. Revisar que posea el formato correcto de xml y respete la estructura de malla exportada de Control-m"
                 raise Exception(mensaje) from error_xml
@@ -105,10 +250,14 @@ class ControlmFolder:
                                  f"el archivo [{xml_input}]. Para realizar el analisis es obligatorio que cumpla con "
                                  f"el estandar definido por el regex [{Regex.MALLA}]")
 
+        self.internado = internado if internado is not None else TablaInternado()
+        self._atributos: dict[str, str] = {self.internado[clave]: valor for clave, valor in base.items()}
+
         self._jobs: dict[str, ControlmJob] = dict()
-        for job_element in self._base.findall(TagXml.JOB):
+        for job_element in base.findall(TagXml.JOB):
             try:
-                job_ctrlm = ControlmJob(job_element, self.filename)
+                with traza.span('ControlmJob', job=job_element.get(TagXml.JOB_NAME)):
+                    job_ctrlm = ControlmJob(job_element, self.filename, self.internado)
             except Exception as error_carga_job:
                 mensaje = f"Ocurrió un error inesperado al cargar la informacion del xml sobre el job [{job_element.get(TagXml.JOB_NAME)}] en la malla [{self.filename}]"
                 raise Exception(mensaje) from error_carga_job
@@ -121,8 +270,8 @@ class ControlmFolder:
 
         setattr(ControlmJob, 'malla', self)
 
-        # Armamos el digrafo de la malla
-        self.digrafo = ControlmDigrafo(list(self._jobs.values()))
+        # El digrafo de la malla se arma recién cuando se pide (ej: no hace falta para listar los jobnames)
+        self._digrafo: ControlmDigrafo | None = None
 
     def jobnames(self) -> list[str]:
         """
@@ -144,6 +293,13 @@ class ControlmFolder:
         """
         return self._jobs.get(jobname_a_buscar, None)
 
+    @property
+    def digrafo(self) -> ControlmDigrafo:
+        """Digrafo de la malla, se arma la primera vez que se pide"""
+        if self._digrafo is None:
+            self._digrafo = ControlmDigrafo(list(self._jobs.values()), mallas=dict.fromkeys(self._jobs, self.name))
+        return self._digrafo
+
     @property
     def uuaa(self) -> str:
         return self._match.group('uuaa')
@@ -154,11 +310,100 @@ class ControlmFolder:
 
     @property
     def order_method(self) -> str:
-        return self._base.get('FOLDER_ORDER_METHOD')
+        return self._atributos.get('FOLDER_ORDER_METHOD')
 
     @property
     def datacenter(self) -> str:
-        return self._base.get('DATACENTER')
+        return self._atributos.get('DATACENTER')
+
+
+class _DecodificadoDelXml:
+    """
+    Atributo de ControlmJob que se arma a partir de los hijos del elemento xml del job. La primera vez que se accede a
+    alguno de ellos se decodifican todos (ver ControlmJob._decodificar) y quedan guardados en el job, por lo que a partir
+    de ahí el acceso es directo, sin pasar por aca
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, job, owner=None):
+        if job is None:
+            return self
+        job._decodificar()
+        return job.__dict__[self.name]
+
+
+class VariablesJob(dict):
+    """
+    Variables de un job. Es un dict que, cada vez que se modifica, descarta las expansiones y propiedades cacheadas del
+    job (ver ControlmJob.invalidar_expansiones), asi job.variables['%%X'] = ... no deja valores viejos en la expansion
+    de strings, el dataproc o la fase. Las copias (deepcopy, pickle) son dicts comunes, el job copiado las vuelve a
+    envolver (ver ControlmJob.__setstate__)
+    """
+
+    def __init__(self, job: ControlmJob, variables: dict[str, str] = None):
+        super().__init__(variables or {})
+        self._job = job
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    def __setitem__(self, nombre, valor):
+        super().__setitem__(nombre, valor)
+        self._job.invalidar_expansiones()
+
+    def __delitem__(self, nombre):
+        super().__delitem__(nombre)
+        self._job.invalidar_expansiones()
+
+    def __ior__(self, otras):
+        super().__ior__(otras)
+        self._job.invalidar_expansiones()
+        return self
+
+    def pop(self, *args):
+        valor = super().pop(*args)
+        self._job.invalidar_expansiones()
+        return valor
+
+    def popitem(self):
+        item = super().popitem()
+        self._job.invalidar_expansiones()
+        return item
+
+    def setdefault(self, nombre, valor=None):
+        valor = super().setdefault(nombre, valor)
+        self._job.invalidar_expansiones()
+        return valor
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._job.invalidar_expansiones()
+
+    def clear(self):
+        super().clear()
+        self._job.invalidar_expansiones()
+
+
+class _VariablesDelXml(_DecodificadoDelXml):
+    """
+    Como _DecodificadoDelXml, pero al asignar las variables (job.variables = {...}) se envuelven en un VariablesJob y
+    se descartan las expansiones cacheadas del job
+    """
+
+    def __get__(self, job, owner=None):
+        if job is None:
+            return self
+        try:
+            return job.__dict__['variables']
+        except KeyError:
+            job._decodificar()
+            return job.__dict__['variables']
+
+    def __set__(self, job, variables: dict[str, str]):
+        job.__dict__['variables'] = VariablesJob(job, variables)
+        job.invalidar_expansiones()
 
 
 class ControlmJob:
@@ -182,197 +427,192 @@ class ControlmJob:
     }
 
     cant_max_iteraciones = 10  # Para la expansion de strings, que nadie se haga el vivo aca
+    cant_max_cache_expansiones = 128
+
+    # Fase de un job segun (tipo del jobname, tipo del dataproc, subtipo del dataproc). El valor es la fase o el nombre
+    # del método que la infiere; si el método no puede inferirla (devuelve None) se sigue buscando con la siguiente
+    # clave, ver fase. Un subtipo terminado en * es un prefijo (ej: 'in*' para inm, inr, ins). Esta es una de las peores
+    # partes de la clase, la cantidad de suposiciones que se tienen que hacer es exageradamente alta. Proceder con
+    # precaución
+    reglas_fase: dict[tuple[str, str | None, str | None], str] = {
+        # Transmision
+        ('P', None, None): 'staging',
+        ('T', None, None): 'staging',
+        # Borrado, hay que ver a qué path apuntan las variables
+        ('B', 'dfs', None): '_fase_por_paths',
+        ('B', None, 'rmv'): '_fase_por_paths',
+        ('S', 'dfs', None): '_fase_por_paths',
+        ('S', None, 'rmv'): '_fase_por_paths',
+        # Ingesta, o bien, mover cosas de un lado a otro. Proceso spark o tablon, es de master (deberia...)
+        ('C', 'spk', None): 'master',
+        ('C', 'biz', None): 'master',
+        ('C', 'psp', None): 'master',
+        ('C', 'sbx', None): 'master',
+        ('C', 'hmm', None): 'master',
+        ('C', 'krb', 'trn'): 'master',
+        ('C', 'krb', 'in*'): '_fase_sufijo_subtipo',
+        ('C', None, None): '_fase_renombrado',
+        # Hammurabi
+        ('V', 'spk', 'qlt'): '_fase_calidad',
+        ('V', 'hmm', 'qlt'): '_fase_calidad',
+        ('V', 'hmm', 'trn'): 'master',
+    }
 
-    def __init__(self, xml_element: Element, filename: str):
+    # Fase segun la ultima letra de un nombre o subtipo del dataproc
+    _fases_por_sufijo = {'m': 'master', 'r': 'raw', 's': 'staging'}
+
+    def __init__(self, xml_element: Element, filename: str, internado: TablaInternado = None):
         """
-        Constructor
+        Constructor. Solamente se leen los atributos del job, el resto (variables, marcas, recursos, acciones) se
+        decodifica del elemento xml la primera vez que se pide alguno de ellos (ver _decodificar). Lo mismo pasa con
+        la informacion que se deriva del job (matches de jobname, application y dataproc, fase), que se calcula al
+        pedirla y queda guardada hasta que se modifique el job (ver invalidar_expansiones). Asi cargar una malla para
+        listar sus jobnames no paga el costo de armar todo lo demás
 
         :param xml_element: Elemento padre xml, es aquel que contiene el tag JOB
         :param filename: Nombre del archivo xml del cual se lee, se utiliza para informar en caso de error
+        :param internado: Tabla de strings compartidos con el resto de los jobs de la malla o el contenedor. Si no se
+            provee el job usa una propia
         """
+        self._internado = internado if internado is not None else TablaInternado()
 
-        self.atributos: dict = {i[0]: i[1] for i in xml_element.items()}
-
-        self._match_jobname = re.search(Regex.JOBNAME, self.name)
-        self._match_app = re.search(Regex.APPLICATION, self.atributos['APPLICATION'])
-        self._match_dataproc_id = None
-        self._match_dataproc_namespace = None
-
-        # Variables
-        self.variables = dict()
-        for var in xml_element.iterfind('VARIABLE'):
-            var_name = var_value = None
-            for xml_name, xml_value in var.items():
-                if xml_name == 'NAME':
-                    var_name = xml_value
-                elif xml_name == 'VALUE':
-                    var_value = xml_value
-
-                    # Aprovechamos que estamos recorriendo las variables para ver el match con los datapros
-                    match_dp_id = re.search(Regex.DATAPROC_JOB_ID, xml_value)
-                    if match_dp_id is not None:
-                        self._match_dataproc_id = match_dp_id
-
-                    match_dp_nm = re.search(Regex.DATAPROC_NAMESPACE, xml_value)
-                    if match_dp_nm is not None:
-                        self._match_dataproc_namespace = match_dp_nm
-
-            if var_name in self.variables.keys():
-                print(
-                    f"WARNING: EXISTE UNA VARIABLE DUPLICADA [{var_name}], JOBNAME [{self.name}] EN LA MALLA[{filename}]. "
-                    f"SE OMITIRÁ DE LOS CONTROLES Y DIFERENCIAS DE LAS VARIABLES. SOLUCIONARLO ANTES DE REALIZAR EL "
-                    f"PASAJE A LIVE YA QUE VA A GENERAR COMPORTAMIENTO IMPREDECIBLE EN CONTROL-M Y EN EL CONTRASTADOR."
-                )
-            else:
-                self.variables[var_name] = var_value
-
-        # TODO: implementar la estructura de datos que guarde el scheduling, nota: Robar el código de Ailu :^)
-        self.scheduling = None
-
-        # Prerequisitos(Marcas-in)
-        self.marcasin: list[ControlmMarcaIn] = []
-        for incond in xml_element.iterfind(TagXml.MARCA_IN):
-            aux_name = aux_odate = None
-            for key, value in incond.items():
-                if key == 'NAME':
-                    aux_name = value
-                elif key == 'ODATE':
-                    aux_odate = value
-            self.marcasin.append(ControlmMarcaIn(aux_name, aux_odate))
-
-        # Marcasout(acciones de marca)
-        self.marcasout: list[ControlmMarcaOut] = []
-        for incond in xml_element.iterfind(TagXml.MARCA_OUT):
-            aux_name = aux_odate = aux_sign = None
-            for key, value in incond.items():
-                if key == 'NAME':
-                    aux_name = value
-                elif key == 'ODATE':
-                    aux_odate = value
-                elif key == 'SIGN':
-                    aux_sign = value
-            self.marcasout.append(
-                ControlmMarcaOut(
-                    marca_nombre=aux_name,
-                    odate_esperado=aux_odate,
-                    signo=aux_sign,
-                    mediante_accion=False
-                )
-            )
+        self.atributos: dict = self._internar_atributos(xml_element)
+        self.invalidar_expansiones()
 
-        # Marcasout(pero ahora con aquellas que son mediante una condicion, ej: retorno 7)
-        for on_group in xml_element.iterfind(TagXml.ON_CONDITION):
-            for on_action in on_group.iterfind(TagXml.ON_DOCOND):
-                self.marcasout.append(
-                    ControlmMarcaOut(
-                        marca_nombre=on_action.get('NAME'),
-                        odate_esperado=on_action.get('ODATE'),
-                        signo=on_action.get('SIGN'),
-                        mediante_accion=True
-                    )
-                )
+        self._elemento: Element | None = xml_element
+        self._filename = filename
 
-        # Recursos cuantitativos
-        self.recursos_cuantitativos: list[ControlmRecursoCuantitativo] = []
-        for recurso in xml_element.iterfind(TagXml.RECURSO_CUANTITATIVO):
-            self.recursos_cuantitativos.append(ControlmRecursoCuantitativo(recurso.get('NAME')))
+    def _internar_atributos(self, elemento: Element) -> dict[str, str]:
+        """Atributos de un elemento xml (el job o una accion) con las claves y los valores repetidos internados"""
+        internado = self._internado
+        return {
+            internado[clave]: valor if clave in _ATRIBUTOS_SIN_INTERNAR else internado[valor]
+            for clave, valor in elemento.items()
+        }
 
-        # On-conditions(las peores)
-        self.onconditions: dict = {}
-        for ongroup in xml_element.iterfind('ON'):
+    def _decodificar(self):
+        """
+        Arma, a partir de los hijos del elemento xml, las variables, marcas, recursos cuantitativos y acciones del job.
+        Se llama sola la primera vez que se accede a alguno de ellos.
 
-            for condition_key, condition_value in ongroup.items():
-                if condition_key == 'CODE':
-                    self.onconditions[condition_value]: list[ControlmAction] = []
-                    break
+        Los hijos del JOB se recorren una sola vez, cada uno se decodifica con el método que le corresponde segun su tag
+        (ver _decodificadores). Los tags que no están en la tabla se ignoran
+        """
+        xml_element = self._elemento
+        if xml_element is None:
+            return
+        self._elemento = None  # Mientras se decodifica, para no volver a entrar si un decodificador pide algun atributo
 
-            for action_element in ongroup.iter():
-                if action_element.tag == 'ON':
-                    continue
+        decodificados = {
+            'variables': {},
+            'scheduling': None,  # TODO: implementar la estructura de datos que guarde el scheduling, nota: Robar el código de Ailu :^)
+            'marcasin': [],
+            'marcasout': [],
+            'recursos_cuantitativos': [],
+            'onconditions': {},
+        }
+        marcas_por_accion: list[ControlmMarcaOut] = []
+        decodificadores = self._decodificadores
+        try:
+            for hijo in xml_element:
+                decodificador = decodificadores.get(hijo.tag)
+                if decodificador is not None:
+                    decodificador(self, hijo, decodificados, marcas_por_accion)
+        except Exception as error_decodificacion:
+            self._elemento = xml_element  # El job queda sin decodificar, el proximo acceso vuelve a informar el error
+            mensaje = f"Ocurrió un error inesperado al cargar la informacion del xml sobre el job [{self.name}] en la malla [{self._filename}]"
+            raise Exception(mensaje) from error_decodificacion
+
+        # Primero las marcasout del job y despues las que son mediante una condicion (ej: retorno 7)
+        decodificados['marcasout'].extend(marcas_por_accion)
+        self._internado = None  # Ya no hace falta, y asi no se copia con el job (ej: replicas de la temporal)
+
+        # Los atributos que se hayan asignado antes de decodificar (ej: job.variables = {...}) no se pisan
+        decodificados['variables'] = VariablesJob(self, decodificados['variables'])
+        for nombre, valor in decodificados.items():
+            self.__dict__.setdefault(nombre, valor)
+
+    def _decodificar_variable(self, elemento: Element, decodificados: dict, _marcas_por_accion: list):
+        var_name = self._internado[elemento.get('NAME')]
+        variables = decodificados['variables']
+        if var_name in variables:
+            print(
+                f"WARNING: EXISTE UNA VARIABLE DUPLICADA [{var_name}], JOBNAME [{self.name}] EN LA MALLA[{self._filename}]. "
+                f"SE OMITIRÁ DE LOS CONTROLES Y DIFERENCIAS DE LAS VARIABLES. SOLUCIONARLO ANTES DE REALIZAR EL "
+                f"PASAJE A LIVE YA QUE VA A GENERAR COMPORTAMIENTO IMPREDECIBLE EN CONTROL-M Y EN EL CONTRASTADOR."
+            )
+        else:
+            variables[var_name] = self._internado[elemento.get('VALUE')]
+
+    def _decodificar_marca_in(self, elemento: Element, decodificados: dict, _marcas_por_accion: list):
+        internado = self._internado
+        marca = ControlmMarcaIn(internado[elemento.get('NAME')], internado[elemento.get('ODATE')])
+        decodificados['marcasin'].append(self._internar_jobnames_marca(marca))
+
+    def _decodificar_marca_out(self, elemento: Element, decodificados: dict, _marcas_por_accion: list):
+        decodificados['marcasout'].append(self._marca_out(elemento, mediante_accion=False))
+
+    def _decodificar_recurso_cuantitativo(self, elemento: Element, decodificados: dict, _marcas_por_accion: list):
+        decodificados['recursos_cuantitativos'].append(ControlmRecursoCuantitativo(self._internado[elemento.get('NAME')]))
+
+    def _decodificar_on(self, elemento: Element, decodificados: dict, marcas_por_accion: list):
+        # On-conditions(las peores). Las acciones DOCOND son además marcasout mediante una condicion
+        internado = self._internado
+        acciones: list[ControlmAction] = []
+        for action_element in elemento:
+            if action_element.tag == TagXml.ON_DOCOND:
+                marcas_por_accion.append(self._marca_out(action_element, mediante_accion=True))
+            acciones.append(
+                ControlmAction(action_id=internado[action_element.tag], attrs=self._internar_atributos(action_element))
+            )
 
-                if condition_value:
-                    self.onconditions[condition_value].append(
-                        ControlmAction(
-                            action_id=action_element.tag,
-                            attrs={action_key: action_value for action_key, action_value in action_element.items()}
-                        )
-                    )
+        condition_value = elemento.get('CODE')
+        if condition_value is not None:
+            decodificados['onconditions'][internado[condition_value]] = acciones
+
+    def _marca_out(self, elemento: Element, mediante_accion: bool) -> ControlmMarcaOut:
+        internado = self._internado
+        marca = ControlmMarcaOut(
+            marca_nombre=internado[elemento.get('NAME')],
+            odate_esperado=internado[elemento.get('ODATE')],
+            signo=internado[elemento.get('SIGN')],
+            mediante_accion=mediante_accion
+        )
+        return self._internar_jobnames_marca(marca)
+
+    def _internar_jobnames_marca(self, marca: ControlmMarcaIn) -> ControlmMarcaIn:
+        # Cada marca aparece en al menos dos jobs (el que la agrega y el que la espera), los jobnames que la componen
+        # se comparten entre todas sus apariciones
+        if marca.origen is not None:
+            marca.origen = self._internado[marca.origen]
+            marca.destino = self._internado[marca.destino]
+        return marca
+
+    # Tag de cada hijo del JOB -> método que lo decodifica
+    _decodificadores = {
+        'VARIABLE': _decodificar_variable,
+        TagXml.MARCA_IN: _decodificar_marca_in,
+        TagXml.MARCA_OUT: _decodificar_marca_out,
+        TagXml.RECURSO_CUANTITATIVO: _decodificar_recurso_cuantitativo,
+        TagXml.ON_CONDITION: _decodificar_on,
+    }
+
+    variables = _VariablesDelXml()
+    scheduling = _DecodificadoDelXml()
+    marcasin = _DecodificadoDelXml()
+    marcasout = _DecodificadoDelXml()
+    recursos_cuantitativos = _DecodificadoDelXml()
+    onconditions = _DecodificadoDelXml()
+
+    def __getstate__(self):
+        # Las copias (ej: replicas de la temporal) se hacen ya decodificadas, asi no se copia el elemento xml
+        self._decodificar()
+        return self.__dict__
 
-        # Fase del job, si es staging|raw|master. Esta es una de las peores partes de la clase, la cantidad de
-        # suposiciones que se tienen que hacer es exageradamente alta. Proceder con precaución
-        self.fase: Literal['master', 'staging', 'raw', None] = None
-        match self.tipo:
-
-            case 'P' | 'T':  # Transmision
-                self.fase = 'staging'
-
-            case 'B' | 'S':  # Borrado
-                info_match_dataproc = self.get_info_dataproc_id()
-                if info_match_dataproc is not None:
-
-                    if info_match_dataproc['tipo'] == 'dfs' or info_match_dataproc['subtipo'] == 'rmv':
-                        # Tenemos que recorrer todas las variables y ver a qué path apuntan
-                        for var_value in self.variables.values():
-                            if var_value is None:
-                                continue
-                            if '/in/staging/' in var_value:
-                                self.fase = 'staging'
-                                break
-                            if '/data/raw/' in var_value:
-                                self.fase = 'raw'
-                                break
-                            if '/data/master/' in var_value:
-                                self.fase = 'master'
-                                break
-
-            case 'C':  # 'ingesta', o bien, mover cosas de un lado a otro
-                info_match_dataproc = self.get_info_dataproc_id()
-                if info_match_dataproc is not None:
-
-                    if (info_match_dataproc['tipo'] in ['spk', 'biz', 'psp', 'sbx', 'hmm']
-                            or info_match_dataproc['nombre'] == 'hdfsrename'):
-                        # Proceso spark o tablon, es de master (deberia...). Renombrado tambien va master
-                        self.fase = 'master'
-
-                    if info_match_dataproc['tipo'] == 'krb' and info_match_dataproc['subtipo'].startswith('in'):
-                        if info_match_dataproc['subtipo'].endswith('m'):
-                            self.fase = 'master'
-                        if info_match_dataproc['subtipo'].endswith('r'):
-                            self.fase = 'raw'
-                        if info_match_dataproc['subtipo'].endswith('s'):
-                            self.fase = 'staging'  # No creo que sea posible, pero uno siempre se sorprende
-
-                    if info_match_dataproc['tipo'] == 'krb' and info_match_dataproc['subtipo'] == 'trn':
-                        self.fase = 'master'
-
-            case 'V':  # Hammurabi
-                info_match_dataproc = self.get_info_dataproc_id()
-                if info_match_dataproc is not None:
-
-                    if info_match_dataproc['tipo'] in ['spk', 'hmm'] and info_match_dataproc['subtipo'] == 'qlt':
-                        if info_match_dataproc['nombre'].endswith('m'):
-                            self.fase = 'master'
-                        if info_match_dataproc['nombre'].endswith('r'):
-                            self.fase = 'raw'
-                        if info_match_dataproc['nombre'].endswith('s'):
-                            self.fase = 'staging'
-
-                        if self.fase is None and (
-                                info_match_dataproc['pais'] == 'gl' or info_match_dataproc['uuaa'].startswith('k')):
-                            self.fase = 'master'
-
-                        if self.fase is None:
-                            # Cuando tod0 falla, recurrimos a la descripcion del job
-                            descripcion = self.atributos.get('DESCRIPTION').lower()
-                            if 'raw' in descripcion:
-                                self.fase = 'raw'
-                            elif 'master' in descripcion:
-                                self.fase = 'master'
-                            elif 'staging' in descripcion:
-                                self.fase = 'staging'
-
-                    if info_match_dataproc['tipo'] == 'hmm' and info_match_dataproc['subtipo'] == 'trn':
-                        self.fase = 'master'
+    def __setstate__(self, estado: dict):
+        self.__dict__.update(estado)
+        if 'variables' in estado:
+            self.__dict__['variables'] = VariablesJob(self, estado['variables'])
 
     def __str__(self):
         return self.name
@@ -384,6 +624,7 @@ class ControlmJob:
     @name.setter
     def name(self, value):
         self.atributos[TagXml.JOB_NAME] = value
+        self.invalidar_expansiones()  # %%JOBNAME cambia
 
     @property
     def tipo(self) -> str:
@@ -412,6 +653,116 @@ class ControlmJob:
     def subapp(self) -> str:
         return self.atributos['SUB_APPLICATION']
 
+    @cached_property
+    def _match_jobname(self) -> re.Match | None:
+        return _REGEX_JOBNAME.search(self.name)
+
+    @cached_property
+    def _info_jobname(self) -> dict | None:
+        return self._match_jobname.groupdict() if self._match_jobname is not None else None
+
+    @cached_property
+    def _match_app(self) -> re.Match | None:
+        return _REGEX_APPLICATION.search(self.atributos['APPLICATION'])
+
+    @cached_property
+    def _info_app(self) -> dict | None:
+        return self._match_app.groupdict() if self._match_app is not None else None
+
+    @cached_property
+    def _match_dataproc_id(self) -> re.Match | None:
+        """Si hay varias variables con un dataproc job id, se queda con el de la ultima"""
+        match_dataproc = None
+        for var_value in self.variables.values():
+            if var_value is not None:
+                match_dataproc = _REGEX_DATAPROC_JOB_ID.search(var_value) or match_dataproc
+        return match_dataproc
+
+    @cached_property
+    def _info_dataproc_id(self) -> dict | None:
+        return self._match_dataproc_id.groupdict() if self._match_dataproc_id is not None else None
+
+    @cached_property
+    def _match_dataproc_namespace(self) -> re.Match | None:
+        """Si hay varias variables con un dataproc namespace, se queda con el de la ultima"""
+        match_namespace = None
+        for var_value in self.variables.values():
+            if var_value is not None:
+                match_namespace = _REGEX_DATAPROC_NAMESPACE.search(var_value) or match_namespace
+        return match_namespace
+
+    @cached_property
+    def _info_dataproc_namespace(self) -> dict | None:
+        return self._match_dataproc_namespace.groupdict() if self._match_dataproc_namespace is not None else None
+
+    @cached_property
+    def fase(self) -> Literal['master', 'staging', 'raw', None]:
+        """
+        Fase del job, si es staging|raw|master. Se infiere con las reglas_fase a partir del tipo del job y del tipo y
+        subtipo de su dataproc. Sin dataproc solamente aplican las reglas que dependen unicamente del tipo del job
+
+        :return: La fase, None si no se pudo inferir
+        """
+        info_dataproc = self.get_info_dataproc_id()
+        if info_dataproc is None:
+            claves = [(self.tipo, None, None)]
+        else:
+            tipo_dataproc, subtipo = info_dataproc['tipo'], info_dataproc['subtipo']
+            claves = [
+                (self.tipo, tipo_dataproc, subtipo),
+                (self.tipo, tipo_dataproc, subtipo[:2] + '*'),
+                (self.tipo, tipo_dataproc, None),
+                (self.tipo, None, subtipo),
+                (self.tipo, None, None),
+            ]
+
+        for clave in claves:
+            regla = self.reglas_fase.get(clave)
+            if regla is None:
+                continue
+            fase = getattr(self, regla)(info_dataproc) if regla.startswith('_fase_') else regla
+            if fase is not None:
+                return fase
+        return None
+
+    def _fase_por_paths(self, info_dataproc: dict | None) -> str | None:
+        # Tenemos que recorrer todas las variables y ver a qué path apuntan
+        for var_value in self.variables.values():
+            if var_value is None:
+                continue
+            if '/in/staging/' in var_value:
+                return 'staging'
+            if '/data/raw/' in var_value:
+                return 'raw'
+            if '/data/master/' in var_value:
+                return 'master'
+        return None
+
+    def _fase_sufijo_subtipo(self, info_dataproc: dict | None) -> str | None:
+        return self._fases_por_sufijo.get(info_dataproc['subtipo'][-1:])
+
+    def _fase_renombrado(self, info_dataproc: dict | None) -> str | None:
+        # Renombrado va master
+        if info_dataproc is not None and info_dataproc['nombre'] == 'hdfsrename':
+            return 'master'
+        return None
+
+    def _fase_calidad(self, info_dataproc: dict | None) -> str | None:
+        fase = self._fases_por_sufijo.get(info_dataproc['nombre'][-1:])
+        if fase is None and (info_dataproc['pais'] == 'gl' or info_dataproc['uuaa'].startswith('k')):
+            fase = 'master'
+
+        if fase is None:
+            # Cuando tod0 falla, recurrimos a la descripcion del job
+            descripcion = self.atributos.get('DESCRIPTION').lower()
+            if 'raw' in descripcion:
+                fase = 'raw'
+            elif 'master' in descripcion:
+                fase = 'master'
+            elif 'staging' in descripcion:
+                fase = 'staging'
+        return fase
+
     @property
     def dataproc_id(self) -> str | None:
         return self._match_dataproc_id.group(0) if self._match_dataproc_id is not None else None
@@ -431,7 +782,7 @@ class ControlmJob:
 
         :return: diccionario con la info del jobname
         """
-        return self._match_dataproc_id.groupdict() if self.dataproc_id is not None else None
+        return self._info_dataproc_id
 
     def get_info_dataproc_namespace(self) -> dict:
         """
@@ -440,7 +791,7 @@ class ControlmJob:
 
         :return: diccionario con la info del jobname
         """
-        return self._match_dataproc_namespace.groupdict() if self.dataproc_namespace is not None else None
+        return self._info_dataproc_namespace
 
     def jobname_valido(self) -> bool:
         """
@@ -450,14 +801,14 @@ class ControlmJob:
         """
         return True if self._match_jobname is not None else False
 
-    def get_info_jobname(self) -> dict:
+    def get_info_jobname(self) -> dict | None:
         """
         Devuelve un diccionario con los grupos capturados del jobname, dado que el jobname en sí contiene bastante
         informacion
 
-        :return: diccionario con la info del jobname
+        :return: diccionario con la info del jobname, None si el jobname no es válido
         """
-        return self._match_jobname.groupdict()
+        return self._info_jobname
 
     def application_valida(self) -> bool:
         """
@@ -474,7 +825,7 @@ class ControlmJob:
 
         :return: diccionario con la info del jobname
         """
-        return self._match_app.groupdict() if self._match_app is not None else None
+        return self._info_app
 
     def get_prerequisitos(self) -> list:
         """
@@ -497,6 +848,17 @@ class ControlmJob:
                 return rec
         return None
 
+    def tablas(self) -> list[str]:
+        """
+        Devuelve las tablas que el job indica en sus variables (TABLENAME, TABLE_NAME, TABLE o TABLA)
+
+        :return: Lista de nombres de tabla, ej: ['t_amol_tabla']
+        """
+        return [
+            valor for nombre, valor in self.variables.items()
+            if valor is not None and nombre.replace('%%', '') in VARIABLES_TABLA and valor.startswith('t_')
+        ]
+
     def get_acciones_marcas(self) -> list:
         """
         Devuelve una lista de marcas out del job
@@ -509,59 +871,117 @@ class ControlmJob:
         return self.atributos['SUB_APPLICATION'].endswith('-RC')
 
     def es_filewatcher(self) -> bool:
-        tipo = self._match_jobname.group('tipo')
-        return tipo == 'W'
+        return self.tipo == 'W'
 
     def es_transmisiontp(self) -> bool:
-        tipo = self._match_jobname.group('tipo')
-        return tipo == 'T'
+        return self.tipo == 'T'
 
     def es_tpt(self) -> bool:
-        tipo = self._match_jobname.group('tipo')
-        return tipo == 'P'
+        return self.tipo == 'P'
 
-    def expandir_string(self, template: str, iter_actual: int = 1) -> str:
+    # Propiedades cacheadas que dependen del jobname, los atributos o las variables del job
+    _cacheadas = ('_match_jobname', '_info_jobname', '_match_app', '_info_app', '_match_dataproc_id',
+                  '_info_dataproc_id', '_match_dataproc_namespace', '_info_dataproc_namespace', 'fase')
+
+    def invalidar_expansiones(self):
         """
-        Reemplaza todas las variables que se encuentran en un string e para ver cómo quedarían resueltas en tiempo de
-        ejecución por control M. Ej: "OK JOB %%JOBNAME", reemplazado es "OK JOB AMOLCP0001"
+        Descarta la tabla de variables resueltas, el cache de strings expandidos y las propiedades cacheadas (matches de
+        jobname, application y dataproc, fase). Se debe llamar cada vez que se modifiquen las variables, los atributos o
+        el jobname del job, caso contrario expandir_string y las propiedades devolverán valores viejos
+        """
+        self._variables_resueltas: dict[str, str] = {}
+        self._variables_ciclicas: set[str] = set()
+        self._cache_expansiones: OrderedDict[str, str] = OrderedDict()
+        for nombre in self._cacheadas:
+            self.__dict__.pop(nombre, None)
 
-        Si una variable no está definida y no se puede resolver, la reemplazara por CTMERR
+    def _resolver_variable(self, nombre: str, pila: list[str]) -> str:
+        """
+        Resuelve el valor final de una variable, expandiendo a su vez las variables que contenga. El resultado queda
+        memorizado en la tabla de variables resueltas del job, por lo que cada variable se resuelve una sola vez.
 
-        Esto se resuelve de forma recursiva, para evitar recursividad infinita si es que alguien es malo y reemplaza
-        una variable con otra vamos a frenarlo en la cantidad maxima de iteraciones permitidas, que viene definida en
-        la clase
+        Si una variable se referencia a sí misma (directa o indirectamente) todas las variables que forman parte del
+        ciclo se resuelven como CTMERR, independientemente de cuál se haya resuelto primero
 
-        :param template: El string a ser expandido, es decir, a ser reemplazado con sus variables
-        :param iter_actual: Iteracion actual, si se pasa salir para no entrar en un bucle infinito
-        :return: El string sin variables
+        :param nombre: Nombre de la variable a resolver, con los %% incluidos. Ej: %%MAIL
+        :param pila: Variables que se están resolviendo actualmente, se utiliza para detectar ciclos
+        :return: El valor de la variable sin variables
         """
-        variables_por_defecto = {
+        try:
+            return self._variables_resueltas[nombre]
+        except KeyError:
+            pass
+
+        if nombre in pila:
+            ciclo = pila[pila.index(nombre):]
+            print(f"WARNING: SE DETECTÓ UNA REFERENCIA CIRCULAR EN LAS VARIABLES {ciclo + [nombre]} DEL JOBNAME "
+                  f"[{self.name}]. SE RESOLVERÁN COMO CTMERR")
+            self._variables_ciclicas.update(ciclo)
+            return 'CTMERR'
+
+        if len(pila) >= self.cant_max_iteraciones:
+            print(f"WARNING: CANTIDAD MÁXIMA DE ANIDAMIENTO ({self.cant_max_iteraciones}) ALCANZADA AL RESOLVER LA "
+                  f"VARIABLE [{nombre}] DEL JOBNAME [{self.name}]. SE RESOLVERÁ COMO CTMERR")
+            return 'CTMERR'
+
+        if nombre in self.variables:
+            valor = utils.oofstr(self.variables[nombre])
+        else:
+            valor = self._variables_por_defecto().get(nombre)
+            if valor is None:
+                # Control M resuelve como CTMERR aquellas variables que no puede resolver
+                self._variables_resueltas[nombre] = 'CTMERR'
+                return 'CTMERR'
+
+        if '%%' in valor:
+            pila.append(nombre)
+            valor = _REGEX_VARIABLE.sub(lambda m: self._resolver_token(m.group(0), pila), valor)
+            pila.pop()
+
+        if nombre in self._variables_ciclicas:
+            valor = 'CTMERR'
+
+        self._variables_resueltas[nombre] = valor
+        return valor
+
+    def _resolver_token(self, token: str, pila: list[str]) -> str:
+        return '' if token == '%%.' else self._resolver_variable(token, pila)
+
+    def _variables_por_defecto(self) -> dict[str, str]:
+        return {
             '%%JOBNAME': self.name,
             '%%SCHEDTABLE': 'CR-ARXXXXXX-X02',
             '%%$ODATE': '99999999',
             '%%$ORDERID': 'xxxx'
         }
-        # TODO: Hacer el CTMERR :^), lo mencioné en el docstring pero no se hizo aún
 
-        if iter_actual > self.cant_max_iteraciones:
-            print(
-                f"WARNING: CANTIDAD MÁXIMA DE ITERACIONES ({iter_actual}) AL EXPANDIR EL STRING [{template}] ALCANZADAS. REVISAR RECURSIVIDAD INFINITA EN LAS VARIABLES DE CONTROL M")
+    def expandir_string(self, template: str) -> str:
+        """
+        Reemplaza todas las variables que se encuentran en un string e para ver cómo quedarían resueltas en tiempo de
+        ejecución por control M. Ej: "OK JOB %%JOBNAME", reemplazado es "OK JOB AMOLCP0001"
 
-        # El sorted mitiga aquellas variables que pueden estar incluídas en ellas mismas
-        # Ejemplo %%MAIL="hola", %%MAIL_2="hola_soyotro"
-        # Si el asunto es "Enviando mail a %%MAIL_2", vamos a evitar que se reemplace de la siguiente forma:
-        # "Enviando mail a hola_2", que es incorrecto, debería ser "Enviando mail a hola_soyotro"
-        for key in sorted(self.variables, key=len, reverse=True):
-            template = template.replace(key, utils.oofstr(self.variables[key]))
+        Si una variable no está definida y no se puede resolver, la reemplazara por CTMERR
 
-        for key in variables_por_defecto:
-            template = template.replace(key, variables_por_defecto[key])
+        El string se recorre una sola vez, cada variable encontrada se busca en la tabla de variables resueltas del
+        job (ver _resolver_variable), que resuelve las variables anidadas y las referencias circulares. Los ultimos
+        strings expandidos se guardan en un cache, ya que los controles suelen expandir los mismos asuntos y
+        destinatarios varias veces
 
-        iter_actual += 1
-        if '%%' in template and iter_actual <= self.cant_max_iteraciones:
-            self.expandir_string(template, iter_actual)
+        :param template: El string a ser expandido, es decir, a ser reemplazado con sus variables
+        :return: El string sin variables
+        """
+        cache = self._cache_expansiones
+        try:
+            expandido = cache[template]
+        except KeyError:
+            expandido = _REGEX_VARIABLE.sub(lambda m: self._resolver_token(m.group(0), []), template)
+            cache[template] = expandido
+            if len(cache) > self.cant_max_cache_expansiones:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(template)
 
-        return template
+        return expandido
 
 
 class ControlmMarcaIn:
@@ -594,14 +1014,19 @@ class ControlmMarcaIn:
             self.origen = marca_nombre[:index]
             self.destino = marca_nombre[index + 4:]
 
-            self._match_origen = re.search(Regex.JOBNAME, self.origen)
-            self._match_destino = re.search(Regex.JOBNAME, self.destino)
-
         self.odate = odate_esperado
 
     def __str__(self):
         return self.name
 
+    @cached_property
+    def _match_origen(self) -> re.Match | None:
+        return _REGEX_JOBNAME.search(self.origen) if self.origen is not None else None
+
+    @cached_property
+    def _match_destino(self) -> re.Match | None:
+        return _REGEX_JOBNAME.search(self.destino) if self.destino is not None else None
+
     def es_valida(self) -> bool:
         """
         Devuelve True si la marca se considera como valida. Es considerada como tal si cumple con la nomenclatura y
@@ -736,245 +1161,1602 @@ class ControlmRecursoCuantitativo:
         return self.name.split('-')
 
 
-class ControlmDigrafo:
+class ControlmIndiceMarcas:
     """
-    Clase para abstraer una cadena de jobs de control M, se comporta como una lista de "relaciones" o "aristas" entre
-    nodos, dichos nodos son jobs de control M. La estructura de un elemento de la lista es:
-    inicio -> [final1, final2, final3, ... finaln]
-
-    Donde inicio indica cual es el nodo de partida y la lista a la cual apunta representa todas las aristas del nodo.
-    Si un nodo es hoja, apunta a una lista vacia.
-
-    Un conjunto de nodos con todas sus aristas se denomina Digrafo
+    Indice de marcas a nivel contenedor. Por cada nombre de marca guarda qué jobs la agregan (OUTCOND o DOCOND con
+    signo +), qué jobs la eliminan (signo -) y qué jobs la esperan (INCOND). Se arma en una sola pasada sobre los jobs,
+    por lo que cualquier consulta sobre las marcas de todo el export no necesita volver a recorrer los jobs.
     """
 
-    def __init__(self, jobs: list[ControlmJob]):
+    def __init__(self, jobs: list[ControlmJob] = None):
         """
         Constructor
 
-        :param jobs: Lista de jobs a ser agregados al Digrafo
+        :param jobs: Jobs a indexar, se pueden agregar más luego mediante agregar_job
         """
-        self._grafo: dict[str, list[str]] = {}
-        self._grafo_inverso: dict[str, list[str]] = {}
 
-        for job in jobs:
-            self._grafo[job.name] = []
-            self._grafo_inverso[job.name] = []
-
-            for marca_out in job.marcasout:
-                if marca_out.signo == '+':
-                    for job_aux in jobs:
-                        if marca_out.name in [marcain.name for marcain in job_aux.marcasin]:
-                            self._grafo[job.name].append(job_aux.name)
+        self.agregan: dict[str, list[str]] = {}
+        self.eliminan: dict[str, list[str]] = {}
+        self.esperan: dict[str, list[str]] = {}
 
-            for prerequisito in job.get_prerequisitos():
-                for job_aux in jobs:
-                    if prerequisito in [marcaout.name for marcaout in job_aux.marcasout if marcaout.signo == '+']:
-                        self._grafo_inverso[job.name].append(job_aux.name)
+        for job in jobs or []:
+            self.agregar_job(job)
 
-    def __str__(self):
-        s = ""
-        for nodo, hijos in self._grafo.items():
-            if hijos:
-                s += f"{nodo}: {str([hijo for hijo in hijos])}\n"
-            else:
-                s += f"{nodo}: []\n"
-        return s
+    @staticmethod
+    def _indexar(indice: dict[str, list[str]], marca: str, jobname: str):
+        jobnames = indice.get(marca)
+        if jobnames is None:
+            indice[marca] = [jobname]
+        elif jobnames[-1] != jobname:  # Un job puede agregar la misma marca por OUTCOND y por DOCOND
+            jobnames.append(jobname)
 
-    def str_controlm(self, jobname: str) -> str:
+    def agregar_job(self, job: ControlmJob):
         """
-        Genera un string de jobs pertenecientes a una cadena que puede ser filtrado en control m.
-        :param jobname: jobname a partir del cual se analizará hacia abajo en el digrafo
+        Indexa todas las marcas in y out de un job
+
+        :param job: Job a indexar
         """
-        return '|'.join(self.recorrer_cadena(jobname))
 
-    def str_controlm_inverso(self, jobname: str) -> str:
+        for marca_in in job.marcasin or []:
+            self._indexar(self.esperan, marca_in.name, job.name)
+
+        for marca_out in job.marcasout or []:
+            if marca_out.signo == '+':
+                self._indexar(self.agregan, marca_out.name, job.name)
+            elif marca_out.signo == '-':
+                self._indexar(self.eliminan, marca_out.name, job.name)
+
+    def marcas(self) -> set[str]:
         """
-        Genera un string de jobs pertenecientes a una cadena que puede ser filtrado en control m
-        :param jobname: jobname a partir del cual se analizará hacia arriba en el digrafo
+        :return: Todos los nombres de marca que aparecen en el indice
         """
-        return '|'.join(self.recorrer_cadena_inversa(jobname))
+        return self.agregan.keys() | self.eliminan.keys() | self.esperan.keys()
 
-    def obtener_paresxy(self) -> tuple:
+    def huerfanas(self) -> dict[str, list[str]]:
         """
-        Retorna una tupla de tuplas que son pares (x,y) que representa una arista entre dos nodos del digrafo. Es
-        unilateral y se lee "X da marca a Y (e Y la espera)"
+        Marcas que son esperadas por algun job pero que ningún job agrega, el job va a quedar esperando para siempre
 
-        :return: tupla de tuplas (x,y) con las relaciones entre jobnames
+        :return: Diccionario marca -> jobnames que la esperan
         """
-        pares = []
-        for nodo, hijos in self._grafo.items():
-            for hijo in hijos:
-                if hijo is None:
-                    pares.append((nodo, hijo))
-                else:
-                    pares.append((nodo, hijo))
-        return tuple(pares)
+        return {marca: jobnames for marca, jobnames in self.esperan.items() if marca not in self.agregan}
 
-    def raices(self) -> list[str]:
+    def no_consumidas(self) -> dict[str, list[str]]:
         """
-        Devuelve aquellos nodos del digrafo que no tienen predecesores. Se considera como raíz si el nodo no se
-        encuentra en ninguna arista
+        Marcas que son agregadas pero que ningún job espera
 
-        :return: Lista de jobnames que no tienen prerequisitos
+        :return: Diccionario marca -> jobnames que la agregan
         """
-        raices = []
-        for nodo in self._grafo.keys():
-            es_raiz = True
-
-            for hijos in self._grafo.values():
-                if nodo in [hijo for hijo in hijos if hijo is not None]:
-                    es_raiz = False
-                    break
-
-            if es_raiz:
-                raices.append(nodo)
+        return {marca: jobnames for marca, jobnames in self.agregan.items() if marca not in self.esperan}
 
-        return raices
-
-    def es_raiz(self, jobname: str) -> bool:
+    def no_eliminadas(self) -> dict[str, list[str]]:
         """
-        Verifica si un jobname es raiz de una cadena
+        Marcas que son agregadas pero que ningún job elimina, quedan en el servidor hasta que se borren por ODATE
 
-        :param jobname: Jobname a verificar
-        :return: True si lo es, Falso caso contrario
+        :return: Diccionario marca -> jobnames que la agregan
         """
-        return True if jobname in self.raices() else False
+        return {marca: jobnames for marca, jobnames in self.agregan.items() if marca not in self.eliminan}
 
-    def es_hoja(self, jobname: str) -> bool:
+    def multiples_productores(self) -> dict[str, list[str]]:
         """
-        Verifica si un jobname es hoja de una cadena
+        Marcas que son agregadas por más de un job
 
-        :param jobname: Jobname a verificar
-        :return: True si lo es, Falso caso contrario
+        :return: Diccionario marca -> jobnames que la agregan
         """
-        return True if jobname in self.hojas() else False
+        return {marca: jobnames for marca, jobnames in self.agregan.items() if len(jobnames) > 1}
 
-    def hojas(self) -> list[str]:
-        """
-        Devuelve aquellos nodos del digrafo que no tienen sucesores. Se considera como hoja si el nodo no tiene ninguna
-        arista, es decir, apunta a una lista vacía
 
-        :return: Lista de jobnames que no tienen prerequisitos
-        """
-        return [job for job, hijos in self._grafo.items() if not hijos]
+class ControlmIndiceJobs:
+    """
+    Indices secundarios de los jobs de un contenedor. Por cada campo (ver campos) guarda, para cada valor, el conjunto de
+    jobnames que lo tienen. Se arma en una sola pasada al cargar el contenedor, las consultas sobre todo el export (ej:
+    los jobs de ruta critica de una uuaa que usan un RRCC) se resuelven intersectando conjuntos, ver ControlmConsulta
+    """
 
-    def recorrer_cadena(self, inicio: str, visitados=None) -> list[str]:
+    campos = ('malla', 'uuaa', 'tipo', 'fase', 'dataproc_id', 'dataproc_namespace', 'tabla', 'subapp', 'ruta_critica',
+              'recurso')
+
+    def __init__(self, jobs: list[ControlmJob] = None, mallas: dict[str, str] = None):
         """
-        Recorre una cadena dado un inicio, utiliza el algoritmo Depth First Search y 10 gramos de recursividad. La
-        ventaja de este algoritmo es que no va a explotar con digrafos circulares o nodos que tengan aristas para sí
-        mismos
+        Constructor
 
-        :param inicio: Jobname inicial a partir del cual se inicia el recorrido
-        :param visitados: conjunto de jobnames que ya fueron visitados por el algoritmo
-        :return: Lista de nodos (no ordenada) que contiene los jobnames que pertenecen a la cadena. El primer elemento
-            siempre es el inicio de la cadena
+        :param jobs: Jobs a indexar, se pueden agregar más luego mediante agregar_job
+        :param mallas: Mapeo jobname -> nombre de la malla de los jobs
         """
-        if visitados is None:
-            visitados = set()
-        visitados.add(inicio)
-        cadena = [inicio]
-        for hijo in self._grafo.get(inicio, []):
-            if hijo not in visitados:
-                cadena.extend(self.recorrer_cadena(hijo, visitados))
+        self.indices: dict[str, dict[object, set[str]]] = {campo: {} for campo in self.campos}
+        self.todos: set[str] = set()
 
-        return cadena
+        for job in jobs or []:
+            self.agregar_job(job, (mallas or {}).get(job.name))
 
-    def recorrer_cadena_inversa(self, inicio: str, visitados=None) -> list[str]:
+    def _indexar(self, campo: str, valor, jobname: str):
+        if valor is None:
+            return
+        jobnames = self.indices[campo].get(valor)
+        if jobnames is None:
+            self.indices[campo][valor] = {jobname}
+        else:
+            jobnames.add(jobname)
+
+    def agregar_job(self, job: ControlmJob, malla: str = None):
         """
-        Identico a recorrer_cadena, pero en vez de recorrer el grafo 'hacia abajo' lo recorre en base a los
-        prerequisitos de un job, osea, 'hacia arriba'.
+        Indexa todos los campos de un job. Los valores None (ej: un job sin dataproc) no se indexan
 
-        :param inicio: Jobname inicial a partir del cual se inicia el recorrido
-        :param visitados: conjunto de jobnames que ya fueron visitados por el algoritmo
-        :return: Lista de nodos (no ordenada) que contiene los jobnames que pertenecen a la cadena. El primer elemento
-            siempre es el inicio de la cadena
+        :param job: Job a indexar
+        :param malla: Nombre de la malla del job
         """
-        if visitados is None:
-            visitados = set()
-        visitados.add(inicio)
-        cadena = [inicio]
-        for hijo in self._grafo_inverso.get(inicio, []):
-            if hijo not in visitados:
-                cadena.extend(self.recorrer_cadena_inversa(hijo, visitados))
+        jobname = job.name
+        info_jobname = job.get_info_jobname()
 
-        return cadena
+        self.todos.add(jobname)
+        self._indexar('malla', malla, jobname)
+        if info_jobname is not None:
+            self._indexar('uuaa', info_jobname['uuaa'], jobname)
+            self._indexar('tipo', info_jobname['tipo'], jobname)
+            self._indexar('fase', job.fase, jobname)
+        self._indexar('dataproc_id', job.dataproc_id, jobname)
+        self._indexar('dataproc_namespace', job.dataproc_namespace, jobname)
+        for tabla in job.tablas():
+            self._indexar('tabla', tabla, jobname)
+        self._indexar('subapp', job.atributos.get('SUB_APPLICATION'), jobname)
+        self._indexar('ruta_critica', job.atributos.get('SUB_APPLICATION', '').endswith('-RC'), jobname)
+        for recurso in job.recursos_cuantitativos or []:
+            self._indexar('recurso', recurso.name, jobname)
 
-    def recorrer_cadena_completa(self, inicio: str) -> list[str]:
+    def valores(self, campo: str) -> list:
         """
-        Obtiene la cadena completa que 'nace' a partir del inicio. TODO: completar
-
-        :param inicio: Jobname inicial a partir del cual se inicia el recorrido
+        :param campo: Campo indexado, ver campos
+        :return: Todos los valores del campo que tiene al menos un job
         """
-        return list(set(self.recorrer_cadena(inicio) + self.recorrer_cadena_inversa(inicio)))
+        return list(self._indice(campo))
 
-    def obtener_arboles(self) -> list[set[str]]:
+    def jobnames(self, campo: str, valor) -> set[str]:
         """
-        Se denomina arbol al conjunto de subconjuntos de nodos que forman parte del Digrafo, es decir que este método
-        retornará una lista de cadenas que forman parte del digrafo. Las cadenas entre sí no están conectadas.
-
-        :return: Lista de cadenas "aisladas"
+        :param campo: Campo indexado, ver campos
+        :param valor: Valor a buscar
+        :return: Jobnames de los jobs con dicho valor en el campo. No se debe modificar, es el conjunto del indice
         """
-        cadenas = [set(self.recorrer_cadena(raiz)) for raiz in self.raices()]
-        # En el arbol se guardan todas las cadenas
-        arbol = []
+        return self._indice(campo).get(valor, set())
 
-        while cadenas:
-            conjunto_actual = cadenas.pop(0)
-            unidos = True
+    def _indice(self, campo: str) -> dict[object, set[str]]:
+        try:
+            return self.indices[campo]
+        except KeyError:
+            raise Exception(f"No existe un indice para el campo [{campo}], los campos indexados son {list(self.campos)}")
 
-            while unidos:
-                unidos = False
-                for s in cadenas:
-                    if not conjunto_actual.isdisjoint(s):
-                        # Unimos los conjuntos con interseccion
-                        conjunto_actual.update(s)
-                        cadenas.remove(s)  # Lo sacamos de la cadena porque fue unido
-                        unidos = True
-                        break
 
-            arbol.append(conjunto_actual)
+class ControlmConsulta:
+    """
+    Consulta sobre los indices de jobs de un contenedor. Se arma encadenando condiciones, que se resuelven recién al
+    pedir el resultado intersectando los conjuntos de los indices, de menor a mayor. Ej:
 
-        return arbol
+        contenedor.consulta(uuaa='AMOL', ruta_critica=True).donde(recurso='ARD-STG').jobnames()
+        contenedor.consulta(tipo=['T', 'P']) - contenedor.consulta(fase='staging')
 
-    def recorrer_arbol(self) -> list[set[str]]:
-        pass
+    Una condicion con varios valores (lista, tupla o set) la cumplen los jobs que tengan cualquiera de ellos
+    """
 
-    def find_shortest_path(self, start, end, path=None) -> list[str] | None:
+    def __init__(self, indice: ControlmIndiceJobs, jobs: dict[str, ControlmJob] = None,
+                 condiciones: list[tuple[str, tuple]] = None, base: set[str] = None):
         """
-        Adaptado de alguna publicación oficial de Python que hasta hoy en día no pude volver a encontrar el
-        link a la misma. Encuentra el camino (que, en teoría es el mas corto) de un job a otro
+        Constructor
+
+        :param indice: Indice sobre el cual se resuelve la consulta
+        :param jobs: Mapeo jobname -> job, para poder devolver los jobs además de los jobnames
+        :param condiciones: Pares (campo, valores aceptados)
+        :param base: Jobnames sobre los cuales se aplican las condiciones, por defecto todos los del indice
+        """
+        self.indice = indice
+        self._jobs = jobs
+        self.condiciones = condiciones or []
+        self.base = base
+
+    def donde(self, **condiciones) -> ControlmConsulta:
+        """
+        Agrega condiciones a la consulta
+
+        :param condiciones: campo=valor o campo=[valores], ver ControlmIndiceJobs.campos
+        :return: Una nueva consulta con todas las condiciones
+        """
+        nuevas = list(self.condiciones)
+        for campo, valores in condiciones.items():
+            if campo not in self.indice.campos:
+                raise Exception(f"No se puede consultar por el campo [{campo}], los campos indexados son {list(self.indice.campos)}")
+            nuevas.append((campo, tuple(valores) if isinstance(valores, (list, tuple, set)) else (valores,)))
+        return ControlmConsulta(self.indice, self._jobs, nuevas, self.base)
+
+    def resolver(self) -> set[str]:
+        """
+        :return: Jobnames de los jobs que cumplen todas las condiciones
+        """
+        conjuntos = []
+        for campo, valores in self.condiciones:
+            if len(valores) == 1:
+                conjuntos.append(self.indice.jobnames(campo, valores[0]))
+            else:
+                conjuntos.append(set().union(*(self.indice.jobnames(campo, valor) for valor in valores)))
+        if self.base is not None:
+            conjuntos.append(self.base)
+        if not conjuntos:
+            return set(self.indice.todos)
+
+        conjuntos.sort(key=len)
+        resultado = set(conjuntos[0])
+        for conjunto in conjuntos[1:]:
+            if not resultado:
+                break
+            resultado.intersection_update(conjunto)
+        return resultado
+
+    def jobnames(self) -> list[str]:
+        """
+        :return: Jobnames de los jobs que cumplen todas las condiciones, ordenados
+        """
+        return sorted(self.resolver())
+
+    def jobs(self) -> list[ControlmJob]:
+        """
+        :return: Jobs que cumplen todas las condiciones, ordenados por jobname
+        """
+        if self._jobs is None:
+            raise Exception("La consulta no tiene acceso a los jobs, solamente a sus jobnames")
+        return [self._jobs[jobname] for jobname in self.jobnames()]
+
+    def __len__(self) -> int:
+        return len(self.resolver())
+
+    def __iter__(self):
+        return iter(self.jobnames())
+
+    def __and__(self, otra: ControlmConsulta) -> ControlmConsulta:
+        return ControlmConsulta(self.indice, self._jobs, base=self.resolver() & otra.resolver())
+
+    def __or__(self, otra: ControlmConsulta) -> ControlmConsulta:
+        return ControlmConsulta(self.indice, self._jobs, base=self.resolver() | otra.resolver())
+
+    def __sub__(self, otra: ControlmConsulta) -> ControlmConsulta:
+        return ControlmConsulta(self.indice, self._jobs, base=self.resolver() - otra.resolver())
+
+
+class ControlmIndiceTexto:
+    """
+    Indice invertido de los textos de los jobs: nombres y valores de las variables, CMDLINE y DESCRIPTION. Cada texto se
+    parte en tokens (segmentos de paths, identificadores, nombres de variables con sus %%) y por cada token se guardan
+    los jobnames que lo contienen. Asi buscar, por ej, todos los jobs que referencian un path, un namespace de
+    desarrollo o una tabla no necesita volver a recorrer los textos de todos los jobs.
+
+    Los tokens se guardan en minusculas. Los que tienen puntos o guiones (ej: ar.amol.app-id-1.dev) se indexan además
+    por partes (ar, amol, app, id, 1, dev)
+    """
+
+    version = 1  # Se incrementa cuando cambia la forma de tokenizar, invalida los indices guardados
+
+    def __init__(self, jobs: list[ControlmJob] = None):
+        """
+        Constructor
+
+        :param jobs: Jobs a indexar, se pueden agregar más luego mediante agregar_job
+        """
+        self.tokens: dict[str, set[str]] = {}
+        self._ordenados: list[str] | None = None  # Para las busquedas por prefijo, se arma al buscar
+
+        for job in jobs or []:
+            self.agregar_job(job)
+
+    @staticmethod
+    def tokenizar(texto: str) -> set[str]:
+        """
+        :param texto: Texto a tokenizar, ej: un path o un comando
+        :return: Tokens del texto, en minusculas
+        """
+        tokens = set()
+        for token in _REGEX_TOKEN_TEXTO.findall(texto.lower()):
+            tokens.add(token)
+            if '.' in token or '-' in token:
+                tokens.update(parte for parte in _REGEX_PARTES_TOKEN.split(token) if parte)
+        return tokens
+
+    def agregar_job(self, job: ControlmJob):
+        """
+        Indexa las variables, el comando y la descripcion de un job
+
+        :param job: Job a indexar
+        """
+        textos = [*job.variables.keys(), *job.variables.values(), job.command, job.atributos.get('DESCRIPTION')]
+        tokens = set()
+        for texto in textos:
+            if texto:
+                tokens.update(self.tokenizar(texto))
+
+        for token in tokens:
+            jobnames = self.tokens.get(token)
+            if jobnames is None:
+                self.tokens[token] = {job.name}
+            else:
+                jobnames.add(job.name)
+        self._ordenados = None
+
+    def buscar(self, token: str) -> set[str]:
+        """
+        :param token: Token exacto, ej: 'dev', '%%dpid' o 't_amol_tabla'. No distingue mayusculas
+        :return: Jobnames de los jobs que tienen el token
+        """
+        return set(self.tokens.get(token.lower(), ()))
+
+    def buscar_prefijo(self, prefijo: str) -> set[str]:
+        """
+        :param prefijo: Comienzo de un token, ej: 't_amol_' para todas las tablas de AMOL. No distingue mayusculas
+        :return: Jobnames de los jobs que tienen algun token que empieza con el prefijo
+        """
+        if self._ordenados is None:
+            self._ordenados = sorted(self.tokens)
+        prefijo = prefijo.lower()
+
+        jobnames = set()
+        for i in range(bisect_left(self._ordenados, prefijo), len(self._ordenados)):
+            if not self._ordenados[i].startswith(prefijo):
+                break
+            jobnames.update(self.tokens[self._ordenados[i]])
+        return jobnames
+
+    def buscar_texto(self, texto: str) -> set[str]:
+        """
+        :param texto: Texto a buscar, ej: un path como /data/raw/amol. Se tokeniza igual que los textos de los jobs
+        :return: Jobnames de los jobs que tienen todos los tokens del texto (no necesariamente en el mismo orden)
+        """
+        conjuntos = sorted((self.tokens.get(token, set()) for token in self.tokenizar(texto)), key=len)
+        if not conjuntos:
+            return set()
+        jobnames = set(conjuntos[0])
+        for conjunto in conjuntos[1:]:
+            jobnames.intersection_update(conjunto)
+        return jobnames
+
+    @staticmethod
+    def huella_export(path_xml: str) -> str:
+        """
+        :param path_xml: Path del export
+        :return: Identifica la version del export (path, tamaño y fecha de modificacion) con la que se arma un indice
+        """
+        estado = os.stat(path_xml)
+        return f"{os.path.abspath(path_xml)}|{estado.st_size}|{estado.st_mtime_ns}"
+
+    def guardar(self, path: str, huella: str = None):
+        """
+        Guarda el indice en un json, los jobnames se guardan una sola vez y cada token referencia sus posiciones. Se
+        escribe en un archivo temporal que luego reemplaza al json, asi un corte a mitad de la escritura no deja un
+        indice truncado
+
+        :param path: Path del json
+        :param huella: Version del export del cual se armó el indice, ver huella_export
+        """
+        jobnames = sorted(set().union(*self.tokens.values()))
+        ids = {jobname: i for i, jobname in enumerate(jobnames)}
+        descriptor, path_temporal = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with open(descriptor, 'w', encoding='utf-8') as archivo:
+                json.dump({
+                    'version': self.version,
+                    'huella': huella,
+                    'jobnames': jobnames,
+                    'tokens': {token: sorted(ids[jobname] for jobname in jobnames_token)
+                               for token, jobnames_token in self.tokens.items()},
+                }, archivo)
+            os.replace(path_temporal, path)
+        except BaseException:
+            os.remove(path_temporal)
+            raise
+
+    @classmethod
+    def cargar(cls, path: str, huella: str = None) -> ControlmIndiceTexto | None:
+        """
+        Carga un indice guardado con guardar
+
+        :param path: Path del json
+        :param huella: Version del export actual, ver huella_export
+        :return: El indice, None si no existe, es de otra version, se armó con otro export (o sin huella) o está
+            corrupto
+        """
+        if huella is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as archivo:
+                guardado = json.load(archivo)
+            if guardado.get('version') != cls.version or guardado.get('huella') != huella:
+                return None
+            jobnames = guardado['jobnames']
+            tokens = {token: {jobnames[i] for i in ids} for token, ids in guardado['tokens'].items()}
+        except (ValueError, KeyError, TypeError, IndexError, AttributeError) as error:
+            print(f"WARNING: El indice de texto [{path}] está corrupto, se vuelve a armar ({error!r})")
+            return None
+
+        indice = cls()
+        indice.tokens = tokens
+        return indice
+
+
+class ControlmTablaJobs:
+    """
+    Tabla columnar con los campos de los jobs de un contenedor que más se usan en los analisis globales. Cada job es
+    una fila (su id es la posicion de su jobname en jobnames) y cada campo una columna. Las columnas están codificadas
+    por diccionario: cada valor distinto del campo tiene un codigo entero chico (su posicion en valores[columna]) y la
+    columna es un array con el codigo de cada job.
+
+    Asi las agregaciones sobre todos los jobs (o un subconjunto, ej: una cadena) se resuelven contando tuplas de enteros
+    (ver contar), sin pasar por las propiedades ni los diccionarios de atributos de cada job
+    """
+
+    columnas = ('malla', 'tipo', 'periodicidad', 'fase', 'ruta_critica', 'uuaa', 'dataproc_tipo', 'dataproc_subtipo')
+
+    def __init__(self, jobs: list[ControlmJob], mallas: dict[str, str]):
+        """
+        Constructor
+
+        :param jobs: Jobs del contenedor
+        :param mallas: Mapeo jobname -> nombre de la malla del job
+        """
+        self.jobnames: list[str] = [job.name for job in jobs]
+        self.ids: dict[str, int] = {jobname: i for i, jobname in enumerate(self.jobnames)}
+        self.valores: dict[str, list] = {}
+        self._codigos: dict[str, dict] = {}
+        self._datos: dict[str, array] = {}
+
+        filas = [self._fila(job, mallas.get(job.name)) for job in jobs]
+        for nro_columna, columna in enumerate(self.columnas):
+            codigos = {}
+            datos = [codigos.setdefault(fila[nro_columna], len(codigos)) for fila in filas]
+            self.valores[columna] = list(codigos)
+            self._codigos[columna] = codigos
+            self._datos[columna] = array(self._tipo_array(len(codigos)), datos)
+
+    @staticmethod
+    def _fila(job: ControlmJob, malla: str | None) -> tuple:
+        info_jobname = job.get_info_jobname()
+        info_dataproc = job.get_info_dataproc_id()
+        return (
+            malla,
+            info_jobname['tipo'] if info_jobname is not None else None,
+            info_jobname['periodicidad'] if info_jobname is not None else None,
+            job.fase if info_jobname is not None else None,  # Sin jobname valido no hay tipo del cual inferirla
+            job.es_ruta_critica(),
+            info_jobname['uuaa'] if info_jobname is not None else None,
+            info_dataproc['tipo'] if info_dataproc is not None else None,
+            info_dataproc['subtipo'] if info_dataproc is not None else None,
+        )
+
+    @staticmethod
+    def _tipo_array(cantidad_valores: int) -> str:
+        if cantidad_valores <= 0xFF:
+            return 'B'
+        if cantidad_valores <= 0xFFFF:
+            return 'H'
+        return 'I'
+
+    def __len__(self) -> int:
+        return len(self.jobnames)
+
+    def columna(self, columna: str) -> array:
+        """
+        :param columna: Nombre de la columna, ver columnas
+        :return: Codigo del valor de cada job, en orden de id
+        """
+        return self._datos[columna]
+
+    def codigo(self, columna: str, valor) -> int | None:
+        """
+        :param columna: Nombre de la columna, ver columnas
+        :param valor: Valor a buscar, ej: 'C' para la columna tipo
+        :return: El codigo del valor en la columna, None si ningún job lo tiene
+        """
+        return self._codigos[columna].get(valor)
+
+    def valor(self, columna: str, jobname: str):
+        """
+        :param columna: Nombre de la columna, ver columnas
+        :param jobname: Jobname del job
+        :return: Valor del campo para el job
+        """
+        return self.valores[columna][self._datos[columna][self.ids[jobname]]]
+
+    def ids_jobs(self, jobnames) -> list[int]:
+        """
+        :param jobnames: Jobnames a buscar, los que no están en la tabla se ignoran
+        :return: Ids (filas) de los jobs
+        """
+        ids = self.ids
+        return [ids[jobname] for jobname in jobnames if jobname in ids]
+
+    def filtrar(self, columna: str, valores, filas: list[int] = None) -> list[int]:
+        """
+        Filas cuyo valor en la columna es alguno de los indicados
+
+        :param columna: Nombre de la columna, ver columnas
+        :param valores: Valores aceptados, ej: ['T', 'P', 'C'] para la columna tipo
+        :param filas: Filas sobre las cuales filtrar, por defecto todas
+        :return: Ids de los jobs que cumplen el filtro
+        """
+        codigos = {self._codigos[columna][valor] for valor in valores if valor in self._codigos[columna]}
+        datos = self._datos[columna]
+        if filas is None:
+            return [fila for fila, codigo in enumerate(datos) if codigo in codigos]
+        return [fila for fila in filas if datos[fila] in codigos]
+
+    def contar(self, agrupar_por: tuple[str, ...], filas: list[int] = None) -> Counter:
+        """
+        Cantidad de jobs por cada combinacion de valores de las columnas indicadas. Ej: contar(('tipo', 'fase'), ids)
+        devuelve cuántos jobs de cada tipo hay en cada fase entre los jobs de ids
+
+        :param agrupar_por: Columnas por las cuales agrupar
+        :param filas: Filas a contar (ej: las de una cadena, ver ids_jobs), por defecto todas
+        :return: Counter (valor columna 1, valor columna 2, ...) -> cantidad de jobs
+        """
+        columnas = [self._datos[columna] for columna in agrupar_por]
+        if filas is not None:
+            if not filas:
+                return Counter()
+            seleccion = itemgetter(*filas)
+            columnas = [seleccion(datos) if len(filas) > 1 else (datos[filas[0]],) for datos in columnas]
+
+        valores = [self.valores[columna] for columna in agrupar_por]
+        return Counter({
+            tuple(valores[nro][codigo] for nro, codigo in enumerate(codigos)): cantidad
+            for codigos, cantidad in Counter(zip(*columnas)).items()
+        })
+
+
+class ControlmLinaje:
+    """
+    Linaje de tablas de un contenedor. Los jobs declaran la tabla sobre la que trabajan en sus variables (ver
+    ControlmJob.tablas): los de ingesta, spark custom y transmision (ver tipos_productores) la escriben y el resto (ej:
+    hammurabi, smart cleaner) la leen. Cruzando eso con el digrafo global se obtiene qué tablas se generan antes o
+    despues de una tabla en las cadenas que la escriben.
+
+    Las tablas de cada job y los jobs de cada tabla se indexan al armar el linaje; las dependencias entre jobs se
+    resuelven con el indice de alcance del digrafo (ver ControlmDigrafo.indice_alcance), por lo que cada consulta es
+    proporcional al tamaño de las cadenas involucradas y no al del export. Una tabla que ningun job declara no tiene
+    productores, consumidores ni linaje
+    """
+
+    tipos_productores = ('C', 'G', 'T', 'P')
+
+    def __init__(self, jobs: dict[str, ControlmJob], digrafo: ControlmDigrafo, indice_jobs: ControlmIndiceJobs = None):
+        """
+        Constructor
+
+        :param jobs: Mapeo jobname -> job de todos los jobs del digrafo
+        :param digrafo: Digrafo de los jobs, tipicamente el global del contenedor
+        :param indice_jobs: Indice de jobs ya armado que contiene a los jobs, se reutiliza su indice por tabla. Si no se
+            provee, las tablas se leen de cada job
+        """
+        self.digrafo = digrafo
+        self.productores: dict[str, set[str]] = {}
+        self.consumidores: dict[str, set[str]] = {}
+        self._fases: dict[str, set[str]] = {}
+        self._tablas_producidas: dict[str, list[str]] = {}  # jobname -> tablas que escribe
+        self._tablas_job: dict[str, list[str]] = {}
+
+        if indice_jobs is not None:
+            jobnames_por_tabla = indice_jobs.indices['tabla']
+        else:
+            jobnames_por_tabla = {}
+            for job in jobs.values():
+                for tabla in job.tablas():
+                    jobnames_por_tabla.setdefault(tabla, set()).add(job.name)
+
+        for tabla, jobnames in jobnames_por_tabla.items():
+            for jobname in jobnames:
+                job = jobs[jobname]
+                self._tablas_job.setdefault(jobname, []).append(tabla)
+                if self._es_productor(job):
+                    self.productores.setdefault(tabla, set()).add(jobname)
+                    self._tablas_producidas.setdefault(jobname, []).append(tabla)
+                    if job.fase is not None:
+                        self._fases.setdefault(tabla, set()).add(job.fase)
+                else:
+                    self.consumidores.setdefault(tabla, set()).add(jobname)
+
+    def _es_productor(self, job: ControlmJob) -> bool:
+        info_jobname = job.get_info_jobname()
+        return info_jobname is not None and info_jobname['tipo'] in self.tipos_productores
+
+    def tablas(self) -> list[str]:
+        """
+        :return: Todas las tablas declaradas por algun job, ordenadas
+        """
+        return sorted(self.productores.keys() | self.consumidores.keys())
+
+    def tablas_job(self, jobname: str) -> list[str]:
+        """
+        :param jobname: Jobname del job
+        :return: Tablas que declara el job, ordenadas
+        """
+        return sorted(self._tablas_job.get(jobname, []))
+
+    def fases(self, tabla: str) -> list[str]:
+        """
+        :param tabla: Nombre de la tabla
+        :return: Fases (staging|raw|master) en las que se escribe la tabla, ordenadas
+        """
+        return sorted(self._fases.get(tabla, set()))
+
+    def mallas(self, tabla: str) -> list[str]:
+        """
+        :param tabla: Nombre de la tabla
+        :return: Mallas de los jobs que escriben la tabla, ordenadas
+        """
+        return sorted({str(self.digrafo.malla(jobname)) for jobname in self.productores.get(tabla, set())})
+
+    def jobs_aguas_arriba(self, tabla: str) -> set[str]:
+        """
+        :param tabla: Nombre de la tabla
+        :return: Jobnames de los jobs de los que dependen, directa o indirectamente, los jobs que escriben la tabla
+        """
+        jobnames = set()
+        for productor in self.productores.get(tabla, set()):
+            jobnames.update(self.digrafo.ancestros(productor))
+        return jobnames
+
+    def jobs_aguas_abajo(self, tabla: str) -> set[str]:
+        """
+        :param tabla: Nombre de la tabla
+        :return: Jobnames de los jobs que leen la tabla y de los que dependen, directa o indirectamente, de los que la
+            escriben
+        """
+        jobnames = set(self.consumidores.get(tabla, set()))
+        for productor in self.productores.get(tabla, set()):
+            jobnames.update(self.digrafo.descendientes(productor))
+        return jobnames
+
+    def aguas_arriba(self, tabla: str) -> list[str]:
+        """
+        :param tabla: Nombre de la tabla
+        :return: Tablas que se escriben antes que la tabla en las cadenas que la escriben, ordenadas
+        """
+        return self._tablas_escritas(self.jobs_aguas_arriba(tabla), tabla)
+
+    def aguas_abajo(self, tabla: str) -> list[str]:
+        """
+        :param tabla: Nombre de la tabla
+        :return: Tablas que se escriben despues que la tabla en las cadenas que la escriben, ordenadas
+        """
+        return self._tablas_escritas(self.jobs_aguas_abajo(tabla), tabla)
+
+    def _tablas_escritas(self, jobnames: set[str], excluida: str) -> list[str]:
+        tablas = set()
+        for jobname in jobnames:
+            tablas.update(self._tablas_producidas.get(jobname, ()))
+        tablas.discard(excluida)
+        return sorted(tablas)
+
+
+class ControlmDigrafo:
+    """
+    Clase para abstraer una cadena de jobs de control M, se comporta como una lista de "relaciones" o "aristas" entre
+    nodos, dichos nodos son jobs de control M. La estructura de un elemento de la lista es:
+    inicio -> [final1, final2, final3, ... finaln]
+
+    Donde inicio indica cual es el nodo de partida y la lista a la cual apunta representa todas las aristas del nodo.
+    Si un nodo es hoja, apunta a una lista vacia.
+
+    Un conjunto de nodos con todas sus aristas se denomina Digrafo
+    """
+
+    @traza.trazada(nombre='ControlmDigrafo', atributos=lambda self, *_, **__: {'jobs': len(self._grafo)})
+    def __init__(self, jobs: list[ControlmJob], indice_marcas: ControlmIndiceMarcas = None,
+                 mallas: dict[str, str] = None):
+        """
+        Constructor. Las aristas se arman a partir de un indice de marcas: por cada marca, todo job que la agrega
+        apunta a todo job que la espera. De esta forma el armado es lineal en la cantidad de jobs y aristas, sin
+        importar si los jobs pertenecen a una o a varias mallas
+
+        :param jobs: Lista de jobs a ser agregados al Digrafo
+        :param indice_marcas: Indice de marcas ya armado que contiene (al menos) a los jobs. Si no se provee, se arma
+            uno a partir de los jobs
+        :param mallas: Malla a la que pertenece cada jobname, si no se provee se toma el PARENT_FOLDER de cada job
+        """
+        self._grafo: dict[str, list[str]] = {}
+        self._grafo_inverso: dict[str, list[str]] = {}
+        self._mallas: dict[str, str] = {}
+
+        for job in jobs:
+            self._grafo[job.name] = []
+            self._grafo_inverso[job.name] = []
+            self._mallas[job.name] = mallas[job.name] if mallas is not None else job.atributos.get('PARENT_FOLDER')
+
+        if indice_marcas is None:
+            indice_marcas = ControlmIndiceMarcas(jobs)
+
+        # Se recorren las marcas de cada job para respetar el orden en que aparecen en el xml. El dict.fromkeys saca
+        # los duplicados (dos jobs unidos por mas de una marca) manteniendo el orden
+        grafo = self._grafo
+        for job in jobs:
+            grafo[job.name] = list(dict.fromkeys(
+                destino for destino in self._destinos(job, indice_marcas) if destino in grafo
+            ))
+            self._grafo_inverso[job.name] = list(dict.fromkeys(
+                origen for origen in self._origenes(job, indice_marcas) if origen in grafo
+            ))
+
+        self._csr: _GrafoCsr | None = None
+        self._alcance: _IndiceAlcance | None = None
+
+    @staticmethod
+    def _destinos(job: ControlmJob, indice_marcas: ControlmIndiceMarcas):
+        """Jobnames que esperan alguna de las marcas que agrega el job"""
+        for marca_out in job.marcasout or []:
+            if marca_out.signo == '+':
+                yield from indice_marcas.esperan.get(marca_out.name, [])
+
+    @staticmethod
+    def _origenes(job: ControlmJob, indice_marcas: ControlmIndiceMarcas):
+        """Jobnames que agregan alguno de los prerequisitos del job"""
+        for marca_in in job.marcasin or []:
+            yield from indice_marcas.agregan.get(marca_in.name, [])
+
+    def grafo_csr(self) -> _GrafoCsr:
+        """
+        Devuelve la representacion compacta (ids enteros + CSR) del digrafo, se arma una sola vez a pedido. Los
+        algoritmos que necesitan recorrer todo el digrafo trabajan sobre esta representacion, asi funcionan igual sin
+        importar cómo esté guardado el digrafo
+
+        :return: El digrafo en formato CSR
+        """
+        if self._csr is None:
+            self._csr = _GrafoCsr.desde_adyacencias(self._grafo, self._grafo_inverso)
+        return self._csr
+
+    def __str__(self):
+        s = ""
+        for nodo, hijos in self._grafo.items():
+            if hijos:
+                s += f"{nodo}: {str([hijo for hijo in hijos])}\n"
+            else:
+                s += f"{nodo}: []\n"
+        return s
+
+    def __contains__(self, jobname: str) -> bool:
+        return jobname in self._grafo
+
+    def __len__(self) -> int:
+        return len(self._grafo)
+
+    def str_controlm(self, jobname: str) -> str:
+        """
+        Genera un string de jobs pertenecientes a una cadena que puede ser filtrado en control m.
+        :param jobname: jobname a partir del cual se analizará hacia abajo en el digrafo
+        """
+        return '|'.join(self.recorrer_cadena(jobname))
+
+    def str_controlm_inverso(self, jobname: str) -> str:
+        """
+        Genera un string de jobs pertenecientes a una cadena que puede ser filtrado en control m
+        :param jobname: jobname a partir del cual se analizará hacia arriba en el digrafo
+        """
+        return '|'.join(self.recorrer_cadena_inversa(jobname))
+
+    def hijos(self, jobname: str) -> list[str]:
+        """
+        Devuelve los sucesores directos de un nodo, es decir, los jobs que esperan alguna marca que el nodo agrega
+
+        :param jobname: Jobname del nodo
+        :return: Lista de jobnames, vacia si el nodo no existe o es hoja
+        """
+        return list(self._grafo.get(jobname, []))
+
+    def padres(self, jobname: str) -> list[str]:
+        """
+        Devuelve los predecesores directos de un nodo, es decir, los jobs que agregan algun prerequisito del nodo
+
+        :param jobname: Jobname del nodo
+        :return: Lista de jobnames, vacia si el nodo no existe o es raiz
+        """
+        return list(self._grafo_inverso.get(jobname, []))
+
+    def malla(self, jobname: str) -> str | None:
+        """
+        Devuelve el nombre de la malla a la que pertenece un nodo del digrafo
+
+        :param jobname: Jobname del nodo
+        :return: Nombre de la malla, None si no se conoce
+        """
+        return self._mallas.get(jobname)
+
+    def obtener_paresxy(self) -> tuple:
+        """
+        Retorna una tupla de tuplas que son pares (x,y) que representa una arista entre dos nodos del digrafo. Es
+        unilateral y se lee "X da marca a Y (e Y la espera)"
+
+        :return: tupla de tuplas (x,y) con las relaciones entre jobnames
+        """
+        return tuple((nodo, hijo) for nodo, hijos in self._grafo.items() for hijo in hijos)
+
+    def aristas_entre_mallas(self) -> list[tuple[str, str, str, str]]:
+        """
+        Devuelve aquellas aristas cuyos nodos pertenecen a mallas distintas, junto con la malla de cada nodo
+
+        :return: Lista de tuplas (x, y, malla_x, malla_y)
+        """
+        mallas = self._mallas
+        return [
+            (nodo, hijo, mallas[nodo], mallas[hijo])
+            for nodo, hijos in self._grafo.items() for hijo in hijos
+            if mallas[nodo] != mallas[hijo]
+        ]
+
+    def raices(self) -> list[str]:
+        """
+        Devuelve aquellos nodos del digrafo que no tienen predecesores. Se considera como raíz si el nodo no se
+        encuentra en ninguna arista
+
+        :return: Lista de jobnames que no tienen prerequisitos
+        """
+        return [job for job, padres in self._grafo_inverso.items() if not padres]
+
+    def es_raiz(self, jobname: str) -> bool:
+        """
+        Verifica si un jobname es raiz de una cadena
+
+        :param jobname: Jobname a verificar
+        :return: True si lo es, Falso caso contrario
+        """
+        return jobname in self._grafo_inverso and not self._grafo_inverso[jobname]
+
+    def es_hoja(self, jobname: str) -> bool:
+        """
+        Verifica si un jobname es hoja de una cadena
+
+        :param jobname: Jobname a verificar
+        :return: True si lo es, Falso caso contrario
+        """
+        return jobname in self._grafo and not self._grafo[jobname]
+
+    def hojas(self) -> list[str]:
+        """
+        Devuelve aquellos nodos del digrafo que no tienen sucesores. Se considera como hoja si el nodo no tiene ninguna
+        arista, es decir, apunta a una lista vacía
+
+        :return: Lista de jobnames que no tienen prerequisitos
+        """
+        return [job for job, hijos in self._grafo.items() if not hijos]
+
+    @staticmethod
+    def _dfs(grafo: dict[str, list[str]], inicio: str, visitados: set[str]) -> list[str]:
+        """
+        Depth First Search iterativo, visita los nodos en el mismo orden que la version recursiva pero sin el limite
+        de recursion de python, que con cadenas de miles de jobs explota
+        """
+        visitados.add(inicio)
+        cadena = [inicio]
+        pila = [iter(grafo.get(inicio, []))]
+        while pila:
+            for hijo in pila[-1]:
+                if hijo not in visitados:
+                    visitados.add(hijo)
+                    cadena.append(hijo)
+                    pila.append(iter(grafo.get(hijo, [])))
+                    break
+            else:
+                pila.pop()
+        return cadena
+
+    def recorrer_cadena(self, inicio: str, visitados=None) -> list[str]:
+        """
+        Recorre una cadena dado un inicio, utiliza el algoritmo Depth First Search. La ventaja de este algoritmo es que
+        no va a explotar con digrafos circulares o nodos que tengan aristas para sí mismos
+
+        :param inicio: Jobname inicial a partir del cual se inicia el recorrido
+        :param visitados: conjunto de jobnames que ya fueron visitados por el algoritmo
+        :return: Lista de nodos (no ordenada) que contiene los jobnames que pertenecen a la cadena. El primer elemento
+            siempre es el inicio de la cadena
+        """
+        return self._dfs(self._grafo, inicio, set() if visitados is None else visitados)
+
+    def recorrer_cadena_inversa(self, inicio: str, visitados=None) -> list[str]:
+        """
+        Identico a recorrer_cadena, pero en vez de recorrer el grafo 'hacia abajo' lo recorre en base a los
+        prerequisitos de un job, osea, 'hacia arriba'.
+
+        :param inicio: Jobname inicial a partir del cual se inicia el recorrido
+        :param visitados: conjunto de jobnames que ya fueron visitados por el algoritmo
+        :return: Lista de nodos (no ordenada) que contiene los jobnames que pertenecen a la cadena. El primer elemento
+            siempre es el inicio de la cadena
+        """
+        return self._dfs(self._grafo_inverso, inicio, set() if visitados is None else visitados)
+
+    def recorrer_cadena_completa(self, inicio: str) -> list[str]:
+        """
+        Obtiene la cadena completa que 'nace' a partir del inicio: el propio job, todos los jobs de los que depende y
+        todos los que dependen de él. Se resuelve con el indice de alcance, ver indice_alcance
+
+        :param inicio: Jobname inicial a partir del cual se inicia el recorrido
+        :return: Lista de jobnames (no ordenada)
+        """
+        return self.indice_alcance().cadena_completa(inicio)
+
+    def obtener_arboles(self) -> list[set[str]]:
+        """
+        Se denomina arbol al conjunto de subconjuntos de nodos que forman parte del Digrafo, es decir que este método
+        retornará una lista de cadenas que forman parte del digrafo. Las cadenas entre sí no están conectadas.
+
+        Son las componentes debilmente conexas del digrafo, se recorren ignorando el sentido de las aristas. Incluye
+        también aquellas cadenas circulares que no tienen raíz
+
+        :return: Lista de cadenas "aisladas"
+        """
+        arbol = []
+        visitados = set()
+
+        for nodo in self._grafo:
+            if nodo in visitados:
+                continue
+
+            visitados.add(nodo)
+            conjunto_actual = {nodo}
+            pendientes = [nodo]
+            while pendientes:
+                actual = pendientes.pop()
+                for vecino in itertools.chain(self._grafo[actual], self._grafo_inverso[actual]):
+                    if vecino not in visitados:
+                        visitados.add(vecino)
+                        conjunto_actual.add(vecino)
+                        pendientes.append(vecino)
+
+            arbol.append(conjunto_actual)
+
+        return arbol
+
+    def recorrer_arbol(self) -> list[set[str]]:
+        pass
+
+    def ciclos(self) -> list[list[str]]:
+        """
+        Encuentra todas las dependencias circulares del digrafo, es decir, grupos de jobs que se esperan entre sí y que
+        por lo tanto nunca van a ejecutar. Son las componentes fuertemente conexas con más de un job (o un job que se
+        deja marca a sí mismo), calculadas con el algoritmo de Tarjan en O(V+E), ver _componentes_fuertes
+
+        :return: Lista de ciclos, cada ciclo es la lista (ordenada) de jobnames que lo componen
+        """
+        csr = self.grafo_csr()
+        cantidad = len(csr)
+        orden = array('i', [-1]) * cantidad
+
+        ciclos = []
+        for componente in self._componentes_fuertes(csr, range(cantidad), orden):
+            if len(componente) > 1 or componente[0] in csr.vecinos(componente[0]):
+                ciclos.append(sorted(csr.nombres[i] for i in componente))
+        return ciclos
+
+    @staticmethod
+    def _componentes_fuertes(csr: _GrafoCsr, raices, orden: array):
+        """
+        Algoritmo de Tarjan: devuelve las componentes fuertemente conexas alcanzables desde las raices, cada una como
+        lista de ids. Una componente se devuelve siempre después de todas las componentes que alcanza (orden
+        topologico inverso). Es iterativo, no recursivo, para no depender del limite de recursion con cadenas largas
+
+        :param csr: Digrafo en formato CSR
+        :param raices: Ids desde los cuales se recorre
+        :param orden: Array de tamaño len(csr) con -1 en los nodos no visitados, se actualiza con el orden de
+            descubrimiento. Se puede reutilizar entre llamadas sobre partes del digrafo que no están conectadas
+        """
+        inicio_hijos, hijos = csr.inicio_hijos, csr.hijos
+        minimo = {}  # Menor orden alcanzable desde el nodo (lowlink)
+        en_pila = set()
+        pila = []
+        contador = 0
+
+        for raiz in raices:
+            if orden[raiz] != -1:
+                continue
+
+            orden[raiz] = minimo[raiz] = contador
+            contador += 1
+            pila.append(raiz)
+            en_pila.add(raiz)
+            llamadas = [[raiz, inicio_hijos[raiz]]]  # Simula la pila de llamadas: (nodo, proximo hijo a visitar)
+
+            while llamadas:
+                llamada = llamadas[-1]
+                nodo, posicion = llamada
+
+                if posicion < inicio_hijos[nodo + 1]:
+                    llamada[1] += 1
+                    hijo = hijos[posicion]
+                    if orden[hijo] == -1:
+                        orden[hijo] = minimo[hijo] = contador
+                        contador += 1
+                        pila.append(hijo)
+                        en_pila.add(hijo)
+                        llamadas.append([hijo, inicio_hijos[hijo]])
+                    elif hijo in en_pila and orden[hijo] < minimo[nodo]:
+                        minimo[nodo] = orden[hijo]
+                    continue
+
+                llamadas.pop()
+                if llamadas:
+                    padre = llamadas[-1][0]
+                    if minimo[nodo] < minimo[padre]:
+                        minimo[padre] = minimo[nodo]
+
+                if minimo[nodo] == orden[nodo]:
+                    componente = []
+                    while True:
+                        miembro = pila.pop()
+                        en_pila.discard(miembro)
+                        componente.append(miembro)
+                        if miembro == nodo:
+                            break
+                    yield componente
+
+    def indice_alcance(self) -> _IndiceAlcance:
+        """
+        Devuelve el indice de alcance del digrafo (ver _IndiceAlcance), se crea una sola vez a pedido y cada cadena se
+        indexa recién la primera vez que se consulta por alguno de sus jobs
+        """
+        if self._alcance is None:
+            self._alcance = _IndiceAlcance(self.grafo_csr())
+        return self._alcance
+
+    def ancestros(self, jobname: str) -> list[str]:
+        """
+        :return: Todos los jobs de los que depende el job, directa o indirectamente. Incluye al propio job solamente si
+            forma parte de un ciclo
+        """
+        return self.indice_alcance().ancestros(jobname)
+
+    def descendientes(self, jobname: str) -> list[str]:
+        """
+        :return: Todos los jobs que dependen del job, directa o indirectamente. Incluye al propio job solamente si forma
+            parte de un ciclo
+        """
+        return self.indice_alcance().descendientes(jobname)
+
+    def alcanza(self, origen: str, destino: str) -> bool:
+        """
+        :return: True si destino depende, directa o indirectamente, de origen
+        """
+        return self.indice_alcance().alcanza(origen, destino)
+
+    def estan_conectados(self, jobname_a: str, jobname_b: str) -> bool:
+        """
+        :return: True si alguno de los dos jobs depende, directa o indirectamente, del otro
+        """
+        return self.alcanza(jobname_a, jobname_b) or self.alcanza(jobname_b, jobname_a)
+
+    def find_shortest_path(self, start, end, path=None) -> list[str] | None:
+        """
+        Encuentra el camino mas corto de un job a otro mediante Breadth First Search
 
         :param start: Inicio de la cadena
         :param end: Target, osea job al cual se debe buscar el camino
-        :param path: Lista de jobnames en la cual se va armando el camino
+        :param path: Camino previo a start, se antepone al resultado
         :return: Lista de jobnames ***en orden*** que representa el camino desde un job a otro
         """
-        if path is None:
-            path = []
-        path = path + [start]
+        prefijo = [] if path is None else list(path)
         if start == end:
-            return path
-        if start not in self._grafo.keys():
+            return prefijo + [start]
+        if start not in self._grafo:
             return None
-        shortest = None
-        for node in self._grafo[start]:
-            if node not in path:
-                newpath = self.find_shortest_path(node, end, path)
-                if newpath:
-                    if not shortest or len(newpath) < len(shortest):
-                        shortest = newpath
-        return shortest
+
+        anteriores = {start: None}
+        pendientes = deque([start])
+        while pendientes:
+            actual = pendientes.popleft()
+            for hijo in self._grafo[actual]:
+                if hijo in anteriores or hijo in prefijo:
+                    continue
+                anteriores[hijo] = actual
+                if hijo == end:
+                    camino = []
+                    while hijo is not None:
+                        camino.append(hijo)
+                        hijo = anteriores[hijo]
+                    return prefijo + camino[::-1]
+                pendientes.append(hijo)
+        return None
+
+    def obtener_pares_xy_cadena(self, cadena_jobnames: list[str]) -> list[tuple[str, str]]:
+        """
+        Devuelve las aristas del digrafo cuyos dos nodos pertenecen a la cadena
+
+        :param cadena_jobnames: Jobnames de la cadena
+        :return: Lista de pares (x, y)
+        """
+        cadena = dict.fromkeys(cadena_jobnames)  # Como un set, pero respeta el orden de la cadena
+        return [(nodo, hijo) for nodo in cadena if nodo in self._grafo for hijo in self._grafo[nodo] if hijo in cadena]
+
+
+class _GrafoCsr:
+    """
+    Representacion compacta de un digrafo: cada jobname se mapea a un id entero denso (su posicion en nombres) y las
+    aristas en ambos sentidos se guardan en formato CSR (Compressed Sparse Row). Los hijos del nodo i son
+    hijos[inicio_hijos[i]:inicio_hijos[i + 1]], lo mismo para los padres
+    """
+
+    def __init__(self, nombres: list[str], inicio_hijos: array, hijos: array, inicio_padres: array, padres: array):
+        self.nombres = nombres
+        self.ids: dict[str, int] = {nombre: i for i, nombre in enumerate(nombres)}
+        self.inicio_hijos = inicio_hijos
+        self.hijos = hijos
+        self.inicio_padres = inicio_padres
+        self.padres = padres
+
+    def __len__(self) -> int:
+        return len(self.nombres)
+
+    @staticmethod
+    def armar_csr(nombres: list[str], ids: dict[str, int], vecinos) -> tuple[array, array]:
+        """
+        Arma un par (inicio, adyacencia) en formato CSR
+
+        :param nombres: Jobnames en orden de id
+        :param ids: Mapeo jobname -> id
+        :param vecinos: Funcion que dado un id devuelve los jobnames vecinos, se ignoran los que no estén en ids
+        :return: Tupla (inicio, adyacencia)
+        """
+        inicio = array('i', [0])
+        adyacencia = array('i')
+        for i in range(len(nombres)):
+            adyacencia.extend(dict.fromkeys(ids[vecino] for vecino in vecinos(i) if vecino in ids))
+            inicio.append(len(adyacencia))
+        return inicio, adyacencia
+
+    @classmethod
+    def desde_adyacencias(cls, grafo: dict[str, list[str]], grafo_inverso: dict[str, list[str]]) -> _GrafoCsr:
+        nombres = list(grafo)
+        ids = {nombre: i for i, nombre in enumerate(nombres)}
+        inicio_hijos, hijos = cls.armar_csr(nombres, ids, lambda i: grafo[nombres[i]])
+        inicio_padres, padres = cls.armar_csr(nombres, ids, lambda i: grafo_inverso[nombres[i]])
+        return cls(nombres, inicio_hijos, hijos, inicio_padres, padres)
+
+    def vecinos(self, i: int, inverso: bool = False) -> array:
+        if inverso:
+            return self.padres[self.inicio_padres[i]:self.inicio_padres[i + 1]]
+        return self.hijos[self.inicio_hijos[i]:self.inicio_hijos[i + 1]]
+
+
+class _IndiceAlcance:
+    """
+    Indice de alcance (clausura transitiva) de un digrafo en formato CSR. Los jobs de cada cadena (componente debilmente
+    conexa) se numeran localmente y por cada job se guardan sus descendientes y sus ancestros como bitsets (int de
+    Python, el bit n corresponde al job n de la cadena). Así las consultas de alcance son operaciones de bits en vez de
+    recorridos. Las cadenas se indexan recién cuando se consulta por alguno de sus jobs
+
+    Para armar los bitsets se condensan los ciclos (ver ControlmDigrafo._componentes_fuertes): los jobs de un mismo
+    ciclo comparten sus bitsets
+    """
+
+    def __init__(self, csr: _GrafoCsr):
+        self._csr = csr
+        cantidad = len(csr)
+        self._cadena = array('i', [-1]) * cantidad  # Cadena a la que pertenece cada id, -1 si no se indexó
+        self._posicion = array('i', [0]) * cantidad  # Posicion (bit) de cada id dentro de su cadena
+        self._orden = array('i', [-1]) * cantidad  # Ver ControlmDigrafo._componentes_fuertes
+        self._miembros: list[list[int]] = []  # Ids de cada cadena, en orden de posicion
+        self._descendientes: dict[int, int] = {}
+        self._ancestros: dict[int, int] = {}
+
+    def _indexar(self, id_job: int) -> int:
+        """
+        Indexa la cadena del job si todavía no se indexó
+
+        :return: Numero de cadena
+        """
+        if self._cadena[id_job] != -1:
+            return self._cadena[id_job]
+
+        csr = self._csr
+        nro_cadena = len(self._miembros)
+        miembros = [id_job]
+        self._cadena[id_job] = nro_cadena
+        self._posicion[id_job] = 0
+        for actual in miembros:  # BFS ignorando el sentido de las aristas, miembros crece mientras se recorre
+            for vecino in itertools.chain(csr.vecinos(actual), csr.vecinos(actual, inverso=True)):
+                if self._cadena[vecino] == -1:
+                    self._cadena[vecino] = nro_cadena
+                    self._posicion[vecino] = len(miembros)
+                    miembros.append(vecino)
+        self._miembros.append(miembros)
+
+        posicion = self._posicion
+        componentes = list(ControlmDigrafo._componentes_fuertes(csr, miembros, self._orden))
+        componente_de = {}
+        for nro, componente in enumerate(componentes):
+            for miembro in componente:
+                componente_de[miembro] = nro
+
+        # Las componentes vienen en orden topologico inverso: cuando se procesa una, las que alcanza ya tienen sus bits
+        bits_componentes = [0] * len(componentes)
+        for nro, componente in enumerate(componentes):
+            bits = 0
+            for miembro in componente:
+                for hijo in csr.vecinos(miembro):
+                    bits |= (1 << posicion[hijo]) | bits_componentes[componente_de[hijo]]
+            bits_componentes[nro] = bits
+            for miembro in componente:
+                self._descendientes[miembro] = bits
+
+        bits_componentes = [0] * len(componentes)
+        for nro in range(len(componentes) - 1, -1, -1):
+            bits = 0
+            for miembro in componentes[nro]:
+                for padre in csr.vecinos(miembro, inverso=True):
+                    bits |= (1 << posicion[padre]) | bits_componentes[componente_de[padre]]
+            bits_componentes[nro] = bits
+            for miembro in componentes[nro]:
+                self._ancestros[miembro] = bits
+
+        return nro_cadena
+
+    def _nombres(self, nro_cadena: int, bits: int) -> list[str]:
+        miembros = self._miembros[nro_cadena]
+        nombres = self._csr.nombres
+        binario = bin(bits)[:1:-1]  # Sin el '0b' e invertido: el caracter n es el bit n
+        resultado = []
+        posicion = binario.find('1')
+        while posicion != -1:
+            resultado.append(nombres[miembros[posicion]])
+            posicion = binario.find('1', posicion + 1)
+        return resultado
+
+    # Un jobname que no pertenece al digrafo no tiene ancestros ni descendientes, igual que en los recorridos DFS
+
+    def descendientes(self, jobname: str) -> list[str]:
+        id_job = self._csr.ids.get(jobname)
+        if id_job is None:
+            return []
+        nro_cadena = self._indexar(id_job)
+        return self._nombres(nro_cadena, self._descendientes[id_job])
+
+    def ancestros(self, jobname: str) -> list[str]:
+        id_job = self._csr.ids.get(jobname)
+        if id_job is None:
+            return []
+        nro_cadena = self._indexar(id_job)
+        return self._nombres(nro_cadena, self._ancestros[id_job])
+
+    def cadena_completa(self, jobname: str) -> list[str]:
+        """El job, sus ancestros y sus descendientes"""
+        id_job = self._csr.ids.get(jobname)
+        if id_job is None:
+            return [jobname]
+        nro_cadena = self._indexar(id_job)
+        bits = self._descendientes[id_job] | self._ancestros[id_job] | (1 << self._posicion[id_job])
+        return self._nombres(nro_cadena, bits)
+
+    def alcanza(self, origen: str, destino: str) -> bool:
+        id_origen, id_destino = self._csr.ids.get(origen), self._csr.ids.get(destino)
+        if id_origen is None or id_destino is None or self._indexar(id_origen) != self._indexar(id_destino):
+            return False
+        return bool(self._descendientes[id_origen] >> self._posicion[id_destino] & 1)
+
+
+class ControlmDigrafoCompacto(ControlmDigrafo):
+    """
+    Misma interfaz que ControlmDigrafo, pero en vez de diccionarios de listas de jobnames guarda el digrafo con ids
+    enteros y arrays CSR (ver _GrafoCsr). Pensado para el digrafo global de produccion (decenas de miles de jobs y
+    aristas), donde ocupa una fracción de la memoria y los recorridos trabajan sobre enteros en vez de strings
+    """
+
+    @traza.trazada(nombre='ControlmDigrafoCompacto', atributos=lambda self, *_, **__: {'jobs': len(self._csr.nombres)})
+    def __init__(self, jobs: list[ControlmJob], indice_marcas: ControlmIndiceMarcas = None,
+                 mallas: dict[str, str] = None):
+        """
+        Constructor
+
+        :param jobs: Lista de jobs a ser agregados al Digrafo
+        :param indice_marcas: Indice de marcas ya armado que contiene (al menos) a los jobs. Si no se provee, se arma
+            uno a partir de los jobs
+        :param mallas: Malla a la que pertenece cada jobname, si no se provee se toma el PARENT_FOLDER de cada job
+        """
+
+        jobs = list({job.name: job for job in jobs}.values())
+        if indice_marcas is None:
+            indice_marcas = ControlmIndiceMarcas(jobs)
+
+        nombres = [job.name for job in jobs]
+        ids = {nombre: i for i, nombre in enumerate(nombres)}
+        inicio_hijos, hijos = _GrafoCsr.armar_csr(nombres, ids, lambda i: self._destinos(jobs[i], indice_marcas))
+        inicio_padres, padres = _GrafoCsr.armar_csr(nombres, ids, lambda i: self._origenes(jobs[i], indice_marcas))
+        self._csr = _GrafoCsr(nombres, inicio_hijos, hijos, inicio_padres, padres)
+
+        # Las mallas tambien se guardan como ids, hay muchos menos nombres de malla que jobs
+        ids_mallas: dict[str, int] = {}
+        self._mallas_ids = array('i')
+        for job in jobs:
+            nombre_malla = mallas[job.name] if mallas is not None else job.atributos.get('PARENT_FOLDER')
+            self._mallas_ids.append(ids_mallas.setdefault(nombre_malla, len(ids_mallas)))
+        self._nombres_mallas = list(ids_mallas)
+        self._alcance: _IndiceAlcance | None = None
+
+    def grafo_csr(self) -> _GrafoCsr:
+        return self._csr
+
+    def __str__(self):
+        csr = self._csr
+        return ''.join(f"{nodo}: {[csr.nombres[h] for h in csr.vecinos(i)]}\n" for i, nodo in enumerate(csr.nombres))
+
+    def __contains__(self, jobname: str) -> bool:
+        return jobname in self._csr.ids
+
+    def __len__(self) -> int:
+        return len(self._csr)
+
+    def hijos(self, jobname: str) -> list[str]:
+        i = self._csr.ids.get(jobname)
+        return [] if i is None else [self._csr.nombres[h] for h in self._csr.vecinos(i)]
+
+    def padres(self, jobname: str) -> list[str]:
+        i = self._csr.ids.get(jobname)
+        return [] if i is None else [self._csr.nombres[p] for p in self._csr.vecinos(i, inverso=True)]
+
+    def malla(self, jobname: str) -> str | None:
+        i = self._csr.ids.get(jobname)
+        return None if i is None else self._nombres_mallas[self._mallas_ids[i]]
+
+    def _pares_ids(self):
+        csr = self._csr
+        for i in range(len(csr)):
+            for h in csr.vecinos(i):
+                yield i, h
+
+    def obtener_paresxy(self) -> tuple:
+        nombres = self._csr.nombres
+        return tuple((nombres[i], nombres[h]) for i, h in self._pares_ids())
+
+    def aristas_entre_mallas(self) -> list[tuple[str, str, str, str]]:
+        nombres = self._csr.nombres
+        mallas_ids = self._mallas_ids
+        return [
+            (nombres[i], nombres[h], self._nombres_mallas[mallas_ids[i]], self._nombres_mallas[mallas_ids[h]])
+            for i, h in self._pares_ids() if mallas_ids[i] != mallas_ids[h]
+        ]
+
+    def raices(self) -> list[str]:
+        csr = self._csr
+        inicio = csr.inicio_padres
+        return [nombre for i, nombre in enumerate(csr.nombres) if inicio[i] == inicio[i + 1]]
+
+    def hojas(self) -> list[str]:
+        csr = self._csr
+        inicio = csr.inicio_hijos
+        return [nombre for i, nombre in enumerate(csr.nombres) if inicio[i] == inicio[i + 1]]
+
+    def es_raiz(self, jobname: str) -> bool:
+        i = self._csr.ids.get(jobname)
+        return i is not None and self._csr.inicio_padres[i] == self._csr.inicio_padres[i + 1]
+
+    def es_hoja(self, jobname: str) -> bool:
+        i = self._csr.ids.get(jobname)
+        return i is not None and self._csr.inicio_hijos[i] == self._csr.inicio_hijos[i + 1]
+
+    def _dfs_ids(self, inicio: str, visitados: set[str] | None, inverso: bool) -> list[str]:
+        """
+        Mismo recorrido que ControlmDigrafo._dfs (mismo orden de visita) pero sobre los ids y arrays CSR
+        """
+        csr = self._csr
+        i = csr.ids.get(inicio)
+        if i is None:
+            if visitados is not None:
+                visitados.add(inicio)
+            return [inicio]
+
+        inicio_vecinos, vecinos = (csr.inicio_padres, csr.padres) if inverso else (csr.inicio_hijos, csr.hijos)
+        marcados = bytearray(len(csr))
+        if visitados:
+            for nombre in visitados:
+                j = csr.ids.get(nombre)
+                if j is not None:
+                    marcados[j] = 1
+
+        marcados[i] = 1
+        recorrido = [i]
+        pila = [iter(range(inicio_vecinos[i], inicio_vecinos[i + 1]))]
+        while pila:
+            for posicion in pila[-1]:
+                hijo = vecinos[posicion]
+                if not marcados[hijo]:
+                    marcados[hijo] = 1
+                    recorrido.append(hijo)
+                    pila.append(iter(range(inicio_vecinos[hijo], inicio_vecinos[hijo + 1])))
+                    break
+            else:
+                pila.pop()
+
+        cadena = [csr.nombres[j] for j in recorrido]
+        if visitados is not None:
+            visitados.update(cadena)
+        return cadena
+
+    def recorrer_cadena(self, inicio: str, visitados=None) -> list[str]:
+        return self._dfs_ids(inicio, visitados, inverso=False)
+
+    def recorrer_cadena_inversa(self, inicio: str, visitados=None) -> list[str]:
+        return self._dfs_ids(inicio, visitados, inverso=True)
+
+    def obtener_arboles(self) -> list[set[str]]:
+        csr = self._csr
+        marcados = bytearray(len(csr))
+        arbol = []
+
+        for i in range(len(csr)):
+            if marcados[i]:
+                continue
+
+            marcados[i] = 1
+            componente = [i]
+            pendientes = [i]
+            while pendientes:
+                actual = pendientes.pop()
+                for vecino in itertools.chain(csr.vecinos(actual), csr.vecinos(actual, inverso=True)):
+                    if not marcados[vecino]:
+                        marcados[vecino] = 1
+                        componente.append(vecino)
+                        pendientes.append(vecino)
+
+            arbol.append({csr.nombres[j] for j in componente})
+
+        return arbol
+
+    def find_shortest_path(self, start, end, path=None) -> list[str] | None:
+        csr = self._csr
+        prefijo = [] if path is None else list(path)
+        if start == end:
+            return prefijo + [start]
+        i = csr.ids.get(start)
+        if i is None or end not in csr.ids:
+            return None
+
+        excluidos = {csr.ids[nombre] for nombre in prefijo if nombre in csr.ids}
+        anteriores = array('i', [-1]) * len(csr)
+        anteriores[i] = i
+        destino = csr.ids[end]
+        pendientes = deque([i])
+        while pendientes:
+            actual = pendientes.popleft()
+            for hijo in csr.vecinos(actual):
+                if anteriores[hijo] != -1 or hijo in excluidos:
+                    continue
+                anteriores[hijo] = actual
+                if hijo == destino:
+                    camino = [hijo]
+                    while hijo != i:
+                        hijo = anteriores[hijo]
+                        camino.append(hijo)
+                    return prefijo + [csr.nombres[j] for j in reversed(camino)]
+                pendientes.append(hijo)
+        return None
 
     def obtener_pares_xy_cadena(self, cadena_jobnames: list[str]) -> list[tuple[str, str]]:
-        lista_pares_retorno = []
-        pares_xy = self.obtener_paresxy()
+        csr = self._csr
+        ids_cadena = dict.fromkeys(csr.ids[nombre] for nombre in cadena_jobnames if nombre in csr.ids)
+        return [
+            (csr.nombres[i], csr.nombres[h]) for i in ids_cadena for h in csr.vecinos(i) if h in ids_cadena
+        ]
+
+
+class _ContextoAmbientacion(dict):
+    """Contexto para formatear las reglas de ambientacion, los campos que no tiene (ej: {odate}) quedan tal cual"""
+
+    def __missing__(self, key: str) -> str:
+        return '{' + key + '}'
+
+
+class ReglasAmbientacion:
+    """
+    Tabla de reglas con las que MallaMaxi ambienta los jobs temporales, por defecto constantes.REGLAS_AMBIENTACION.
+    Las reglas se compilan una sola vez por job de la cadena primordial (ver compilar) y el resultado se estampa en cada
+    una de sus replicas, en las que solamente cambian el jobname y las variables que dependen del ODATE
+    """
+
+    def __init__(self, tabla: dict = None):
+        """
+        Constructor
+
+        :param tabla: Tabla de reglas con la estructura de constantes.REGLAS_AMBIENTACION. Las secciones que no tenga
+            se toman de la tabla por defecto
+        """
+        self.tabla = deepcopy(REGLAS_AMBIENTACION)
+        if tabla is not None:
+            self.tabla.update(deepcopy(tabla))
+
+    @classmethod
+    def desde_json(cls, path: str) -> ReglasAmbientacion:
+        """
+        Carga una tabla de reglas desde un .json, ver __init__
+
+        :param path: Path del .json
+        """
+        with open(path, encoding='UTF-8') as archivo:
+            return cls(json.load(archivo))
+
+    def compilar(self, job: ControlmJob, contexto: dict) -> PlantillaAmbientacion:
+        """
+        Evalúa las reglas sobre un job plantilla
+
+        :param job: Job sin ambientar, todas sus replicas deben ser iguales a él salvo por el jobname
+        :param contexto: Valores de {mail}, {folder_name}, {caso_d_uso} y {legajo}
+        :return: Plantilla a estampar en cada replica
+        """
+        contexto = _ContextoAmbientacion(contexto)
+        tabla = self.tabla
+
+        atributos = dict(job.atributos)
+        for atributo, agregado in tabla['atributos_agregados'].items():
+            atributos[atributo] = atributos.get(atributo, '') + agregado.format_map(contexto)
+        for atributo in tabla['atributos_eliminados']:
+            atributos.pop(atributo, None)
+        for atributo, valor in tabla['atributos'].items():
+            atributos[atributo] = valor.format_map(contexto)
+
+        variables = dict(job.variables)
+        variables_por_odate = []
+        for nombre, valor in variables.items():
+            for regla in tabla['variables']:
+                if regla['patron'] not in valor:
+                    continue
+                reemplazo = regla['reemplazo'].format_map(contexto)
+                if '{odate}' in reemplazo:
+                    variables_por_odate.append((nombre, valor, regla['patron'], reemplazo))
+                else:
+                    variables[nombre] = valor.replace(regla['patron'], reemplazo)
+                break
+
+        acciones = {}
+        for codigo, acciones_codigo in tabla['acciones'].items():
+            acciones[codigo] = []
+            for accion in acciones_codigo:
+                attrs = {atributo: valor.format_map(contexto) for atributo, valor in accion['atributos'].items()}
+                if accion['accion'] == 'DOMAIL' and 'MESSAGE' in attrs:
+                    attrs['MESSAGE'] = str(len(attrs['MESSAGE'])).zfill(4) + attrs['MESSAGE']
+                acciones[codigo].append(ControlmAction(action_id=accion['accion'], attrs=attrs))
+
+        recursos = [ControlmRecursoCuantitativo(name=nombre) for nombre in tabla['recursos_cuantitativos']]
+
+        return PlantillaAmbientacion(atributos, variables, variables_por_odate, recursos, acciones)
+
+
+class PlantillaAmbientacion:
+    """
+    Resultado de compilar las reglas de ambientacion sobre un job, ver ReglasAmbientacion.compilar
+    """
+
+    def __init__(self, atributos: dict[str, str], variables: dict[str, str],
+                 variables_por_odate: list[tuple[str, str, str, str]], recursos: list[ControlmRecursoCuantitativo],
+                 acciones: dict[str, list[ControlmAction]]):
+        """
+        Constructor
+
+        :param atributos: Atributos ya ambientados, el jobname se pisa en cada replica
+        :param variables: Variables ya ambientadas, salvo las que dependen del ODATE
+        :param variables_por_odate: (nombre, valor original, patron, reemplazo con {odate}) de cada variable que
+            depende del ODATE
+        :param recursos: Recursos cuantitativos
+        :param acciones: Acciones por codigo de finalizacion. Las acciones se comparten entre las replicas, las listas no
+        """
+        self.atributos = atributos
+        self.variables = variables
+        self.variables_por_odate = variables_por_odate
+        self.recursos = recursos
+        self.acciones = acciones
+
+    def estampar(self, job: ControlmJob):
+        """
+        Ambienta una replica del job plantilla
 
-        for parxy in pares_xy:
-            if parxy[0] in cadena_jobnames and parxy[1] in cadena_jobnames:
-                lista_pares_retorno.append(parxy)
+        :param job: Replica, debe tener su jobname temporal y su odate (None si lo resuelve control-M al ordenarlo)
+        """
+        atributos = dict(self.atributos)
+        atributos[TagXml.JOB_NAME] = job.name
+        job.atributos = atributos
+
+        job.variables = dict(self.variables)
+        if job.odate is not None:
+            for nombre, valor, patron, reemplazo in self.variables_por_odate:
+                job.variables[nombre] = valor.replace(patron, reemplazo.replace('{odate}', job.odate))
+        job.invalidar_expansiones()
 
-        return lista_pares_retorno
+        job.recursos_cuantitativos = list(self.recursos)
+        for codigo, acciones in self.acciones.items():
+            job.onconditions[codigo] = list(acciones)
 
 
 class MallaMaxi:
@@ -983,21 +2765,64 @@ class MallaMaxi:
     'transformar' y la malla de referencia de la cual obtiene informacion que usa durante tod0 el proceso
     """
 
-    def __init__(self, cadena_jobnames: list[ControlmJob], malla_origen: ControlmFolder):
+    # Atributos de las carpetas temporales, el FOLDER_NAME se completa por cada carpeta
+    atributos_carpeta = {
+        'DATACENTER': "CTM_CTRLMCCR",
+        'VERSION': "919",
+        'PLATFORM': "UNIX",
+        'FOLDER_NAME': None,
+        'MODIFIED': "False",
+        'LAST_UPLOAD': "20240925182750UTC",
+        'FOLDER_ORDER_METHOD': "PRUEBAS",
+        'REAL_FOLDER_ID': "6934",
+        'TYPE': "1",
+    }
+
+    def __init__(self, cadena_jobnames: list[ControlmJob], malla_origen: ControlmFolder,
+                 digrafo: ControlmDigrafo = None, jobnames_ocupados: set[str] = None,
+                 reglas_ambientacion: ReglasAmbientacion = None):
         """
         Constructor
 
         :param cadena_jobnames: Lista de jobs que se deben transformar a temporales
         :param malla_origen: Malla que contiene los jobs
+        :param digrafo: Digrafo a partir del cual se ordenan los jobs, por defecto el de la malla origen. Pasar el
+            digrafo de un ControlmContainer para tener en cuenta predecesores que estén en otras mallas
+        :param jobnames_ocupados: Jobnames que ya existen en productivo (ej: otras temporales 9XXX), los jobs
+            temporales no los van a repetir. Los de la malla origen se agregan siempre. Ver utils.AsignadorJobnames
+        :param reglas_ambientacion: Reglas con las que se ambientan los jobs, por defecto constantes.REGLAS_AMBIENTACION
         """
         self._folder_name_exp = None
         self.cadena_completa_temporal = None
         self.cadena_primordial = None
+        self.particiones: list[tuple[str, list[ControlmJob]]] | None = None
+        self.odates: list[str] | None = None  # ODATES de la temporal, con formato YYYYMMDD
+        self.carriles: int | None = None  # Ver replicar_y_enlazar
+        self._job_iterador: ControlmJob | None = None
+        self._odates_iteracion: list[str] | None = None
+        self._iteracion_concurrente = False
+        self._jobs_siguientes: list[ControlmJob] = []  # Ver replicar_iterando_odates
+        self.marca_iteracion: str | None = None  # Marca con la que termina cada iteracion de a uno
+        self._max_jobs_particion: int | None = None
+        self._carpetas_ocupadas: frozenset[str] = frozenset()  # Ver particionar
+        self._ambientacion: tuple[str, str, str, bool] | None = None
+        self._reglas = reglas_ambientacion if reglas_ambientacion is not None else ReglasAmbientacion()
+        self._contexto_ambientacion: dict[str, str] | None = None
+        self._plantillas: dict[str, PlantillaAmbientacion] = {}  # Jobname original -> plantilla, ver _ambientar_job
+
+        # Modelo incremental de la temporal en linea, ver actualizar
+        self._replicas: list[tuple[str, dict[str, ControlmJob]]] | None = None
+        self._vecinos: dict[str, tuple[str | None, str | None]] | None = None
+        self._mediante_accion: bool | None = None
         self._trabajos_seleccionados = cadena_jobnames
         self._malla_origen = malla_origen
+        self._digrafo = digrafo if digrafo is not None else malla_origen.digrafo
 
-        self.job_suffix = utils.Secuencia()
+        self.asignador_jobnames = utils.AsignadorJobnames(malla_origen.jobnames())
+        if jobnames_ocupados is not None:
+            self.asignador_jobnames.agregar_ocupados(jobnames_ocupados)
 
+    @traza.trazada(nombre='MallaMaxi.ordenar', atributos=lambda self: {'jobs': len(self.cadena_primordial)})
     def ordenar(self):
         """
         Genera una lista de jobnames que representa la cadena 'base', o 'primordial' de la malla temporal. A partir de
@@ -1005,7 +2830,7 @@ class MallaMaxi:
         """
 
         # TODO: Contemplar el caso en el cual una cadena tiene 2 o mas raices (hay que generar el arbol)
-        cadenas_relevantes = [self._malla_origen.digrafo.recorrer_cadena_completa(job.name) for job in
+        cadenas_relevantes = [self._digrafo.recorrer_cadena_completa(job.name) for job in
                               self._trabajos_seleccionados]
         cadenas_relevantes = list(map(sorted, cadenas_relevantes))
 
@@ -1022,17 +2847,18 @@ class MallaMaxi:
         # Nota: cadena_final_tmp ya está filtrada (ver el filter que se realiza sobre cadena_con_orden de mas abajo),
         # pues no va a poseer los jobs que no fueron seleccionados en tequinter
         cadena_final_tmp = []
+        jobnames_seleccionados = {trabajo.name for trabajo in self._trabajos_seleccionados}
 
         for cadena in cadenas_relevantes:
             cadena_con_orden = []
             for jobname in cadena:
-                if self._malla_origen.digrafo.es_raiz(jobname):
-                    cadena_descendiente = self._malla_origen.digrafo.recorrer_cadena(jobname)
+                if self._digrafo.es_raiz(jobname):
+                    cadena_descendiente = self._digrafo.recorrer_cadena(jobname)
                     for jobname_des in cadena_descendiente:
                         cadena_con_orden.append(
                             (
                                 jobname_des,
-                                len(self._malla_origen.digrafo.find_shortest_path(start=jobname, end=jobname_des))
+                                len(self._digrafo.find_shortest_path(start=jobname, end=jobname_des))
                             )
                         )
                     break
@@ -1041,17 +2867,25 @@ class MallaMaxi:
             cadena_final_tmp.append(
                 list(
                     filter(
-                        lambda x: x[0] in [trabajo.name for trabajo in self._trabajos_seleccionados],
+                        lambda x: x[0] in jobnames_seleccionados,
                         cadena_con_orden)
                 )
             )
 
-        self.cadena_primordial = [e[0] for lista in cadena_final_tmp for e in lista]
+        # Si la cadena tiene ramas, varios jobs seleccionados pueden llegar a la misma raiz. Nos quedamos con la primera
+        # aparicion de cada job
+        self.cadena_primordial = list(dict.fromkeys(e[0] for lista in cadena_final_tmp for e in lista))
         self.cadena_primordial = list(map(self._malla_origen.obtener_job, self.cadena_primordial))
 
     def _ambientar_name(self, job: ControlmJob):
-        new_name = job.name[:-4] + '9' + self.job_suffix.obtener_nmnemoc()
-        job.name = new_name
+        job.jobname_plantilla = job.name
+        job.name = self.asignador_jobnames.obtener_jobname(job.name[:-4] + '9')
+
+    def _ambientar_names(self, jobs: list[ControlmJob]):
+        nuevos_nombres = self.asignador_jobnames.reservar(job.name[:-4] + '9' for job in jobs)
+        for job, nuevo_nombre in zip(jobs, nuevos_nombres):
+            job.jobname_plantilla = job.name
+            job.name = nuevo_nombre
 
     @staticmethod
     def _ambientar_marcas(cadena: list[ControlmJob]):
@@ -1061,58 +2895,156 @@ class MallaMaxi:
         else:
             valor_mediante_accion = False
 
-        for job in cadena:
+        for index in range(len(cadena)):
+            MallaMaxi._enlazar_posicion(cadena, index, valor_mediante_accion)
+
+    @staticmethod
+    def _enlazar_posicion(cadena: list[ControlmJob], index: int, valor_mediante_accion: bool):
+        """
+        Arma las marcas del job que ocupa la posicion index de una cadena en linea: espera la marca del job anterior,
+        la elimina y le deja marca al job siguiente. Solo depende de los vecinos, ver _reenlazar
+        """
+        job = cadena[index]
+
+        if index == 0:
             job.marcasin = None
-            job.marcasout = None
+        else:
+            job.marcasin = [
+                ControlmMarcaIn(
+                    marca_nombre=f'{cadena[index-1].name}-TO-{job.name}',
+                    odate_esperado='ODAT'
+                )
+            ]
 
-        for index, job in enumerate(cadena):
-            if job is cadena[0]:
-                job.marcasin = None
-            else:
-                job.marcasin = [
-                    ControlmMarcaIn(
-                        marca_nombre=f'{cadena[index-1].name}-TO-{job.name}',
-                        odate_esperado='ODAT'
-                    )
-                ]
+        if index == len(cadena) - 1:
+            job.marcasout = None
+        else:
+            job.marcasout = [
+                ControlmMarcaOut(
+                    marca_nombre=f'{job.name}-TO-{cadena[index+1].name}',
+                    odate_esperado='ODAT',
+                    signo='+',
+                    mediante_accion=valor_mediante_accion
+                )
+            ]
 
-            if job is cadena[-1]:
-                job.marcasout = None
-            else:
+        if job.marcasin is not None:
+            try:
+                job.marcasout.append(
+                    ControlmMarcaOut(
+                        marca_nombre=f'{cadena[index-1]}-TO-{job.name}',
+                        odate_esperado='ODAT',
+                        signo='-',
+                        mediante_accion=False
+                    ))
+            except AttributeError:
                 job.marcasout = [
                     ControlmMarcaOut(
-                        marca_nombre=f'{job.name}-TO-{cadena[index+1].name}',
+                        marca_nombre=f'{cadena[index-1]}-TO-{job.name}',
                         odate_esperado='ODAT',
-                        signo='+',
-                        mediante_accion=valor_mediante_accion
+                        signo='-',
+                        mediante_accion=False
                     )
                 ]
 
-            if job.marcasin is not None:
-                try:
-                    job.marcasout.append(
-                        ControlmMarcaOut(
-                            marca_nombre=f'{cadena[index-1]}-TO-{job.name}',
-                            odate_esperado='ODAT',
-                            signo='-',
-                            mediante_accion=False
-                        ))
-                except AttributeError:
-                    job.marcasout = [
-                        ControlmMarcaOut(
-                            marca_nombre=f'{cadena[index-1]}-TO-{job.name}',
-                            odate_esperado='ODAT',
-                            signo='-',
-                            mediante_accion=False
-                        )
-                    ]
+    def _aristas_primordiales(self) -> dict[str, list[str]]:
+        """
+        Arma el digrafo de la cadena primordial a partir del digrafo de origen. Si entre dos jobs seleccionados hay
+        jobs que no fueron seleccionados, estos se saltean y los dos jobs seleccionados quedan unidos directamente
+
+        :return: Diccionario jobname -> jobnames de la cadena primordial que le siguen
+        """
+        seleccionados = {job.name for job in self.cadena_primordial}
+        aristas = {}
+        for job in self.cadena_primordial:
+            sucesores = []
+            visitados = {job.name}
+            pendientes = self._digrafo.hijos(job.name)
+            while pendientes:
+                hijo = pendientes.pop(0)
+                if hijo in visitados:
+                    continue
+                visitados.add(hijo)
+                if hijo in seleccionados:
+                    sucesores.append(hijo)
+                else:
+                    pendientes.extend(self._digrafo.hijos(hijo))
+            aristas[job.name] = sucesores
+        return aristas
+
+    def _oleadas_primordiales(self, aristas: dict[str, list[str]]) -> list[list[str]]:
+        """
+        Agrupa la cadena primordial en oleadas (orden topologico por niveles): la primera oleada son los jobs sin
+        predecesores, y cada job queda en la oleada siguiente a la de su predecesor más lejano. Los jobs de una misma
+        oleada no dependen entre sí
+
+        :param aristas: Digrafo de la cadena primordial, ver _aristas_primordiales
+        :return: Lista de oleadas, cada una con sus jobnames en el orden de la cadena primordial
+        """
+        cant_padres = dict.fromkeys(aristas, 0)
+        for sucesores in aristas.values():
+            for sucesor in sucesores:
+                cant_padres[sucesor] += 1
+
+        nivel = dict.fromkeys(aristas, 0)
+        pendientes = deque(jobname for jobname, cantidad in cant_padres.items() if cantidad == 0)
+        procesados = 0
+        while pendientes:
+            jobname = pendientes.popleft()
+            procesados += 1
+            for sucesor in aristas[jobname]:
+                nivel[sucesor] = max(nivel[sucesor], nivel[jobname] + 1)
+                cant_padres[sucesor] -= 1
+                if cant_padres[sucesor] == 0:
+                    pendientes.append(sucesor)
+
+        if procesados != len(aristas):
+            ciclicos = [jobname for jobname, cantidad in cant_padres.items() if cantidad > 0]
+            raise Exception(f"No se puede respetar el digrafo de la cadena debido a que los jobs {ciclicos} tienen una dependencia circular")
+
+        oleadas = [[] for _ in range(max(nivel.values(), default=-1) + 1)]
+        for jobname in aristas:  # aristas respeta el orden de la cadena primordial
+            oleadas[nivel[jobname]].append(jobname)
+        return oleadas
+
+    @staticmethod
+    def _enlazar(origen: ControlmJob, destino: ControlmJob, mediante_accion: bool):
+        """
+        Une dos jobs mediante una marca: el origen la agrega y el destino la espera. La eliminacion de la marca por
+        parte del destino se agrega luego, ver replicar_y_enlazar
+        """
+        nombre_marca = f'{origen.name}-TO-{destino.name}'
+        origen.marcasout.append(
+            ControlmMarcaOut(marca_nombre=nombre_marca, odate_esperado='ODAT', signo='+', mediante_accion=mediante_accion)
+        )
+        destino.marcasin.append(ControlmMarcaIn(marca_nombre=nombre_marca, odate_esperado='ODAT'))
 
-    def replicar_y_enlazar(self, odates_seleccionados: list):
+    @traza.trazada(nombre='MallaMaxi.replicar_y_enlazar', atributos=lambda self, *_, **__: {'odates': len(self.odates), 'jobs': len(self.cadena_completa_temporal)})
+    def replicar_y_enlazar(self, odates_seleccionados: list, carriles: int = None):
         """
         Replica una cadena primordial tantas veces como haya ODATES (seleccionados) desde los cuales se requieran
         ejecutar cada cadena. Luego une los jobs mediante marcas y los deja en una sola 'linea'
+
+        Si se indican carriles, en vez de una sola linea se respeta el digrafo original de la cadena (los jobs que en la
+        malla de origen corren en paralelo también lo hacen en la temporal) y se ejecutan hasta 'carriles' ODATES en
+        paralelo: la replica del ODATE n espera a que termine la del ODATE n - carriles. La cantidad de jobs que corren
+        a la vez en el servidor la sigue limitando el recurso cuantitativo ARD-TMP, que ambientar les asigna a todos
+        los jobs aunque las reglas de ambientacion no lo hagan (ver constantes.RECURSO_TEMPORALES)
+
+        :param odates_seleccionados: ODATES a replicar, con formato YYYY-MM-DD
+        :param carriles: Cantidad de ODATES que corren en paralelo. None para la linea unica
         """
+        if carriles is not None and carriles < 1:
+            raise ValueError(f"La cantidad de carriles debe ser mayor a 0, valor obtenido [{carriles}]")
+
         odates = [x.replace('-', '') for x in odates_seleccionados]
+        self.odates = odates
+        self.carriles = carriles
+
+        if carriles is not None:
+            self._replicas = None
+            self._replicar_en_carriles(odates, carriles)
+            return
 
         # Generamos n odates como elementos haya en la cadena primordial. Esto es porque tenemos que asignarle un odate
         # a cada job
@@ -1130,92 +3062,398 @@ class MallaMaxi:
 
         # Pasamos a 9XXX, se tiene que hacer de a partes debido a que las marcas necesitan que estén todas las cadenas
         # con sus jobnames ambientados a malla temporal. De paso
+        self._ambientar_names(cadena_temporal)
         for index, job in enumerate(cadena_temporal):
-            self._ambientar_name(job)
             job.odate = odates_list_temp[index]  # Esto es mucho muy importante
 
         # Enlazamos todos los jobs
         self._ambientar_marcas(cadena_temporal)
         self.cadena_completa_temporal = cadena_temporal
 
+        # Guardamos cada replica por separado para poder actualizar la temporal sin regenerarla, ver actualizar
+        cant_jobs = len(self.cadena_primordial)
+        jobnames_originales = [job.name for job in self.cadena_primordial]
+        self._replicas = [
+            (odate, dict(zip(jobnames_originales, cadena_temporal[nro * cant_jobs:(nro + 1) * cant_jobs])))
+            for nro, odate in enumerate(odates)
+        ]
+        self._vecinos = self._calcular_vecinos(cadena_temporal)
+        self._mediante_accion = len(cadena_temporal) > Limits.MAX_JOBS_TMP
+
+    def _replicar_en_carriles(self, odates: list[str], carriles: int):
+        """
+        Ver replicar_y_enlazar. Cada replica se guarda como diccionario jobname original -> job temporal para poder
+        trasladar las aristas de la cadena primordial a cada replica
+        """
+        aristas = self._aristas_primordiales()
+        oleadas = self._oleadas_primordiales(aristas)
+        orden = [self._malla_origen.obtener_job(jobname) for oleada in oleadas for jobname in oleada]
+        raices = oleadas[0] if oleadas else []
+        hojas = [jobname for jobname, sucesores in aristas.items() if not sucesores]
+
+        mediante_accion = len(orden) * len(odates) > Limits.MAX_JOBS_TMP
+
+        replicas: list[dict[str, ControlmJob]] = []
+        for odate in odates:
+            replica = dict(zip((job.name for job in orden), deepcopy(orden)))
+            self._ambientar_names(list(replica.values()))
+            for job in replica.values():
+                job.odate = odate  # Esto es mucho muy importante
+                job.marcasin = []
+                job.marcasout = []
+            replicas.append(replica)
+
+        for index, replica in enumerate(replicas):
+            for origen, sucesores in aristas.items():
+                for destino in sucesores:
+                    self._enlazar(replica[origen], replica[destino], mediante_accion)
+
+            # Encadenamos con la replica anterior del mismo carril
+            if index >= carriles:
+                anterior = replicas[index - carriles]
+                for hoja in hojas:
+                    for raiz in raices:
+                        self._enlazar(anterior[hoja], replica[raiz], mediante_accion)
+
+        cadena_temporal = [job for replica in replicas for job in replica.values()]
+
+        # Cada job elimina las marcas que espera una vez que arranca
+        for job in cadena_temporal:
+            for marca_in in job.marcasin:
+                job.marcasout.append(
+                    ControlmMarcaOut(marca_nombre=marca_in.name, odate_esperado='ODAT', signo='-', mediante_accion=False)
+                )
+
+        self.cadena_completa_temporal = cadena_temporal
+
+    @staticmethod
+    def _calcular_vecinos(cadena: list[ControlmJob]) -> dict[str, tuple[str | None, str | None]]:
+        """
+        :return: Diccionario jobname -> (jobname anterior, jobname siguiente) de una cadena en linea
+        """
+        jobnames = [None] + [job.name for job in cadena] + [None]
+        return {jobnames[i]: (jobnames[i - 1], jobnames[i + 1]) for i in range(1, len(jobnames) - 1)}
+
+    def _validar_incremental(self):
+        if self._replicas is None:
+            raise Exception("La actualizacion incremental solo está disponible para la temporal en linea (sin carriles ni iterando ODATES), ver replicar_y_enlazar")
+
+    def admite_actualizacion(self, malla_origen: ControlmFolder, mail: str, caso_d_uso: str, legajo: str,
+                             configurar_con_force: bool) -> bool:
+        """
+        Indica si la temporal se puede actualizar (ver actualizar) en vez de generarse de nuevo: tiene que ser una
+        temporal en linea ya ambientada, de la misma malla origen y con los mismos datos de ambientacion
+
+        Solamente se actualiza la temporal en linea única (replicar_y_enlazar sin carriles). Con carriles o iterando
+        ODATES (replicar_iterando_odates) siempre devuelve False y la temporal se debe generar de nuevo: no se guardan
+        las replicas por separado, y en los carriles agregar o quitar un ODATE cambia el enlace de todas las replicas
+        que le siguen
+        """
+        return (
+            self._replicas is not None
+            and self._malla_origen is malla_origen
+            and self._ambientacion == (mail, caso_d_uso, legajo, configurar_con_force)
+        )
+
+    def _nueva_replica(self, odate: str, jobs: list[ControlmJob]) -> dict[str, ControlmJob]:
+        """
+        Copia los jobs indicados para un ODATE con sus jobnames temporales y, si la temporal ya fue ambientada, los
+        ambienta. Las marcas se arman luego en _reenlazar
+
+        :return: Diccionario jobname original -> job temporal
+        """
+        replica = dict(zip((job.name for job in jobs), deepcopy(jobs)))
+        self._ambientar_names(list(replica.values()))
+        for job in replica.values():
+            job.odate = odate
+            if self._ambientacion is not None:
+                self._ambientar_job(job)
+        return replica
+
+    def _reenlazar(self):
+        """
+        Rearma cadena_completa_temporal a partir de las replicas y vuelve a enlazar solamente los jobs cuyos vecinos
+        cambiaron (y sus acciones de force, si la temporal ya fue ambientada). Si la temporal estaba partida, se vuelve
+        a partir con el mismo limite
+        """
+        cadena = [job for _, replica in self._replicas for job in replica.values()]
+        valor_mediante_accion = len(cadena) > Limits.MAX_JOBS_TMP
+        enlazar_todos = valor_mediante_accion != self._mediante_accion
+
+        vecinos = self._calcular_vecinos(cadena)
+        for index, job in enumerate(cadena):
+            if not enlazar_todos and self._vecinos.get(job.name) == vecinos[job.name]:
+                continue
+            self._enlazar_posicion(cadena, index, valor_mediante_accion)
+            if self._ambientacion is not None:
+                job.onconditions['OK'] = [
+                    action for action in job.onconditions['OK'] if action.id not in ('DOCOND', 'DOFORCEJOB')
+                ]
+                self._ambientar_enlaces(job, self._folder_name_exp, self._ambientacion[3], set())
+
+        self._vecinos = vecinos
+        self._mediante_accion = valor_mediante_accion
+        self.cadena_completa_temporal = cadena
+        self.odates = [odate for odate, _ in self._replicas]
+
+        if self.particiones is not None:
+            self.particionar(self._max_jobs_particion, self._carpetas_ocupadas)
+
+    def agregar_odates(self, odates_seleccionados: list):
+        """
+        Agrega a la temporal en linea una replica por cada ODATE, ubicada según su fecha. Solamente se copian y se
+        ambientan los jobs nuevos, y se reenlazan sus vecinos
+
+        :param odates_seleccionados: ODATES a agregar, con formato YYYY-MM-DD
+        """
+        self._validar_incremental()
+        for odate in (x.replace('-', '') for x in odates_seleccionados):
+            posicion = next(
+                (nro for nro, (odate_replica, _) in enumerate(self._replicas) if odate_replica > odate),
+                len(self._replicas)
+            )
+            self._replicas.insert(posicion, (odate, self._nueva_replica(odate, self.cadena_primordial)))
+        self._reenlazar()
+
+    def quitar_odates(self, odates_seleccionados: list):
+        """
+        Quita de la temporal en linea las replicas de los ODATES indicados y une las replicas que quedan
+
+        :param odates_seleccionados: ODATES a quitar, con formato YYYY-MM-DD
+        """
+        self._validar_incremental()
+        odates = {x.replace('-', '') for x in odates_seleccionados}
+        self._replicas = [(odate, replica) for odate, replica in self._replicas if odate not in odates]
+        self._reenlazar()
+
+    def actualizar_trabajos(self, cadena_jobnames: list[ControlmJob]):
+        """
+        Cambia los jobs seleccionados de la temporal en linea. Se vuelve a ordenar la cadena primordial y en cada
+        replica se copian solamente los jobs agregados; los que se mantienen se reutilizan tal cual
+
+        :param cadena_jobnames: Lista de jobs que se deben transformar a temporales
+        """
+        self._validar_incremental()
+        self._trabajos_seleccionados = cadena_jobnames
+        self.ordenar()
+
+        for nro, (odate, replica) in enumerate(self._replicas):
+            copias = self._nueva_replica(odate, [job for job in self.cadena_primordial if job.name not in replica])
+            self._replicas[nro] = (
+                odate,
+                {job.name: replica[job.name] if job.name in replica else copias[job.name] for job in self.cadena_primordial}
+            )
+        self._reenlazar()
+
+    @traza.trazada(nombre='MallaMaxi.actualizar', atributos=lambda self, *_: {'odates': len(self.odates), 'jobs': len(self.cadena_completa_temporal)})
+    def actualizar(self, cadena_jobnames: list[ControlmJob], odates_seleccionados: list):
+        """
+        Lleva la temporal en linea a una nueva seleccion de jobs y ODATES aplicando solamente las diferencias con la
+        seleccion actual, en vez de volver a ordenar, replicar y ambientar todo. Solo para la temporal en linea única,
+        ver admite_actualizacion
+
+        :param cadena_jobnames: Lista de jobs que se deben transformar a temporales
+        :param odates_seleccionados: ODATES a replicar, con formato YYYY-MM-DD
+        """
+        self._validar_incremental()
+        odates = [x.replace('-', '') for x in odates_seleccionados]
+        odates_actuales = {odate for odate, _ in self._replicas}
+
+        odates_quitados = odates_actuales.difference(odates)
+        if odates_quitados:
+            self.quitar_odates(odates_quitados)
+
+        if {job.name for job in cadena_jobnames} != {job.name for job in self._trabajos_seleccionados}:
+            self.actualizar_trabajos(cadena_jobnames)
+
+        odates_agregados = [odate for odate in dict.fromkeys(odates) if odate not in odates_actuales]
+        if odates_agregados:
+            self.agregar_odates(odates_agregados)
+
+    @traza.trazada(nombre='MallaMaxi.replicar_iterando_odates', atributos=lambda self, *_, **__: {'odates': len(self.odates), 'jobs': len(self.cadena_completa_temporal)})
+    def replicar_iterando_odates(self, odates_seleccionados: list, concurrente: bool = False):
+        """
+        Alternativa a replicar_y_enlazar: en vez de replicar la cadena primordial por cada ODATE, la cadena se genera
+        una sola vez y se agrega al comienzo un job iterador (dummy) que la ordena mediante DOFORCEJOB. Cada job de la
+        cadena ordena al siguiente con su mismo ODATE, por lo que la temporal siempre se configura con force (ver
+        ambientar) y el %%$ODATE de las variables lo resuelve control-M al ordenar
+
+        Por defecto los ODATES se ejecutan de a uno, en el orden seleccionado: el iterador ordena la cadena con el
+        primer ODATE y un job dummy por cada uno de los siguientes, que espera la marca que deja el último job de la
+        cadena con el ODATE anterior (ver marca_iteracion) y recién ahí ordena la cadena con el suyo. Como las marcas
+        de control-M solo guardan el dia y el mes, en ningun modo los ODATES pueden repetir dia y mes. La marca que deja
+        la iteracion del último ODATE no la espera nadie
+
+        Si es concurrente, el iterador ordena la cadena con todos los ODATES a la vez y estos corren en paralelo: las
+        cadenas de los distintos ODATES no se pisan ya que las marcas son por ODATE, y la cantidad de jobs que corren a
+        la vez la sigue limitando el recurso cuantitativo ARD-TMP (ver replicar_y_enlazar)
+
+        :param odates_seleccionados: ODATES a iterar, con formato YYYY-MM-DD
+        :param concurrente: True para ordenar todos los ODATES a la vez
+        """
+        odates = [x.replace('-', '') for x in odates_seleccionados]
+        repetidos = utils.encontrar_duplicados([odate[4:] for odate in odates])
+        if repetidos:
+            raise Exception(f"No se pueden iterar ODATES que repiten dia y mes {repetidos}, las marcas de control-M no tienen año")
+        self.odates = odates
+        self.carriles = None
+        self._replicas = None
+
+        cadena_temporal = deepcopy(self.cadena_primordial)
+        self._ambientar_names(cadena_temporal)
+        for job in cadena_temporal:
+            job.odate = None  # Lo define el DOFORCEJOB del iterador
+        self._ambientar_marcas(cadena_temporal)
+
+        raiz, hoja = cadena_temporal[0], cadena_temporal[-1]
+        self._job_iterador = self._armar_job_iterador(
+            raiz, dict(enumerate(odates, start=1)), f'Ordena la cadena de {raiz.name} por cada ODATE seleccionado')
+        self._odates_iteracion = odates
+        self._iteracion_concurrente = concurrente
+        self._jobs_siguientes = []
+        self.marca_iteracion = None
+
+        if not concurrente and len(odates) > 1:
+            self.marca_iteracion = f'{hoja.name}-TO-{self._job_iterador.name}'
+            for nro, odate in enumerate(odates[1:], start=2):
+                siguiente = self._armar_job_iterador(
+                    raiz, {nro: odate}, f'Ordena la cadena de {raiz.name} con el ODATE {odate} al terminar el anterior')
+                odate_anterior = odates[nro - 2][4:]  # MMDD, las marcas fechadas no llevan año
+                siguiente.marcasin = [ControlmMarcaIn(marca_nombre=self.marca_iteracion, odate_esperado=odate_anterior)]
+                siguiente.marcasout = [ControlmMarcaOut(marca_nombre=self.marca_iteracion, odate_esperado=odate_anterior,
+                                                        signo='-', mediante_accion=False)]
+                self._jobs_siguientes.append(siguiente)
+
+        self.cadena_completa_temporal = [self._job_iterador] + cadena_temporal + self._jobs_siguientes
+
+    def _armar_job_iterador(self, job_base: ControlmJob, odates: dict[int, str], descripcion: str) -> ControlmJob:
+        """
+        Arma un job dummy que ordena la cadena, ver replicar_iterando_odates. Los ODATES que ordena quedan listados en
+        sus variables (%%ODATE_ITERACION_01, %%ODATE_ITERACION_02, etc) y cada DOFORCEJOB que agrega ambientar ordena la
+        cadena con el ODATE de una de ellas
+
+        :param job_base: Job del cual se toman los atributos (aplicacion, nodo, etc), generalmente la raiz de la cadena
+        :param odates: Numero de iteracion -> ODATE, con formato YYYYMMDD
+        :param descripcion: Descripcion del job
+        :return: Job dummy, sin acciones ni marcas. Las acciones se agregan en ambientar
+        """
+        iterador = deepcopy(job_base)
+        self._ambientar_name(iterador)
+        iterador.jobname_plantilla = iterador.name  # Cada dummy se ambienta con sus propias variables
+        iterador.odate = None
+        iterador.atributos['TASKTYPE'] = 'Dummy'
+        iterador.atributos.pop('CMDLINE', None)
+        iterador.atributos['DESCRIPTION'] = descripcion
+        iterador.variables = {self._variable_iteracion(nro): odate for nro, odate in odates.items()}
+        iterador.invalidar_expansiones()
+        iterador.marcasin = None
+        iterador.marcasout = None
+        iterador.onconditions = {}
+        return iterador
+
+    @staticmethod
+    def _variable_iteracion(nro: int) -> str:
+        return f'%%ODATE_ITERACION_{str(nro).zfill(2)}'
+
+    @staticmethod
+    def _forzar(folder_name: str, jobname: str, odate: str) -> ControlmAction:
+        return ControlmAction(
+            action_id='DOFORCEJOB',
+            attrs={
+                'TABLE_NAME': folder_name,
+                'NAME': jobname,
+                'ODATE': odate,
+                'REMOTE': 'N'
+            }
+        )
+
+    @traza.trazada(nombre='MallaMaxi.ambientar', atributos=lambda self, mail, folder_name, *_: {'carpeta': folder_name, 'jobs': len(self.cadena_completa_temporal)})
     def ambientar(self, mail: str, folder_name: str, caso_d_uso: str, legajo: str, configurar_con_force: bool):
         """
         Ambienta los jobs a malla.
         """
 
         self._folder_name_exp = folder_name
+        jobnames_forzados = set()
+
+        if self._job_iterador is not None:
+            configurar_con_force = True  # Ver replicar_iterando_odates
+
+        self._ambientacion = (mail, caso_d_uso, legajo, configurar_con_force)
+        self._contexto_ambientacion = {
+            'mail': mail, 'folder_name': folder_name, 'caso_d_uso': caso_d_uso, 'legajo': legajo
+        }
+        self._plantillas = {}
 
         # Cambio el valor %%ODATE por fecha seleccionada, en cada job de la cadena
         for job in self.cadena_completa_temporal:
+            self._ambientar_job(job)
+            self._ambientar_enlaces(job, folder_name, configurar_con_force, jobnames_forzados)
 
-            job: ControlmJob
+        if self._job_iterador is not None:
+            self._ambientar_iteracion(folder_name)
 
-            job.atributos['DESCRIPTION'] += f'. Creado automáticamente por generador de mallas temporales {caso_d_uso}'
+    def _ambientar_iteracion(self, folder_name: str):
+        """
+        Agrega las acciones con las que el iterador y los jobs siguientes ordenan la cadena, ver
+        replicar_iterando_odates. Control-M resuelve el ODATE de cada DOFORCEJOB con la variable del job al ordenar
+        """
+        raiz = self.cadena_completa_temporal[1]
+        acciones_iterador = self._job_iterador.onconditions['OK']
 
-            job.atributos['SUB_APPLICATION'] = 'DATIO-AR-P'
-            job.atributos.pop('DAYSCAL', None)
-            job.atributos.pop('DAYS', None)
-            job.atributos['MAXWAIT'] = '0'
-            job.atributos['PARENT_FOLDER'] = folder_name
-            job.recursos_cuantitativos = [
-                ControlmRecursoCuantitativo(name='ARD'),
-                ControlmRecursoCuantitativo(name='ARD-TMP')
-            ]
-            job.atributos['CREATED_BY'] = legajo
-
-            for name, value in job.variables.items():
-                if '%%$ODATE' in value:
-                    job.variables[name] = value.replace('%%$ODATE', job.odate)
-                elif '%%MAIL' in value:
-                    try:
-                        job.variables[name] = value.replace('%%MAIL', mail)
-                    except:
-                        job.variables[name] = value.replace(value,mail)
-                elif '.dev' in value:
-                    job.variables[name] = value.replace('.dev', '.pro')
-
-            msg = f'Finalizo NOTOK %%JOBNAME {caso_d_uso}. Malla creada automaticamente por el generador de mallas temporales'
-            msg_len = str(len(msg)).zfill(4)
-            job.onconditions['NOTOK'] = [
-                ControlmAction(
-                    action_id='DOMAIL',
-                    attrs={
-                        'URGENCY': 'R',
-                        'DEST': 'datio-procesos-live.group@bbva.com',
-                        'CC_DEST': mail,
-                        'SUBJECT': f'Cancelo %%JOBNAME {caso_d_uso} - Temporal',
-                        'MESSAGE': msg_len + msg,
-                        'ATTACH_SYSOUT': 'Y'
-                    }
-                )
-            ]
+        if self._iteracion_concurrente:
+            for nro in range(1, len(self._odates_iteracion) + 1):
+                acciones_iterador.append(self._forzar(folder_name, raiz.name, self._variable_iteracion(nro)))
+            return
 
-            msg = f'Finalizo OK %%JOBNAME {caso_d_uso}. Malla creada automaticamente por el generador de mallas temporales'
-            msg_len = str(len(msg)).zfill(4)
-            job.onconditions['OK'] = [
-                ControlmAction(
-                    action_id='DOMAIL',
-                    attrs={
-                        'URGENCY': 'R',
-                        'DEST': 'datio-procesos-live.group@bbva.com',
-                        'CC_DEST': mail,
-                        'SUBJECT': f'OK %%JOBNAME {caso_d_uso} - Temporal',
-                        'MESSAGE': msg_len + msg,
-                        'ATTACH_SYSOUT': 'Y'
-                    }
-                )
-            ]
+        acciones_iterador.append(self._forzar(folder_name, raiz.name, self._variable_iteracion(1)))
+        for nro, siguiente in enumerate(self._jobs_siguientes, start=2):
+            acciones_iterador.append(self._forzar(folder_name, siguiente.name, 'ODAT'))
+            siguiente.onconditions['OK'].append(self._forzar(folder_name, raiz.name, self._variable_iteracion(nro)))
 
-            if job.marcasout is None or not job.marcasout or job.marcasout[0].signo == '-':
-                continue
+        if not self._jobs_siguientes:
+            return
+        hoja = self.cadena_completa_temporal[-len(self._jobs_siguientes) - 1]
+        hoja.onconditions['OK'].append(
+            ControlmAction(action_id='DOCOND', attrs={'NAME': self.marca_iteracion, 'ODATE': 'ODAT', 'SIGN': '+'})
+        )
+
+    def _ambientar_job(self, job: ControlmJob):
+        """
+        Ambienta los atributos, variables y acciones de un job. Las reglas de ambientacion se compilan una sola vez por
+        job original y se estampan en todas sus replicas, ver ReglasAmbientacion
+        """
+        plantilla = self._plantillas.get(job.jobname_plantilla)
+        if plantilla is None:
+            plantilla = self._reglas.compilar(job, self._contexto_ambientacion)
+            if self.es_paralela() and all(recurso.name != RECURSO_TEMPORALES for recurso in plantilla.recursos):
+                plantilla.recursos.append(ControlmRecursoCuantitativo(name=RECURSO_TEMPORALES))
+            self._plantillas[job.jobname_plantilla] = plantilla
+        plantilla.estampar(job)
 
-            if configurar_con_force:
-                marca_out = job.marcasout.pop(0)
+    def es_paralela(self) -> bool:
+        """
+        Indica si en la temporal pueden correr varios ODATES a la vez: con carriles (ver replicar_y_enlazar) o iterando
+        los ODATES de forma concurrente (ver replicar_iterando_odates)
+        """
+        return self.carriles is not None or (self._job_iterador is not None and self._iteracion_concurrente)
+
+    @staticmethod
+    def _ambientar_enlaces(job: ControlmJob, folder_name: str, configurar_con_force: bool, jobnames_forzados: set[str]):
+        """
+        Si la temporal se configura con force, reemplaza las marcas que agrega el job por acciones DOCOND y DOFORCEJOB,
+        ver ambientar
+
+        :param jobnames_forzados: Jobnames que ya ordena otro job, se actualiza con los que ordena este
+        """
+        if job.marcasout is None or not job.marcasout:
+            return
 
-                # Mini check por las dudas
-                if marca_out.signo != '+':
-                    raise Exception(f"Se removió un item que no es el correcto a la hora de ambientar la malla con force", marca_out)
+        if configurar_con_force:
+            marcas_agregadas = [marca_out for marca_out in job.marcasout if marca_out.signo == '+']
+            job.marcasout = [marca_out for marca_out in job.marcasout if marca_out.signo != '+']
 
+            for marca_out in marcas_agregadas:
                 job.onconditions['OK'].append(
                     ControlmAction(
                         action_id='DOCOND',
@@ -1227,6 +3465,12 @@ class MallaMaxi:
                     )
                 )
 
+                # Si el job tiene varios predecesores (ver carriles en replicar_y_enlazar) lo ordena solamente uno
+                # de ellos, si no se ordenaría varias veces
+                if marca_out.destino in jobnames_forzados:
+                    continue
+                jobnames_forzados.add(marca_out.destino)
+
                 job.onconditions['OK'].append(
                     ControlmAction(
                         action_id='DOFORCEJOB',
@@ -1239,42 +3483,160 @@ class MallaMaxi:
                     )
                 )
 
-    def exportar(self, save_path: str):
-        """Genera un xml que representa una malla da control-M a partir de una instancia de MallaMaxi"""
+    @property
+    def malla_origen(self) -> ControlmFolder:
+        return self._malla_origen
+
+    def vistas(self) -> list[MallaTemporal]:
+        """
+        Devuelve la temporal como mallas en memoria (una por carpeta si se partió, ver particionar) con la misma
+        interfaz que ControlmFolder, para validarla sin exportarla ni volver a leerla. Los jobs son los de la temporal,
+        no copias
+
+        :return: Lista de mallas, en el orden en el que se exportarían
+        """
+        if self._folder_name_exp is None:
+            raise Exception("La malla temporal se debe ambientar antes de validarla")
+
+        if self.particiones is None:
+            carpetas = [(self._folder_name_exp, self.cadena_completa_temporal)]
+        else:
+            carpetas = self.particiones
+        return [MallaTemporal(nombre, jobs, self.atributos_carpeta) for nombre, jobs in carpetas]
+
+    def aristas_temporal(self) -> dict[str, list[str]]:
+        """
+        Digrafo de la temporal generada tal cual lo ejecuta control-M: un job apunta a los que esperan alguna marca que
+        agrega (por OUTCOND o DOCOND) y a los que ordena por DOFORCEJOB. A diferencia de ControlmDigrafo tiene en
+        cuenta la configuracion con force, ver ambientar
+
+        :return: Diccionario jobname -> jobnames que le siguen, en el orden de la cadena
+        """
+        esperan: dict[str, list[str]] = {}
+        for job in self.cadena_completa_temporal:
+            for marca_in in job.marcasin or []:
+                esperan.setdefault(marca_in.name, []).append(job.name)
+
+        aristas = {}
+        for job in self.cadena_completa_temporal:
+            sucesores = []
+            for marca_out in job.marcasout or []:
+                if marca_out.signo == '+':
+                    sucesores.extend(esperan.get(marca_out.name, []))
+            for actions in job.onconditions.values():
+                for action in actions:
+                    if action.id == 'DOCOND' and action.attrs.get('SIGN') == '+':
+                        sucesores.extend(esperan.get(action.attrs['NAME'], []))
+                    elif action.id == 'DOFORCEJOB':
+                        sucesores.append(action.attrs['NAME'])
+            aristas[job.name] = list(dict.fromkeys(sucesores))
+        return aristas
+
+    @staticmethod
+    def _nombres_particiones(folder_name: str, cantidad: int, ocupados: Iterable[str] = ()) -> list[str]:
+        """
+        Genera los nombres de las carpetas en las que se parte una temporal, a partir del nombre original y los numeros
+        libres que le siguen. Ej: CR-ARMOLTMP-T98 -> CR-ARMOLTMP-T98, CR-ARMOLTMP-T99, CR-ARMOLTMP-T00,
+        CR-ARMOLTMP-T01, CR-ARMOLTMP-T03... Si se terminan los numeros de la T se siguen con los de la K (y viceversa),
+        ambas son temporales segun Regex.MALLA_TMP
+
+        :param folder_name: Nombre de la carpeta temporal ambientada
+        :param cantidad: Cantidad de nombres a generar
+        :param ocupados: Nombres de carpetas que ya existen (ej: otras temporales), no se usan
+        :return: Lista de nombres, el primero es siempre folder_name
+        """
+        match = re.match(r'^(?P<base>.*\D)(?P<nro>\d{2})$', folder_name)
+        if match is None:
+            raise Exception(f"No se puede partir la malla temporal [{folder_name}], su nombre no termina en dos digitos")
+
+        base, nro = match.group('base'), int(match.group('nro'))
+        candidatos = [f"{base}{(nro + i) % 100:02d}" for i in range(1, 100)]
+        if base[-1] in 'TK':
+            otra_base = base[:-1] + ('K' if base[-1] == 'T' else 'T')
+            candidatos += [f"{otra_base}{i:02d}" for i in range(100)]
+
+        nombres = [folder_name]
+        ocupados = set(ocupados)
+        for candidato in candidatos:
+            if len(nombres) == cantidad:
+                break
+            if candidato.endswith('02') or candidato in ocupados:  # Las T02 no son temporales, ver Regex.MALLA_TMP
+                continue
+            nombres.append(candidato)
+
+        if len(nombres) < cantidad:
+            raise Exception(f"No alcanzan los nombres para partir la malla temporal [{folder_name}] en {cantidad} carpetas")
+        return nombres
+
+    @traza.trazada(nombre='MallaMaxi.particionar', atributos=lambda self, *_, **__: {'carpetas': len(self.particiones or [])})
+    def particionar(self, max_jobs: int = Limits.MAX_JOBS_CARPETA_TMP, carpetas_ocupadas: Iterable[str] = ()):
+        """
+        Parte la cadena temporal en varias carpetas de a lo sumo max_jobs jobs cada una, respetando el orden de la
+        cadena. Se debe llamar luego de ambientar. La primera carpeta conserva el nombre ambientado y el resto toma los
+        numeros libres siguientes (ver _nombres_particiones)
+
+        Las carpetas quedan unidas por las mismas marcas que unen a los jobs, ya que las condiciones no dependen de la
+        carpeta. Si la temporal se configuró con force, los DOFORCEJOB que ordenan un job de otra carpeta pasan a
+        apuntar a la carpeta de dicho job, así el último job de cada carpeta ordena el comienzo de la siguiente
+
+        :param max_jobs: Cantidad máxima de jobs por carpeta
+        :param carpetas_ocupadas: Nombres de carpetas que ya existen (ej: otras temporales de la misma UUAA), no se
+            usan para las particiones
+        """
+        if max_jobs < 1:
+            raise ValueError(f"La cantidad maxima de jobs por carpeta debe ser mayor a 0, valor obtenido [{max_jobs}]")
+        if self._folder_name_exp is None:
+            raise Exception("La malla temporal se debe ambientar antes de partirla")
+
+        cadena = self.cadena_completa_temporal
+        tramos = [cadena[i:i + max_jobs] for i in range(0, len(cadena), max_jobs)] or [[]]
+        nombres = self._nombres_particiones(self._folder_name_exp, len(tramos), carpetas_ocupadas)
+        self.particiones = list(zip(nombres, tramos))
+        self._max_jobs_particion = max_jobs
+        self._carpetas_ocupadas = frozenset(carpetas_ocupadas)
+
+        carpeta_job = {}
+        for nombre, tramo in self.particiones:
+            for job in tramo:
+                job.atributos['PARENT_FOLDER'] = nombre
+                carpeta_job[job.name] = nombre
+
+        for job in cadena:
+            for actions in job.onconditions.values():
+                for action in actions:
+                    if action.id == 'DOFORCEJOB' and action.attrs.get('NAME') in carpeta_job:
+                        action.attrs['TABLE_NAME'] = carpeta_job[action.attrs['NAME']]
+
+    @staticmethod
+    @traza.trazada(nombre='MallaMaxi.escribir_carpeta', atributos=lambda folder_name, jobs, save_path: {'carpeta': folder_name, 'jobs': len(jobs)})
+    def _escribir_carpeta(folder_name: str, jobs: list[ControlmJob], save_path: str):
+        """Genera un xml que representa una malla de control-M con los jobs indicados"""
 
         import xml.etree.ElementTree as ET  # TODO: Qué hace esto acá ?
 
         root = ET.Element("DEFTABLE")
         root.attrib['xmlns:xsi'] = "http://www.w3.org/2001/XMLSchema-instance"
 
-        folder = ET.SubElement(root, "FOLDER")
-        folder.attrib['DATACENTER'] = "CTM_CTRLMCCR"
-        folder.attrib['VERSION'] = "919"
-        folder.attrib['PLATFORM'] = "UNIX"
-        folder.attrib['FOLDER_NAME'] = self._folder_name_exp
-        folder.attrib['MODIFIED'] = "False"
-        folder.attrib['LAST_UPLOAD'] = "20240925182750UTC"
-        folder.attrib['FOLDER_ORDER_METHOD'] = "PRUEBAS"
-        folder.attrib['REAL_FOLDER_ID'] = "6934"
-        folder.attrib['TYPE'] = "1"
+        folder = ET.SubElement(root, "FOLDER", MallaMaxi.atributos_carpeta)
+        folder.attrib['FOLDER_NAME'] = folder_name
 
-        for job in self.cadena_completa_temporal:
+        for job in jobs:
             job: ControlmJob
 
             job_element = ET.SubElement(folder, 'JOB', job.atributos)
             job_element.attrib['JOBNAME'] = job.name
-            job_element.attrib['PARENT_FOLDER'] = self._folder_name_exp
+            job_element.attrib['PARENT_FOLDER'] = folder_name
 
             for var_name, var_value in job.variables.items():
                 ET.SubElement(job_element, 'VARIABLE', {'NAME': var_name, 'VALUE': var_value})
 
             if job.marcasin is not None:
                 for marca_in in job.marcasin:
-                    ET.SubElement(job_element, 'INCOND', {'NAME': marca_in.name, 'ODATE': 'ODAT', 'AND_OR': 'A'})
+                    ET.SubElement(job_element, 'INCOND', {'NAME': marca_in.name, 'ODATE': marca_in.odate, 'AND_OR': 'A'})
 
             if job.marcasout is not None:
                 for marca_in in job.marcasout:
-                    ET.SubElement(job_element, 'OUTCOND', {'NAME': marca_in.name, 'ODATE': 'ODAT', 'SIGN': marca_in.signo})
+                    ET.SubElement(job_element, 'OUTCOND', {'NAME': marca_in.name, 'ODATE': marca_in.odate, 'SIGN': marca_in.signo})
 
             for rrcc in job.recursos_cuantitativos:
                 ET.SubElement(job_element, 'QUANTITATIVE', {'NAME': rrcc.name, 'QUANT': '1', 'ONFAIL': 'R', 'ONOK': 'R'})
@@ -1289,53 +3651,107 @@ class MallaMaxi:
         ET.indent(tree, space='\t', level=0)
         tree.write(os.path.join(save_path), encoding='utf-8', xml_declaration=True)
 
+    @traza.trazada(nombre='MallaMaxi.exportar', atributos=lambda self, save_path: {'path': save_path})
+    def exportar(self, save_path: str) -> list[str]:
+        """
+        Genera los xml que representan la malla temporal. Si la temporal fue partida (ver particionar) se genera un xml
+        por carpeta: la primera se guarda en save_path y el resto al lado, con el nombre de su carpeta. Las carpetas se
+        escriben en paralelo
 
-if __name__ == '__main__':
+        :param save_path: Path del xml a generar
+        :return: Lista con los paths de los xml generados
+        """
+        if self.particiones is None:
+            self._escribir_carpeta(self._folder_name_exp, self.cadena_completa_temporal, save_path)
+            return [save_path]
 
-    # Script para testear
-    import datetime
-    import os
+        directorio = os.path.dirname(save_path)
+        paths = [save_path] + [os.path.join(directorio, f'{nombre}.xml') for nombre, _ in self.particiones[1:]]
 
-    malla_test = ControlmFolder('C:\\Users\\Gaston\\PycharmProjects\\App_new\\CR-ARMOLTMP-T38.xml')
-    # jobs = [job for job in malla.jobs() if job.name in ['AMOLCP0010', 'AMOLPP0004', 'AMOLSP0105', 'AMOLCP0012', 'AMOLVP0186']]
-    jobs = [job for job in malla_test.jobs() if job.name in ["AMOLCP9000",
-                                                             "AMOLCP9001",
-                                                             "AMOLCP9002",
-                                                             "AMOLCP9003",
-                                                             "AMOLCP9004",
-                                                             "AMOLCP9005",
-                                                             "AMOLCP9006",
-                                                             "AMOLCP9007",
-                                                             "AMOLCP9008",
-                                                             "AMOLCP9009",
-                                                             "AMOLCP9010",
-                                                             "AMOLCP9011",
-                                                             "AMOLCP9012",
-                                                             "AMOLCP9013",
-                                                             "AMOLCP9014",
-                                                             "AMOLCP9015",
-                                                             "AMOLCP9016",
-                                                             "AMOLCP9017",
-                                                             "AMOLCP9018",
-                                                             "AMOLCP9019",
-                                                             "AMOLCP9020",
-                                                             "AMOLCP9021"
-                                                             ]
+        with ThreadPoolExecutor() as executor:
+            escrituras = [
+                executor.submit(self._escribir_carpeta, nombre, jobs, path)
+                for (nombre, jobs), path in zip(self.particiones, paths)
             ]
+            for escritura in escrituras:
+                escritura.result()  # Propaga la excepcion si alguna escritura falla
 
-    m_max = MallaMaxi(jobs, malla_test)
-    m_max.ordenar()
+        return paths
+
+
+class MallaTemporal:
+    """
+    Vista en memoria de una carpeta generada por MallaMaxi, con la misma interfaz que ControlmFolder. Ver
+    MallaMaxi.vistas
+    """
+
+    def __init__(self, nombre: str, jobs: list[ControlmJob], atributos_carpeta: dict[str, str]):
+        """
+        Constructor
+
+        :param nombre: Nombre de la carpeta
+        :param jobs: Jobs de la carpeta. Si hay jobnames repetidos queda el último, ver validaciones.tmp_enlaces
+        :param atributos_carpeta: Atributos con los que se exportaría la carpeta
+        """
+        self.filename = None
+        self.name = nombre
+        self._atributos = dict(atributos_carpeta)
+        self._atributos['FOLDER_NAME'] = nombre
+        self._match = re.search(Regex.MALLA_TMP, nombre)
+        self._jobs: dict[str, ControlmJob] = {job.name: job for job in jobs}
+        self._digrafo = None
+
+    def jobnames(self) -> list[str]:
+        return list(self._jobs.keys())
+
+    def jobs(self) -> list[ControlmJob]:
+        return list(self._jobs.values())
+
+    def obtener_job(self, jobname_a_buscar: str) -> [ControlmJob, None]:
+        return self._jobs.get(jobname_a_buscar, None)
+
+    @property
+    def digrafo(self) -> ControlmDigrafo:
+        """Digrafo de la carpeta, se arma la primera vez que se pide"""
+        if self._digrafo is None:
+            self._digrafo = ControlmDigrafo(list(self._jobs.values()), mallas=dict.fromkeys(self._jobs, self.name))
+        return self._digrafo
+
+    @property
+    def uuaa(self) -> str:
+        return self._match.group('uuaa')
 
-    fechas_a_iterar = [
-        datetime.datetime.now(),
-        datetime.datetime(2024, 10, 14),
-        datetime.datetime(2024, 10, 15),
-        datetime.datetime(2024, 10, 16),
-        datetime.datetime(2024, 10, 17),
-        datetime.datetime(2024, 10, 20),
-    ]
+    @property
+    def periodicidad(self) -> str:
+        return self._match.group('periodicidad')
+
+    @property
+    def order_method(self) -> str:
+        return self._atributos.get('FOLDER_ORDER_METHOD')
+
+    @property
+    def datacenter(self) -> str:
+        return self._atributos.get('DATACENTER')
+
+
+if __name__ == '__main__':
 
-    m_max.replicar_y_enlazar(fechas_a_iterar)
-    m_max.ambientar('jemonjelos@bbva.com', 'CR-ARMOLTMP-T99', 'caso_test', 'O00000')
+    # Script para testear: arma una temporal con todos los jobs del xml indicado. Para hacerlo sobre un export
+    # sintetico usar benchmarks.temporal y para medir tiempos benchmarks.suite
+    import os
+    import sys
+    import tempfile
+
+    if len(sys.argv) < 2:
+        print("Uso: python -m controlm.structures export.xml (sin export: python -m benchmarks.temporal)")
+        sys.exit(1)
+    malla_test = ControlmFolder(sys.argv[1])
+
+    m_max = MallaMaxi(malla_test.jobs(), malla_test)
+    m_max.ordenar()
+    m_max.replicar_y_enlazar(['2024-10-14', '2024-10-15', '2024-10-16', '2024-10-17', '2024-10-20'])
+    m_max.ambientar('jemonjelos@bbva.com', f"CR-AR{malla_test.uuaa}TMP-T99", 'caso_test', 'O00000', False)
+    m_max.particionar()
 
-    m_max.exportar(os.getcwd())
+    for path_generado in m_max.exportar(os.path.join(tempfile.gettempdir(), 'temporal_test.xml')):
+        print(path_generado)
@@ -0,0 +1,205 @@
+"""
+Trazas de las etapas del proceso (parseo, armado de jobs, digrafo, ordenamiento, replicacion, export, validaciones,
+diferencias, escritura de logs) para ver en qué se va el tiempo de una corrida completa. Cada etapa es un span con
+nombre, atributos (ej: carpeta, cantidad de jobs) y duracion; los spans se anidan solos según el orden de ejecucion y se
+registran por hilo y por proceso.
+
+Se guardan en formato Chrome trace (json), que se puede abrir offline con chrome://tracing o https://ui.perfetto.dev
+
+Está desactivado por defecto y en ese caso no registra nada: span() devuelve siempre el mismo objeto vacío y las
+funciones decoradas con trazada() se llaman directamente. Se activa con activar() o, sin tocar el código, con la
+variable de entorno CONTROLM_TRAZA=path.json (la traza se escribe en ese path al terminar el proceso).
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+_activa = False
+_eventos: list[dict] = []
+_hilos: dict[tuple[int, int], str] = {}
+
+
+class _Span:
+    """Span activo, se registra al salir del bloque with"""
+
+    __slots__ = ('nombre', 'atributos', 'inicio')
+
+    def __init__(self, nombre: str, atributos: dict):
+        self.nombre = nombre
+        self.atributos = atributos
+        self.inicio = 0
+
+    def agregar(self, **atributos):
+        """Agrega atributos que se conocen recién durante la etapa, ej: la cantidad de jobs generados"""
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        self.inicio = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, tipo_error, error, _traceback):
+        fin = time.perf_counter_ns()
+        if error is not None:
+            self.atributos['error'] = repr(error)
+        hilo = threading.current_thread()
+        clave_hilo = (os.getpid(), hilo.ident)
+        if clave_hilo not in _hilos:
+            _hilos[clave_hilo] = hilo.name
+        _eventos.append({
+            'name': self.nombre,
+            'cat': 'controlm',
+            'ph': 'X',
+            'ts': self.inicio / 1000,
+            'dur': (fin - self.inicio) / 1000,
+            'pid': clave_hilo[0],
+            'tid': clave_hilo[1],
+            'args': self.atributos,
+        })
+        return False
+
+
+class _SpanNulo:
+    """Span que no hace nada, es el que se usa con las trazas desactivadas"""
+
+    __slots__ = ()
+
+    def agregar(self, **atributos):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_error, error, _traceback):
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+def span(nombre: str, **atributos) -> _Span | _SpanNulo:
+    """
+    Span de una etapa, se usa con with. Ej:
+
+        with traza.span('validaciones', carpeta=malla.name) as s:
+            ...
+            s.agregar(errores=cantidad)
+
+    :param nombre: Nombre de la etapa
+    :param atributos: Atributos de la etapa, tienen que poder pasarse a json
+    """
+    if not _activa:
+        return _SPAN_NULO
+    return _Span(nombre, atributos)
+
+
+def trazada(funcion: Callable = None, *, nombre: str = None, atributos: Callable[..., dict] = None):
+    """
+    Decorador que registra un span por cada llamada a la funcion. Se puede usar con o sin parametros:
+
+        @trazada
+        def ordenar(self): ...
+
+        @trazada(atributos=lambda self, xml_input: {'carpeta': self.name, 'jobs': len(self._jobs)})
+        def __init__(self, xml_input): ...
+
+    :param funcion: Funcion a decorar (cuando se usa sin parametros)
+    :param nombre: Nombre del span, por defecto el modulo y el nombre calificado de la funcion (ej: validaciones.tipo)
+    :param atributos: Funcion que recibe los mismos argumentos que la decorada y devuelve los atributos del span. Se
+        llama al finalizar (asi en un __init__ ya están cargados los atributos del objeto) y solamente con las trazas
+        activas
+    """
+
+    def decorar(funcion_decorada: Callable) -> Callable:
+        nombre_span = nombre or f"{funcion_decorada.__module__.removeprefix('controlm.')}.{funcion_decorada.__qualname__}"
+
+        @functools.wraps(funcion_decorada)
+        def envoltura(*args, **kwargs):
+            if not _activa:
+                return funcion_decorada(*args, **kwargs)
+            with _Span(nombre_span, {}) as span_activo:
+                resultado = funcion_decorada(*args, **kwargs)
+                if atributos is not None:
+                    span_activo.agregar(**atributos(*args, **kwargs))
+                return resultado
+
+        return envoltura
+
+    return decorar(funcion) if funcion is not None else decorar
+
+
+def atributos_job(job, *_, **__) -> dict:
+    """Atributos para trazada() de las funciones que reciben un job como primer argumento (validaciones, diferencias)"""
+    return {'job': job.name}
+
+
+def activa() -> bool:
+    return _activa
+
+
+def activar(path: str = None):
+    """
+    Activa el registro de spans
+
+    :param path: Si se indica, la traza se escribe en este path al terminar el proceso
+    """
+    global _activa
+    _activa = True
+    if path is not None:
+        atexit.register(escribir, path)
+
+
+def desactivar():
+    global _activa
+    _activa = False
+
+
+def limpiar():
+    """Descarta todos los spans registrados hasta el momento"""
+    _eventos.clear()
+    _hilos.clear()
+
+
+def eventos() -> list[dict]:
+    """
+    Devuelve los spans registrados en este proceso. Sirve para juntar en un solo archivo las trazas de varios procesos
+    (ver agregar_eventos), los tiempos son comparables porque salen del mismo reloj monotónico del sistema
+
+    :return: Eventos en formato Chrome trace, con los nombres de los hilos
+    """
+    nombres_hilos = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': nombre}}
+        for (pid, tid), nombre in _hilos.items()
+    ]
+    return nombres_hilos + _eventos
+
+
+def agregar_eventos(eventos_externos: list[dict]):
+    """
+    Agrega spans registrados en otro proceso (ej: devueltos por un worker con eventos())
+
+    :param eventos_externos: Eventos en formato Chrome trace
+    """
+    for evento in eventos_externos:
+        if evento.get('ph') == 'M':
+            _hilos[(evento['pid'], evento['tid'])] = evento['args']['name']
+        else:
+            _eventos.append(evento)
+
+
+def escribir(path: str):
+    """
+    Escribe todos los spans registrados en un json con formato Chrome trace
+
+    :param path: Path del json a generar
+    """
+    with open(path, 'w', encoding='utf-8') as archivo:
+        json.dump({'traceEvents': eventos(), 'displayTimeUnit': 'ms'}, archivo)
+
+
+if os.environ.get('CONTROLM_TRAZA'):
+    activar(os.environ['CONTROLM_TRAZA'])
@@ -3,6 +3,14 @@ Contiene todas las funciones 'utiles' que se usan a lo largo del proceso. Una fu
 si se presenta algo como código repetido o si se necesita abstraer algo.
 """
 
+import itertools
+import os
+import string
+from collections import Counter
+from collections.abc import Iterable
+from collections.abc import Iterator
+from xml.etree.ElementTree import iterparse
+
 from controlm.constantes import Carpetas
 
 from pathlib import Path
@@ -143,35 +151,112 @@ def get_feriados_from_host(ruta_txt_nonchambahost: str) -> dict():
     return feriados
 
 
-class Secuencia:
+class AsignadorJobnames:
     """
-    Clase generadora de identificador único de jobname, genera caracteres del 000 al 999 y luego de A00 a Z99
+    Asigna jobnames temporales únicos: a un prefijo (ej: AMOLCP9) se le agrega un sufijo de 3 caracteres alfanuméricos.
+    Los sufijos se recorren en el orden de siempre (000 al 999 y luego A01 a Z99) y a continuación el resto de las
+    combinaciones de [0-9A-Z], salteando aquellos jobnames que ya existan (ver agregar_ocupados). Cada prefijo recorre
+    sus propios sufijos, asignar jobnames a un prefijo no consume los de otro
     """
 
-    def __init__(self):
-        self.current = 0
-        self.letter = 0
-        self.number = 1
-
-    def obtener_nmnemoc(self):
-        nmne = self._generar_mnemoc()
-        if nmne == 'Z99':
-            return 'noo'
-        return nmne
-
-    def _generar_mnemoc(self):
-        # Generate numbers from 000 to 999
-        if self.current < 1000:
-            ret_str = f"{self.current:03}"
-            self.current += 1
-            return ret_str
-        else:
-            # Generate letters A to Z followed by 01 to 99
-            ret_str = f"{chr(65 + self.letter)}{self.number:02}"
-            self.number += 1
-
-            if self.number > 99:
-                self.number = 1
-                self.letter += 1
-
-            return ret_str
+    ALFABETO = string.digits + string.ascii_uppercase
+
+    def __init__(self, jobnames_ocupados: Iterable[str] = ()):
+        """
+        Constructor
+
+        :param jobnames_ocupados: Jobnames que no se pueden asignar, por ej: los del export productivo
+        """
+        self.ocupados = set(jobnames_ocupados)
+        self._sufijos: dict[str, Iterator[str]] = {}  # Prefijo -> sufijos que todavia no se probaron
+
+    @classmethod
+    def _generar_sufijos(cls) -> Iterator[str]:
+        yield from (f"{nro:03}" for nro in range(1000))
+        yield from (f"{letra}{nro:02}" for letra in string.ascii_uppercase for nro in range(1, 100))
+        for sufijo in map(''.join, itertools.product(cls.ALFABETO, repeat=3)):
+            if not (sufijo.isdigit() or (sufijo[0].isalpha() and sufijo[1:].isdigit() and sufijo[1:] != '00')):
+                yield sufijo
+
+    def agregar_ocupados(self, jobnames: Iterable[str]) -> None:
+        """
+        Marca jobnames como ya existentes, no se van a asignar
+        """
+        self.ocupados.update(jobnames)
+
+    def cargar_export(self, xml_path: str) -> None:
+        """
+        Marca como ocupados todos los jobnames de un export de control-M (ej: el productivo con todas las mallas)
+
+        :param xml_path: Path del xml exportado
+        """
+        for _, elemento in iterparse(xml_path):
+            if elemento.tag == 'JOB':
+                self.ocupados.add(elemento.get('JOBNAME'))
+                elemento.clear()
+
+    def cargar_registro(self, path: str) -> None:
+        """
+        Marca como ocupados los jobnames de un registro generado con guardar_registro, si existe
+
+        :param path: Path del registro, un jobname por linea
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='UTF-8') as registro:
+            self.ocupados.update(linea.strip() for linea in registro if linea.strip())
+
+    def guardar_registro(self, path: str) -> None:
+        """
+        Persiste todos los jobnames ocupados (incluidos los asignados) para que futuras generaciones no los repitan
+
+        :param path: Path del registro, un jobname por linea
+        """
+        with open(path, 'w', encoding='UTF-8') as registro:
+            registro.writelines(f"{jobname}\n" for jobname in sorted(self.ocupados))
+
+    def _candidatos(self, prefijo: str) -> Iterator[str]:
+        """
+        Jobnames libres del prefijo, a partir del ultimo sufijo probado. No los marca como ocupados
+
+        :param prefijo: Jobname sin sufijo, ej: AMOLCP9
+        :return: Iterador de jobnames no ocupados
+        """
+        if prefijo not in self._sufijos:
+            self._sufijos[prefijo] = self._generar_sufijos()
+        return (jobname for jobname in map(prefijo.__add__, self._sufijos[prefijo]) if jobname not in self.ocupados)
+
+    def obtener_jobname(self, prefijo: str) -> str:
+        """
+        Asigna un jobname al prefijo indicado y lo marca como ocupado
+
+        :param prefijo: Jobname sin sufijo, ej: AMOLCP9
+        :return: Jobname asignado, ej: AMOLCP9000
+        """
+        return self.reservar([prefijo])[0]
+
+    def reservar(self, prefijos: Iterable[str]) -> list[str]:
+        """
+        Asigna un jobname por cada prefijo. Los jobnames de cada prefijo se toman de una sola pasada sobre sus sufijos y
+        se marcan como ocupados recien cuando todos los prefijos tienen los suyos: si alguno se queda sin sufijos no se
+        reserva ninguno
+
+        :param prefijos: Prefijos de los jobnames a asignar, pueden repetirse
+        :return: Jobnames asignados, en el mismo orden que los prefijos
+        """
+        prefijos = list(prefijos)
+        reservados = {}
+        for prefijo, cantidad in Counter(prefijos).items():
+            jobnames = list(itertools.islice(self._candidatos(prefijo), cantidad))
+            if len(jobnames) < cantidad:
+                # Se devuelven los sufijos tomados para que la falla no deje huecos en los otros prefijos
+                for otro, tomados in reservados.items():
+                    self._sufijos[otro] = itertools.chain((jobname[len(otro):] for jobname in tomados),
+                                                          self._sufijos[otro])
+                raise Exception(f"No quedan jobnames disponibles para el prefijo [{prefijo}], se agotaron los sufijos")
+            reservados[prefijo] = jobnames
+
+        for jobnames in reservados.values():
+            self.ocupados.update(jobnames)
+        pendientes = {prefijo: iter(jobnames) for prefijo, jobnames in reservados.items()}
+        return [next(pendientes[prefijo]) for prefijo in prefijos]
@@ -9,16 +9,20 @@ Aquellas que se deben realizar sobre una malla temporal, se prefijarán con "tem
 """
 
 import csv
+import itertools
 import re
+from datetime import datetime
 import controlm.utils as utils
 import controlm.constantes as constantes
+import controlm.traza as traza
 
 from difflib import SequenceMatcher
-from controlm.structures import ControlmJob, ControlmAction, ControlmMarcaOut, ControlmDigrafo, ControlmContainer, ControlmFolder
+from controlm.structures import ControlmJob, ControlmAction, ControlmMarcaOut, ControlmDigrafo, ControlmContainer, ControlmFolder, MallaMaxi
 from controlm.record import ControlRecorder, RecorderTmp
 from controlm.constantes import Regex
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def jobname(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Realiza controles puntuales sobre el jobname
@@ -50,6 +54,7 @@ def jobname(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
         cr.add_item(job.name, f"No coincide la periodicidad del job[{info_jobname['periodicidad']}({constantes.MAPEO_PERJOBNAME_PERMALLA[info_jobname['periodicidad']]})], con la de la malla a la que pertenece[{malla.periodicidad}]")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def application(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Realiza controles puntuales sobre la application
@@ -72,6 +77,7 @@ def application(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
         cr.add_item(job.name, f"Para la application [{job.app}], el pais [{info_app['pais']}] debería ser [AR]")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def subapp(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Realiza controles puntuales sobre la subapplication
@@ -88,6 +94,7 @@ def subapp(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
         cr.add_item(job.name, f"La subapplication no contiene la palabra clave [CCR], valor obtenido [{job.subapp}]")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def atributos(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Realiza controles puntuales sobre los atributos del job. Los atributos incluyen muchas cosas, entre ellas la
@@ -122,6 +129,7 @@ def atributos(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
             cr.add_item(job.name, f"No coincide la malla 'padre' del job {val_atritubo} con la malla que se encuentra en el xml {malla.name}. Indagar al desarrollador sobre esto debido a que implica una manipulación manual del xml exportado")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def variables(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Realiza controles puntuales sobre las variables del job
@@ -193,13 +201,12 @@ def variables(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     ]
 
     existe_tabla = False
-    tabla_keys_posibles = ['TABLENAME', 'TABLE_NAME', 'TABLE', 'TABLA']
 
     # realizamos controles puntuales sobre las variables
     for var_key, var_value in job.variables.items():
         var_key = var_key.replace('%%', '')
 
-        if (var_key in tabla_keys_posibles and var_value.startswith(f't_')) or 't_' in job.atributos['DESCRIPTION']:
+        if (var_key in constantes.VARIABLES_TABLA and var_value.startswith(f't_')) or 't_' in job.atributos['DESCRIPTION']:
             existe_tabla = True
 
         match_dataproc_namespace = re.search(Regex.DATAPROC_NAMESPACE, utils.oofstr(var_value))
@@ -260,6 +267,7 @@ def variables(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
             cr.add_item(job.name, f"La variable [{var_key}] valor [{job.variables[var_key]}] está declarada pero no está siendo usada")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def marcas_in(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Realiza controles puntuales sobre los prerequisitos, el metodo se llama marcas_in mas que nada porque así se
@@ -298,6 +306,7 @@ def marcas_in(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
             cr.add_item(job.name, f"El job de ORIGEN [{marca.origen}] de el prerequisito [{marca.name}] no se encuentra en la malla y no pertenece a otra malla")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def marcas_out(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Realiza controles puntuales sobre las acciones de un job sobre marcas, el metodo se llama marcas_out mas que
@@ -578,6 +587,7 @@ def _subcontrol_doshout(job: ControlmJob, action: ControlmAction, code: str, mal
                 cr.add_item(job.name, f"El job es de RC y el mensaje de su alertamiento no es el correcto [{action.attrs['MESSAGE']}], debería ser [{mensaje_correcto}]")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def acciones(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Para controlar las acciones primero hay que ver bajo qué criterio están agrupadas. Este critero se conoce como
@@ -649,6 +659,7 @@ def acciones(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
             cr.add_item(job.name, value[1])
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def recursos_cuantitativos(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Los RRCC son identificadores que tienen un valor en el servidor que indican cuántos jobs pueden correr en
@@ -685,6 +696,7 @@ def recursos_cuantitativos(job: ControlmJob, malla: ControlmFolder, cr: ControlR
         cr.add_item(job.name, f"El job es [{job.tipo}P] ({job.tipo_descripcion}) y no se encuentra el recurso cuantitativo ARD-STG")
 
 
+@traza.trazada(atributos=traza.atributos_job)
 def tipo(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
     """
     Control sobre la correspondencia del tipo de un job según su jobname y lo que realmente hace
@@ -752,6 +764,7 @@ def tipo(job: ControlmJob, malla: ControlmFolder, cr: ControlRecorder):
         cr.add_item(job.name, mensaje)
 
 
+@traza.trazada(atributos=lambda malla, *_: {'carpeta': malla.name})
 def cadenas_malla(malla: ControlmFolder, cr: ControlRecorder):
     """
     Realiza controles sobre todas las cadenas de jobs que componen a la malla
@@ -762,6 +775,9 @@ def cadenas_malla(malla: ControlmFolder, cr: ControlRecorder):
 
     recorder_key = "ANALISIS DE CADENAS"
 
+    for ciclo in malla.digrafo.ciclos():
+        cr.add_listado(recorder_key, f"Existe una dependencia circular entre [{len(ciclo)}] jobs, ninguno de ellos va a ejecutar nunca", ciclo)
+
     cadenas = malla.digrafo.obtener_arboles()
     for cadena in cadenas:
 
@@ -790,36 +806,38 @@ def cadenas_malla(malla: ControlmFolder, cr: ControlRecorder):
                 cr.add_item(recorder_key, mensaje)
 
 
+@traza.trazada
 def cadenas_global(digrafo_global: ControlmDigrafo, contenedor_global: ControlmContainer):
     """
-    Realiza controles sobre todas las cadenas de jobs del global control m prod
+    Realiza controles sobre todas las cadenas de jobs del global control m prod. Las dependencias circulares se
+    escriben en analisis_ciclos.csv y el conteo de ingestas vs smart cleaners en analisis_cadenas.csv
 
     :param digrafo_global: Digrafo con todos los jobs
     :param contenedor_global: Digrafo con todos los jobs
     """
 
+    with open("analisis_ciclos.csv", 'w', newline='', encoding='utf-8') as f_ciclo:
+        csv_writer_ciclo = csv.writer(f_ciclo)
+        csv_writer_ciclo.writerow(["ID_CICLO", "MALLAS", "CANT_JOBS", "JOBNAMES"])
+        for i, ciclo in enumerate(digrafo_global.ciclos()):
+            mallas_ciclo = sorted({str(digrafo_global.malla(jobname_g)) for jobname_g in ciclo})
+            csv_writer_ciclo.writerow([str(i).zfill(3), '|'.join(mallas_ciclo), len(ciclo), '|'.join(ciclo)])
+
     with open("analisis_cadenas.csv", 'w', newline='', encoding='utf-8') as f_cadena:
         csv_writer_cadena = csv.writer(f_cadena)
         csv_writer_cadena.writerow(["ID_CADENA", "FASE", "CANT_INGESTAS", "CANT_SMART_CLEANERS", "CANT_SM_FALTANTES"])
+        # El conteo por cadena se hace sobre la tabla columnar del contenedor, sin recorrer los jobs
+        tabla = contenedor_global.tabla_jobs
         cadenas = digrafo_global.obtener_arboles()
         for i, cadena_g in enumerate(cadenas):
             id_cadena = str(i).zfill(3)
+            filas = tabla.ids_jobs(cadena_g)
+            conteo = tabla.contar(('tipo', 'fase'), filas)
             contador_instancias_ingesta = {
-                'staging': 0,
-                'raw': 0,
-                'master': 0
+                fase: conteo[('T', fase)] + conteo[('P', fase)] + conteo[('C', fase)]
+                for fase in ('staging', 'raw', 'master')
             }
-            contador_instancias_borradosm = {
-                'staging': 0,
-                'raw': 0,
-                'master': 0
-            }
-            for jobname_g in cadena_g:
-                job = contenedor_global.get_job(jobname_g)
-                if job.tipo in ['T', 'P', 'C'] and job.fase is not None:
-                    contador_instancias_ingesta[job.fase] += 1
-                if job.tipo in ['S'] and job.fase is not None:
-                    contador_instancias_borradosm[job.fase] += 1
+            contador_instancias_borradosm = {fase: conteo[('S', fase)] for fase in ('staging', 'raw', 'master')}
 
             for fase in contador_instancias_ingesta.keys():
                 if contador_instancias_ingesta[fase] > contador_instancias_borradosm[fase]:
@@ -827,17 +845,43 @@ def cadenas_global(digrafo_global: ControlmDigrafo, contenedor_global: ControlmC
                     csv_writer_cadena.writerow([id_cadena, fase, contador_instancias_ingesta[fase], contador_instancias_borradosm[fase], diferencia])
 
 
-def global_marcas(cont: ControlmContainer):
+@traza.trazada
+def global_marcas(cont: ControlmContainer, cr: ControlRecorder = None) -> ControlRecorder:
     """
     Analiza la validez de todas las marcas de los jobs. Por ej: si una marca es agregada por un job, se valida que esta
-    misma sea esperada y borrada por otro. TODO: implementar
+    misma sea esperada y borrada por otro. Se apoya en el indice de marcas del contenedor, por lo que cada marca se
+    analiza una sola vez sin importar en qué malla se encuentren los jobs
 
-    :param cont:
-    :return:
+    :param cont: Contenedor con todas las mallas
+    :param cr: Recorder que se encargará de guardar los controles fallidos, si no se provee se usa uno nuevo
+    :return: El recorder con los controles fallidos
     """
-    pass
 
+    if cr is None:
+        cr = ControlRecorder()
+    indice = cont.indice_marcas
+
+    for marca, jobnames in indice.huerfanas().items():
+        for jobname_g in jobnames:
+            cr.add_item(jobname_g, f"El prerequisito [{marca}] no es agregado por ningún job del contenedor, el job va a quedar esperando indefinidamente")
+
+    for marca, jobnames in indice.no_consumidas().items():
+        for jobname_g in jobnames:
+            cr.add_item(jobname_g, f"La marca OUT [{marca}] no es esperada por ningún job del contenedor")
+
+    for marca, jobnames in indice.no_eliminadas().items():
+        for jobname_g in jobnames:
+            cr.add_item(jobname_g, f"La marca OUT [{marca}] no es eliminada por ningún job del contenedor")
+
+    for marca, jobnames in indice.multiples_productores().items():
+        mallas = sorted({cont.get_malla_job(jobname_g).name for jobname_g in jobnames})
+        for jobname_g in jobnames:
+            cr.add_listado(jobname_g, f"La marca OUT [{marca}] es agregada por [{len(jobnames)}] jobs en las mallas {mallas}", jobnames)
 
+    return cr
+
+
+@traza.trazada(atributos=lambda malla_tmp, *_: {'carpeta': malla_tmp.name})
 def tmp_parametros(malla_tmp: ControlmFolder, recorder: RecorderTmp):
     """
 
@@ -855,3 +899,109 @@ def tmp_parametros(malla_tmp: ControlmFolder, recorder: RecorderTmp):
         recorder.add_general(
             f"El servidor no es el correcto. Valor esperado [CTM_CTRLMCCR], obtenido [{malla_tmp.datacenter}]")
 
+
+@traza.trazada(atributos=lambda malla_maxi, *_: {'jobs': len(malla_maxi.cadena_completa_temporal)})
+def tmp_enlaces(malla_maxi: MallaMaxi, recorder: RecorderTmp):
+    """
+    Controla, sobre la temporal en memoria (sin exportarla), que sus jobs estén bien enlazados: jobnames únicos y que no
+    existan en la malla origen, marcas que se agregan, esperan y eliminan de a pares con el formato ORIGEN-TO-DESTINO,
+    DOFORCEJOB que apuntan a jobs de la temporal, un solo job inicial y uno final (salvo con carriles) y ODATES
+    correctos. Los controles sobre cada carpeta se hacen con tmp_parametros sobre MallaMaxi.vistas()
+
+    :param malla_maxi: Temporal ya ambientada
+    :param recorder: Registro donde se informan los errores
+    """
+    cadena = malla_maxi.cadena_completa_temporal
+    jobnames = [job.name for job in cadena]
+
+    duplicados = utils.encontrar_duplicados(jobnames)
+    if duplicados:
+        recorder.add_listado('GENERAL', "Los siguientes jobnames están repetidos en la temporal", duplicados)
+
+    existentes = set(malla_maxi.malla_origen.jobnames()).intersection(jobnames)
+    if existentes:
+        recorder.add_listado('GENERAL', "Los siguientes jobnames ya existen en la malla origen", existentes)
+
+    # Armamos las aristas tal cual las ve control-M: marcas agregadas (OUTCOND o DOCOND) y jobs forzados (DOFORCEJOB)
+    carpeta_job = {job.name: job.atributos.get('PARENT_FOLDER') for job in cadena}
+    agregan: dict[str, list[str]] = {}
+    esperan: dict[str, list[str]] = {}
+    sucesores: dict[str, set[str]] = {jobname: set() for jobname in jobnames}
+    predecesores: dict[str, set[str]] = {jobname: set() for jobname in jobnames}
+
+    for job in cadena:
+        for marca_in in job.marcasin or []:
+            esperan.setdefault(marca_in.name, []).append(job.name)
+        for marca_out in job.marcasout or []:
+            if marca_out.signo == '+':
+                agregan.setdefault(marca_out.name, []).append(job.name)
+        for actions in job.onconditions.values():
+            for action in actions:
+                if action.id == 'DOCOND' and action.attrs.get('SIGN') == '+':
+                    agregan.setdefault(action.attrs['NAME'], []).append(job.name)
+                elif action.id == 'DOFORCEJOB':
+                    forzado = action.attrs.get('NAME')
+                    if forzado not in carpeta_job:
+                        recorder.add_item(job.name, f"Ordena al job [{forzado}] que no existe en la temporal")
+                        continue
+                    if action.attrs.get('TABLE_NAME') != carpeta_job[forzado]:
+                        recorder.add_item(job.name, f"Ordena al job [{forzado}] en la carpeta [{action.attrs.get('TABLE_NAME')}] pero se encuentra en [{carpeta_job[forzado]}]")
+                    sucesores[job.name].add(forzado)
+                    predecesores[forzado].add(job.name)
+
+    for marca, jobnames_esperan in esperan.items():
+        if marca not in agregan:
+            for jobname in jobnames_esperan:
+                recorder.add_item(jobname, f"Espera la marca [{marca}] que no agrega ningun job de la temporal")
+            continue
+        if marca == malla_maxi.marca_iteracion:
+            # La esperan los jobs que ordenan cada ODATE, no la cadena (ver MallaMaxi.replicar_iterando_odates)
+            for origen in agregan[marca]:
+                if marca != f'{origen}-TO-{cadena[0].name}':
+                    recorder.add_item(origen, f"La marca [{marca}] no respeta el formato ORIGEN-TO-ITERADOR")
+            continue
+        for origen in agregan[marca]:
+            for destino in jobnames_esperan:
+                if marca != f'{origen}-TO-{destino}':
+                    recorder.add_item(destino, f"La marca [{marca}] que agrega [{origen}] no respeta el formato ORIGEN-TO-DESTINO")
+                sucesores[origen].add(destino)
+                predecesores[destino].add(origen)
+
+    for marca, jobnames_agregan in agregan.items():
+        if marca not in esperan:
+            for jobname in jobnames_agregan:
+                recorder.add_item(jobname, f"Agrega la marca [{marca}] que no espera ningun job de la temporal")
+
+    for job in cadena:
+        eliminadas = {marca_out.name for marca_out in job.marcasout or [] if marca_out.signo == '-'}
+        for marca_in in job.marcasin or []:
+            if marca_in.name not in eliminadas:
+                recorder.add_item(job.name, f"No elimina la marca [{marca_in.name}] que espera")
+
+    if malla_maxi.carriles is None and cadena:
+        iniciales = [jobname for jobname in jobnames if not predecesores[jobname]]
+        finales = [jobname for jobname in jobnames if not sucesores[jobname]]
+        if len(iniciales) != 1:
+            recorder.add_listado('GENERAL', "La temporal debe tener un solo job inicial, se encontraron", iniciales)
+        if len(finales) != 1:
+            recorder.add_listado('GENERAL', "La temporal debe tener un solo job final, se encontraron", finales)
+
+    # ODATES: deben ser fechas validas de las seleccionadas, reemplazadas en las variables y en el orden seleccionado
+    odates_cadena = []
+    for job in cadena:
+        if job.odate is None:
+            continue
+        try:
+            datetime.strptime(job.odate, '%Y%m%d')
+        except ValueError:
+            recorder.add_item(job.name, f"El ODATE [{job.odate}] no es una fecha valida")
+        if job.odate not in malla_maxi.odates:
+            recorder.add_item(job.name, f"El ODATE [{job.odate}] no es uno de los seleccionados")
+        for var_name, var_value in job.variables.items():
+            if '%%$ODATE' in var_value:
+                recorder.add_item(job.name, f"La variable [{var_name}] no tiene el ODATE [{job.odate}] reemplazado")
+        if not odates_cadena or odates_cadena[-1] != job.odate:
+            odates_cadena.append(job.odate)
+
+    if odates_cadena and odates_cadena != [odate for odate, _ in itertools.groupby(malla_maxi.odates)]:
+        recorder.add_general("Los ODATES de la temporal no respetan el orden en el que fueron seleccionados")
@@ -0,0 +1,130 @@
+"""
+Fixtures compartidas por los tests: arman en memoria (sin archivos) exports de control-M con las mallas y jobs que se
+necesiten
+"""
+
+import random
+from xml.etree.ElementTree import Element, SubElement
+
+import pytest
+
+
+def _armar_export(mallas: dict[str, list[dict]]) -> Element:
+    """
+    Arma el DEFTABLE de un export. Cada job se describe con un diccionario:
+
+        jobname: obligatorio
+        padres: jobnames de los que depende, se agrega la marca PADRE-TO-HIJO (OUTCOND + en el padre, INCOND y
+            OUTCOND - en el hijo)
+        incond / outcond: marcas extra, outcond como pares (nombre, signo)
+        variables: diccionario nombre -> valor
+        recursos: nombres de recursos cuantitativos
+        on: diccionario codigo -> lista de acciones (tag, atributos)
+        atributos: atributos extra del JOB, pisan los por defecto
+
+    :param mallas: Nombre de la malla -> jobs
+    :return: Elemento raiz del export
+    """
+    hijos = {}
+    for jobs in mallas.values():
+        for job in jobs:
+            for padre in job.get('padres', ()):
+                hijos.setdefault(padre, []).append(job['jobname'])
+
+    raiz = Element('DEFTABLE')
+    for nombre_malla, jobs in mallas.items():
+        malla = SubElement(raiz, 'FOLDER', {'FOLDER_NAME': nombre_malla, 'DATACENTER': 'CTM_CTRLMCCR',
+                                            'FOLDER_ORDER_METHOD': 'SYSTEM'})
+        for job in jobs:
+            jobname = job['jobname']
+            atributos = {'JOBNAME': jobname, 'APPLICATION': 'MOL-AR-DATIO', 'SUB_APPLICATION': 'MOL-DATIO-CCR',
+                         'PARENT_FOLDER': nombre_malla, 'DESCRIPTION': f'job {jobname}'}
+            atributos.update(job.get('atributos', {}))
+            elemento = SubElement(malla, 'JOB', atributos)
+
+            for nombre, valor in job.get('variables', {}).items():
+                SubElement(elemento, 'VARIABLE', {'NAME': nombre, 'VALUE': valor})
+            marcas_in = [f'{padre}-TO-{jobname}' for padre in job.get('padres', ())] + list(job.get('incond', ()))
+            for marca in marcas_in:
+                SubElement(elemento, 'INCOND', {'NAME': marca, 'ODATE': 'ODAT', 'AND_OR': 'A'})
+            marcas_out = [(f'{jobname}-TO-{hijo}', '+') for hijo in hijos.get(jobname, ())]
+            marcas_out += [(marca, '-') for marca in marcas_in] + list(job.get('outcond', ()))
+            for marca, signo in marcas_out:
+                SubElement(elemento, 'OUTCOND', {'NAME': marca, 'ODATE': 'ODAT', 'SIGN': signo})
+            for recurso in job.get('recursos', ()):
+                SubElement(elemento, 'QUANTITATIVE', {'NAME': recurso, 'QUANT': '1'})
+            for codigo, acciones in job.get('on', {}).items():
+                on = SubElement(elemento, 'ON', {'STMT': '*', 'CODE': codigo})
+                for tag, atributos_accion in acciones:
+                    SubElement(on, tag, atributos_accion)
+    return raiz
+
+
+def _cadena(prefijo: str, cantidad: int, **extra) -> list[dict]:
+    """
+    Jobs encadenados uno detrás del otro: PREFIJO0000 -> PREFIJO0001 -> ...
+
+    :param prefijo: Jobname sin los 4 digitos finales, ej: AMOLCP
+    :param cantidad: Cantidad de jobs
+    :param extra: Claves extra para todos los jobs, ver _armar_export
+    """
+    jobnames = [f'{prefijo}{nro:04}' for nro in range(cantidad)]
+    return [dict(extra, jobname=jobname, padres=jobnames[nro - 1:nro]) for nro, jobname in enumerate(jobnames)]
+
+
+def _export_variado(semilla: int) -> Element:
+    """
+    Export armado al azar (reproducible por la semilla) con los casos que interesan a los indices y consultas globales:
+    varias mallas, cadenas con aristas entre mallas, todos los tipos de job, dataprocs y fases variados, ruta critica,
+    recursos, tablas compartidas entre jobs y un job con jobname invalido
+    """
+    azar = random.Random(semilla)
+    mallas = {}
+    jobnames = []
+    for uuaa in ('MOL', 'KTN', 'ADC'):
+        jobs = mallas[f'CR-AR{uuaa}DIA-T02'] = []
+        for nro in range(azar.randint(15, 30)):
+            tipo = azar.choice('CCCTPSSVVBWD')
+            jobname = f'A{uuaa}{tipo}P{azar.choice("04")}{len(jobnames):03}'
+            variables = {'%%MAIL': f'{uuaa.lower()}@bbva.com'}
+            if azar.random() < 0.8:
+                variables['%%DPID'] = (f"{azar.choice([uuaa.lower(), 'kdat'])}-{azar.choice(['ar', 'gl'])}-"
+                                       f"{azar.choice(['krb', 'spk', 'hmm', 'dfs'])}-"
+                                       f"{azar.choice(['inr', 'inm', 'ins', 'qlt', 'trn', 'rmv'])}-"
+                                       f"{azar.choice(['tablar', 'tablam', 'otra'])}-01")
+            if azar.random() < 0.5:
+                variables['%%NS'] = f'ar.{uuaa.lower()}.app-id-{azar.randint(1, 3)}1.pro'
+            if azar.random() < 0.7:
+                variables['%%TABLENAME'] = f't_{uuaa.lower()}_tabla{azar.randint(0, 4)}'
+            if azar.random() < 0.3:
+                variables['%%PATH'] = azar.choice(['/in/staging/x', '/data/raw/y', '/data/master/z'])
+            padres = jobnames[-1:] if nro else []
+            if jobnames and azar.random() < 0.15:
+                padres.append(azar.choice(jobnames))
+            jobs.append({
+                'jobname': jobname,
+                'padres': list(dict.fromkeys(padres)),
+                'variables': variables,
+                'recursos': azar.sample(['ARD', 'ARD-STG', f'ARD-NC-{uuaa}'], azar.randint(0, 2)),
+                'atributos': {'SUB_APPLICATION': f'{uuaa}-DATIO-{azar.choice(["CCR", "CCR", "RC"])}',
+                              'DESCRIPTION': azar.choice(['carga raw', 'master diario', 'calidad staging', 'nada']),
+                              'CMDLINE': f'/opt/datio/sentry-ar/dataproc_sentry.py %%DPID {uuaa.lower()}'},
+            })
+            jobnames.append(jobname)
+    mallas['CR-ARMOLDIA-T02'].append({'jobname': 'JOBINVALIDO', 'variables': {'%%TABLENAME': 't_mol_tabla0'}})
+    return _armar_export(mallas)
+
+
+@pytest.fixture
+def armar_export():
+    return _armar_export
+
+
+@pytest.fixture
+def cadena():
+    return _cadena
+
+
+@pytest.fixture
+def export_variado():
+    return _export_variado
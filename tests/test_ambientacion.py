@@ -0,0 +1,107 @@
+"""
+Tests de la ambientacion de las temporales por tabla de reglas (ReglasAmbientacion): con las reglas por defecto tiene
+que dar exactamente lo mismo que la ambientacion job por job que se hacía antes de las reglas
+"""
+
+from copy import deepcopy
+
+import pytest
+
+from controlm.structures import ControlmAction, ControlmContainer, ControlmRecursoCuantitativo, MallaMaxi, \
+    ReglasAmbientacion
+
+MAIL, FOLDER_TMP, CASO, LEGAJO = 'a@bbva.com', 'CR-ARMOLTMP-T11', 'caso 1', 'X123'
+
+
+def _ambientar_como_antes(cadena: list, forzar: bool):
+    """La ambientacion de MallaMaxi.ambientar antes de las reglas, para la temporal en linea"""
+    for job in cadena:
+        job.atributos['DESCRIPTION'] += f'. Creado automáticamente por generador de mallas temporales {CASO}'
+        job.atributos['SUB_APPLICATION'] = 'DATIO-AR-P'
+        job.atributos.pop('DAYSCAL', None)
+        job.atributos.pop('DAYS', None)
+        job.atributos['MAXWAIT'] = '0'
+        job.atributos['PARENT_FOLDER'] = FOLDER_TMP
+        job.recursos_cuantitativos = [ControlmRecursoCuantitativo(name='ARD'), ControlmRecursoCuantitativo(name='ARD-TMP')]
+        job.atributos['CREATED_BY'] = LEGAJO
+
+        for name, value in job.variables.items():
+            if '%%$ODATE' in value:
+                job.variables[name] = value.replace('%%$ODATE', job.odate)
+            elif '%%MAIL' in value:
+                job.variables[name] = value.replace('%%MAIL', MAIL)
+            elif '.dev' in value:
+                job.variables[name] = value.replace('.dev', '.pro')
+
+        for codigo, asunto, texto in (('NOTOK', 'Cancelo', 'NOTOK'), ('OK', 'OK', 'OK')):
+            msg = f'Finalizo {texto} %%JOBNAME {CASO}. Malla creada automaticamente por el generador de mallas temporales'
+            job.onconditions[codigo] = [ControlmAction(action_id='DOMAIL', attrs={
+                'URGENCY': 'R', 'DEST': 'datio-procesos-live.group@bbva.com', 'CC_DEST': MAIL,
+                'SUBJECT': f'{asunto} %%JOBNAME {CASO} - Temporal', 'MESSAGE': str(len(msg)).zfill(4) + msg,
+                'ATTACH_SYSOUT': 'Y'})]
+
+        if not job.marcasout or job.marcasout[0].signo == '-' or not forzar:
+            continue
+        marca_out = job.marcasout.pop(0)
+        job.onconditions['OK'].append(ControlmAction(
+            action_id='DOCOND', attrs={'NAME': marca_out.name, 'ODATE': 'ODAT', 'SIGN': marca_out.signo}))
+        job.onconditions['OK'].append(ControlmAction(
+            action_id='DOFORCEJOB', attrs={'TABLE_NAME': FOLDER_TMP, 'NAME': marca_out.destino, 'ODATE': 'ODAT',
+                                           'REMOTE': 'N'}))
+
+
+def _resumen(job) -> tuple:
+    return (
+        job.name,
+        list(job.atributos.items()),
+        list(job.variables.items()),
+        [recurso.name for recurso in job.recursos_cuantitativos],
+        [(marca.name, marca.signo) for marca in job.marcasout or []],
+        {codigo: [(accion.id, list(accion.attrs.items())) for accion in acciones]
+         for codigo, acciones in job.onconditions.items()},
+    )
+
+
+@pytest.fixture
+def malla_origen(armar_export, cadena):
+    jobs = cadena('AMOLCP', 5, recursos=['ARD-NC-MOL'], variables={
+        '%%FECHA': 'odate=%%$ODATE', '%%DESTINO': '%%MAIL', '%%NS': 'ar.mol.app-id-1.dev',
+        '%%AMBAS': '%%$ODATE %%MAIL.dev', '%%FIJA': 'sin cambios'},
+        atributos={'DAYSCAL': 'HABILES', 'DAYS': '1,2', 'MAXWAIT': '3', 'CMDLINE': 'dataproc_sentry.py %%DPID'},
+        on={'NOTOK': [('DOMAIL', {'DEST': 'otro@bbva.com', 'MESSAGE': '0004hola'})],
+            'COMPSTAT=7': [('DOCOND', {'NAME': 'OTRA-MARCA', 'ODATE': 'ODAT', 'SIGN': '+'})]})
+    jobs[2]['atributos'] = {'DESCRIPTION': 'otra descripcion'}
+    return ControlmContainer(armar_export({'CR-ARMOLDIA-T02': jobs})).mallas[0]
+
+
+@pytest.mark.parametrize('forzar', [False, True])
+@pytest.mark.parametrize('cant_odates', [1, 3, 12])  # Con 12 ODATES las marcas pasan a ser mediante accion
+def test_reglas_por_defecto_iguales_a_la_ambientacion_anterior(malla_origen, forzar, cant_odates):
+    malla_maxi = MallaMaxi(malla_origen.jobs(), malla_origen)
+    malla_maxi.ordenar()
+    malla_maxi.replicar_y_enlazar([f'2024-10-{dia:02}' for dia in range(1, cant_odates + 1)])
+    antes = deepcopy(malla_maxi.cadena_completa_temporal)
+
+    malla_maxi.ambientar(MAIL, FOLDER_TMP, CASO, LEGAJO, forzar)
+    _ambientar_como_antes(antes, forzar)
+
+    assert [_resumen(job) for job in malla_maxi.cadena_completa_temporal] == [_resumen(job) for job in antes]
+
+
+def test_reglas_propias(malla_origen, tmp_path):
+    path = tmp_path / 'reglas.json'
+    path.write_text('{"recursos_cuantitativos": ["ARD-STG"], "variables": [{"patron": "%%MAIL", "reemplazo": '
+                    '"{mail}"}], "atributos": {"SUB_APPLICATION": "{caso_d_uso}-TMP"}}', encoding='utf-8')
+    malla_maxi = MallaMaxi(malla_origen.jobs(), malla_origen, reglas_ambientacion=ReglasAmbientacion.desde_json(str(path)))
+    malla_maxi.ordenar()
+    malla_maxi.replicar_y_enlazar(['2024-10-01', '2024-10-02'])
+    malla_maxi.ambientar(MAIL, FOLDER_TMP, CASO, LEGAJO, False)
+
+    for job in malla_maxi.cadena_completa_temporal:
+        assert [recurso.name for recurso in job.recursos_cuantitativos] == ['ARD-STG']
+        assert job.atributos['SUB_APPLICATION'] == 'caso 1-TMP'
+        assert job.atributos['PARENT_FOLDER'] == 'CR-ARMOLDIA-T02' and 'CREATED_BY' not in job.atributos
+        assert job.variables['%%FECHA'] == 'odate=%%$ODATE'  # Sin la regla del ODATE no se reemplaza
+        assert job.variables['%%DESTINO'] == MAIL
+        # Las secciones que no tiene el .json se toman de las reglas por defecto
+        assert job.atributos['DESCRIPTION'].endswith(f'generador de mallas temporales {CASO}')
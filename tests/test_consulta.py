@@ -0,0 +1,100 @@
+"""
+Tests de los indices secundarios de jobs (ControlmIndiceJobs) y de las consultas sobre ellos (ControlmConsulta): cada
+consulta tiene que devolver lo mismo que filtrar todos los jobs uno por uno
+"""
+
+import pytest
+
+from controlm.structures import ControlmContainer, ControlmJob
+
+
+def _valores(job: ControlmJob, malla: str) -> dict[str, set]:
+    """Valores de cada campo indexado, pedidos directamente al job"""
+    info = job.get_info_jobname()
+    return {
+        'malla': {malla},
+        'uuaa': {info['uuaa']} if info else set(),
+        'tipo': {info['tipo']} if info else set(),
+        'fase': {job.fase} - {None} if info else set(),
+        'dataproc_id': {job.dataproc_id} - {None},
+        'dataproc_namespace': {job.dataproc_namespace} - {None},
+        'tabla': set(job.tablas()),
+        'subapp': {job.atributos.get('SUB_APPLICATION')} - {None},
+        'ruta_critica': {job.atributos.get('SUB_APPLICATION', '').endswith('-RC')},
+        'recurso': {recurso.name for recurso in job.recursos_cuantitativos},
+    }
+
+
+@pytest.fixture(params=range(3))
+def contenedor(request, export_variado):
+    return ControlmContainer(export_variado(request.param))
+
+
+def _filtrar(valores_jobs: dict[str, dict], **condiciones) -> list[str]:
+    def cumple(valores: dict, campo: str, aceptados) -> bool:
+        aceptados = aceptados if isinstance(aceptados, (list, tuple, set)) else [aceptados]
+        return bool(valores[campo] & set(aceptados))
+    return sorted(jobname for jobname, valores in valores_jobs.items()
+                  if all(cumple(valores, campo, aceptados) for campo, aceptados in condiciones.items()))
+
+
+def test_indices_equivalentes_a_los_jobs(contenedor):
+    valores_jobs = {job.name: _valores(job, malla.name) for malla in contenedor.mallas for job in malla.jobs()}
+    indice = contenedor.indice_jobs
+
+    assert indice.todos == valores_jobs.keys()
+    for campo in indice.campos:
+        assert sorted(indice.valores(campo), key=str) == sorted(
+            set().union(*(valores[campo] for valores in valores_jobs.values())), key=str)
+        for valor in indice.valores(campo):
+            assert indice.jobnames(campo, valor) == set(_filtrar(valores_jobs, **{campo: valor}))
+
+
+def test_consultas_equivalentes_a_filtrar_los_jobs(contenedor):
+    valores_jobs = {job.name: _valores(job, malla.name) for malla in contenedor.mallas for job in malla.jobs()}
+
+    for condiciones in (
+        {},
+        {'uuaa': 'MOL'},
+        {'uuaa': 'MOL', 'ruta_critica': True},
+        {'tipo': ['T', 'P', 'C'], 'fase': 'staging'},
+        {'malla': 'CR-ARKTNDIA-T02', 'recurso': ('ARD', 'ARD-STG')},
+        {'tabla': 't_mol_tabla0'},
+        {'uuaa': 'MOL', 'tipo': 'inexistente'},
+    ):
+        consulta = contenedor.consulta(**condiciones)
+        esperados = _filtrar(valores_jobs, **condiciones)
+        assert consulta.jobnames() == esperados, condiciones
+        assert len(consulta) == len(esperados)
+        assert list(consulta) == esperados
+        assert [job.name for job in consulta.jobs()] == esperados
+
+
+def test_condiciones_encadenadas_y_operadores(contenedor):
+    mol = contenedor.consulta(uuaa='MOL')
+    rc = contenedor.consulta(ruta_critica=True)
+    ingestas = contenedor.consulta(tipo=['T', 'P', 'C'])
+
+    assert mol.donde(ruta_critica=True).jobnames() == contenedor.consulta(uuaa='MOL', ruta_critica=True).jobnames()
+    assert (mol & rc).jobnames() == sorted(mol.resolver() & rc.resolver())
+    assert (mol | rc).jobnames() == sorted(mol.resolver() | rc.resolver())
+    assert (ingestas - mol).jobnames() == sorted(ingestas.resolver() - mol.resolver())
+    # Las condiciones se aplican sobre el resultado de los operadores
+    assert (mol | rc).donde(tipo='C').jobnames() == sorted(
+        (mol.resolver() | rc.resolver()) & contenedor.consulta(tipo='C').resolver())
+    # Donde no modifica la consulta original
+    assert mol.jobnames() == contenedor.consulta(uuaa='MOL').jobnames()
+
+
+def test_campo_inexistente(contenedor):
+    with pytest.raises(Exception, match=r'campo \[color\]'):
+        contenedor.consulta(color='rojo')
+    with pytest.raises(Exception, match=r'campo \[color\]'):
+        contenedor.indice_jobs.valores('color')
+
+
+def test_indices_a_pedido(export_variado):
+    contenedor = ControlmContainer(export_variado(0))
+    assert contenedor._indice_jobs is None
+    assert contenedor.consulta(uuaa='MOL').jobnames()
+    assert contenedor._indice_jobs is contenedor.indice_jobs
@@ -0,0 +1,84 @@
+"""
+Tests de la decodificacion de los hijos del elemento xml de un ControlmJob, que se hace en una sola pasada la primera
+vez que se pide alguno de ellos
+"""
+
+from xml.etree.ElementTree import Element, SubElement
+
+import pytest
+
+from controlm.structures import ControlmContainer, ControlmJob
+
+
+def _elemento() -> Element:
+    elemento = Element('JOB', {'JOBNAME': 'AMOLCP0001', 'APPLICATION': 'MOL-AR-DATIO',
+                               'SUB_APPLICATION': 'MOL-DATIO-CCR'})
+    # Los hijos mezclados, como vienen en un export real
+    SubElement(elemento, 'VARIABLE', {'NAME': '%%A', 'VALUE': '1'})
+    SubElement(elemento, 'INCOND', {'NAME': 'AMOLCP0000-TO-AMOLCP0001', 'ODATE': 'ODAT', 'AND_OR': 'A'})
+    SubElement(elemento, 'RULE_BASED_CALENDARS', {'NAME': 'EVERYDAY'})  # No se decodifica
+    on = SubElement(elemento, 'ON', {'STMT': '*', 'CODE': 'COMPSTAT EQ 7'})
+    SubElement(on, 'DOCOND', {'NAME': 'AMOLCP0001-TO-AMOLDP0001', 'ODATE': 'ODAT', 'SIGN': '+'})
+    SubElement(on, 'DOMAIL', {'DEST': 'a@b.com', 'URGENCY': 'R'})
+    SubElement(elemento, 'VARIABLE', {'NAME': '%%B', 'VALUE': '%%A.2'})
+    SubElement(elemento, 'QUANTITATIVE', {'NAME': 'ARD', 'QUANT': '1'})
+    SubElement(elemento, 'OUTCOND', {'NAME': 'AMOLCP0000-TO-AMOLCP0001', 'ODATE': 'ODAT', 'SIGN': '-'})
+    SubElement(elemento, 'OUTCOND', {'NAME': 'AMOLCP0001-TO-AMOLCP0002', 'ODATE': 'ODAT', 'SIGN': '+'})
+    SubElement(elemento, 'VARIABLE', {'NAME': '%%A', 'VALUE': 'duplicada'})
+    SubElement(elemento, 'QUANTITATIVE', {'NAME': 'ARD-STG', 'QUANT': '1'})
+    SubElement(SubElement(elemento, 'ON', {'STMT': '*', 'CODE': 'NOTOK'}), 'DOACTION', {'ACTION': 'OK'})
+    return elemento
+
+
+def test_decodificacion_equivalente_a_buscar_por_tag(capsys):
+    elemento = _elemento()
+    # Lo mismo que se obtenía buscando cada tag por separado
+    variables = {}
+    for variable in elemento.findall('VARIABLE'):
+        variables.setdefault(variable.get('NAME'), variable.get('VALUE'))
+    marcasin = [(marca.get('NAME'), marca.get('ODATE')) for marca in elemento.findall('INCOND')]
+    marcasout = [(marca.get('NAME'), marca.get('SIGN'), False) for marca in elemento.findall('OUTCOND')]
+    marcasout += [(marca.get('NAME'), marca.get('SIGN'), True) for marca in elemento.findall('ON/DOCOND')]
+    recursos = [recurso.get('NAME') for recurso in elemento.findall('QUANTITATIVE')]
+    acciones = {on.get('CODE'): [(accion.tag, dict(accion.items())) for accion in on] for on in elemento.findall('ON')}
+
+    job = ControlmJob(elemento, 'test.xml')
+    assert job.variables == variables
+    assert [(marca.name, marca.odate) for marca in job.marcasin] == marcasin
+    assert [(marca.name, marca.signo, marca.mediante_accion) for marca in job.marcasout] == marcasout
+    assert [recurso.name for recurso in job.recursos_cuantitativos] == recursos
+    assert {codigo: [(accion.id, accion.attrs) for accion in on] for codigo, on in job.onconditions.items()} == acciones
+    assert job.scheduling is None
+    assert 'VARIABLE DUPLICADA [%%A]' in capsys.readouterr().out
+
+
+def test_decodificacion_a_pedido():
+    job = ControlmJob(_elemento(), 'test.xml')
+    assert job._elemento is not None
+    assert 'variables' not in job.__dict__
+
+    assert job.marcasin  # Cualquiera de los atributos decodifica todos
+    assert job._elemento is None
+    assert {'variables', 'marcasin', 'marcasout', 'recursos_cuantitativos', 'onconditions'} <= job.__dict__.keys()
+    assert job.expandir_string('%%B') == '1.2'
+
+
+def test_error_de_decodificacion_se_puede_reintentar():
+    elemento = _elemento()
+    SubElement(elemento, 'INCOND', {'ODATE': 'ODAT'})  # Sin NAME
+    job = ControlmJob(elemento, 'malla.xml')
+
+    for _ in range(2):
+        with pytest.raises(Exception, match=r'job \[AMOLCP0001\] en la malla \[malla.xml\]'):
+            job.variables
+    assert job._elemento is elemento
+
+
+def test_decodificacion_en_el_contenedor(armar_export, cadena):
+    contenedor = ControlmContainer(armar_export({'CR-ARMOLDIA-T02': cadena('AMOLCP', 3, variables={'%%A': '1'})}))
+    job = contenedor.get_job('AMOLCP0001')
+    # El indice de marcas del contenedor ya los decodificó
+    assert job._elemento is None
+    assert job.variables == {'%%A': '1'}
+    assert [marca.name for marca in job.marcasin] == ['AMOLCP0000-TO-AMOLCP0001']
+    assert [str(marca) for marca in job.marcasout] == ['AMOLCP0001-TO-AMOLCP0002 (+)', 'AMOLCP0000-TO-AMOLCP0001 (-)']
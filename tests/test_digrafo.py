@@ -0,0 +1,169 @@
+"""
+Tests del digrafo: la version compacta (ControlmDigrafoCompacto, CSR) tiene que responder exactamente lo mismo que
+ControlmDigrafo sobre el mismo export. Los ciclos (componentes fuertemente conexas) y el indice de alcance (bitsets)
+tienen que coincidir con lo que se obtiene con recorridos DFS
+"""
+
+import csv
+import random
+
+import pytest
+
+from controlm.structures import ControlmContainer
+from controlm.validaciones import cadenas_global
+
+_MALLAS = ('CR-ARMOLDIA-T02', 'CR-ARKTNDIA-T02', 'CR-ARADCDIA-T02')
+
+
+def _export_aleatorio(armar_export, semilla: int, cantidad: int = 60):
+    """
+    Export con jobs repartidos en varias mallas y dependencias al azar: ramas, uniones, aristas entre mallas, ciclos y
+    algun job que se deja marca a sí mismo
+    """
+    azar = random.Random(semilla)
+    jobnames = [f'A{malla[5:8]}CP{nro:04}' for nro in range(cantidad) for malla in [azar.choice(_MALLAS)]]
+    mallas = {malla: [] for malla in _MALLAS}
+    for nro, jobname in enumerate(jobnames):
+        padres = azar.sample(jobnames[:nro], min(nro, azar.choice((0, 1, 1, 1, 2))))
+        if azar.random() < 0.05:
+            padres.append(azar.choice(jobnames))  # Puede ser un job posterior: ciclo si este lo alcanza
+        if nro % 20 == 7:
+            padres.append(jobnames[nro + 1])  # Ciclo con el siguiente
+        if nro % 20 == 8:
+            padres.append(jobnames[nro - 1])
+        if nro == cantidad // 2:
+            padres.append(jobname)  # Se deja marca a sí mismo
+        mallas[f'CR-AR{jobname[1:4]}DIA-T02'].append({'jobname': jobname, 'padres': list(dict.fromkeys(padres))})
+    return armar_export(mallas)
+
+
+@pytest.fixture(params=range(5))
+def digrafos(request, armar_export):
+    export = _export_aleatorio(armar_export, request.param)
+    return ControlmContainer(export).digrafo, ControlmContainer(export, digrafo_compacto=True).digrafo
+
+
+def test_csr_equivalente_estructura(digrafos):
+    digrafo, compacto = digrafos
+    jobnames = list(digrafo._grafo)
+
+    assert len(compacto) == len(digrafo)
+    assert str(compacto) == str(digrafo)
+    assert compacto.obtener_paresxy() == digrafo.obtener_paresxy()
+    assert compacto.aristas_entre_mallas() == digrafo.aristas_entre_mallas()
+    assert compacto.raices() == digrafo.raices()
+    assert compacto.hojas() == digrafo.hojas()
+    for jobname in jobnames + ['AXXXCP0000']:
+        assert (jobname in compacto) == (jobname in digrafo)
+        assert compacto.hijos(jobname) == digrafo.hijos(jobname)
+        assert compacto.padres(jobname) == digrafo.padres(jobname)
+        assert compacto.malla(jobname) == digrafo.malla(jobname)
+        assert compacto.es_raiz(jobname) == digrafo.es_raiz(jobname)
+        assert compacto.es_hoja(jobname) == digrafo.es_hoja(jobname)
+
+
+def test_csr_equivalente_recorridos(digrafos):
+    digrafo, compacto = digrafos
+    jobnames = list(digrafo._grafo)
+
+    assert sorted(map(sorted, compacto.obtener_arboles())) == sorted(map(sorted, digrafo.obtener_arboles()))
+    for jobname in jobnames:
+        assert compacto.recorrer_cadena(jobname) == digrafo.recorrer_cadena(jobname)
+        assert compacto.recorrer_cadena_inversa(jobname) == digrafo.recorrer_cadena_inversa(jobname)
+        visitados_digrafo, visitados_compacto = set(jobnames[:5]), set(jobnames[:5])
+        assert (compacto.recorrer_cadena(jobname, visitados_compacto)
+                == digrafo.recorrer_cadena(jobname, visitados_digrafo))
+        assert visitados_compacto == visitados_digrafo
+
+    azar = random.Random(0)
+    for _ in range(200):
+        inicio, fin = azar.choice(jobnames), azar.choice(jobnames)
+        assert compacto.find_shortest_path(inicio, fin) == digrafo.find_shortest_path(inicio, fin)
+    cadena = azar.sample(jobnames, 20)
+    assert compacto.obtener_pares_xy_cadena(cadena) == digrafo.obtener_pares_xy_cadena(cadena)
+
+
+def _ciclos_por_recorridos(digrafo) -> list[list[str]]:
+    """Dos jobs están en el mismo ciclo si cada uno alcanza al otro, un job solo si se deja marca a sí mismo"""
+    alcanzados = {jobname: set(digrafo.recorrer_cadena(jobname)) for jobname in digrafo._grafo}
+    ciclos = set()
+    for jobname, alcanzables in alcanzados.items():
+        ciclo = tuple(sorted(otro for otro in alcanzables if jobname in alcanzados[otro]))
+        if len(ciclo) > 1 or jobname in digrafo.hijos(jobname):
+            ciclos.add(ciclo)
+    return sorted(map(list, ciclos))
+
+
+def test_ciclos_equivalentes_a_recorridos(digrafos):
+    digrafo, compacto = digrafos
+    esperados = _ciclos_por_recorridos(digrafo)
+
+    assert esperados
+    assert sorted(digrafo.ciclos()) == esperados
+    assert sorted(compacto.ciclos()) == esperados
+
+
+def test_ciclo_entre_mallas(armar_export, cadena):
+    mol, ktn = cadena('AMOLCP', 3), cadena('AKTNCP', 2)
+    ktn[0]['padres'] = ['AMOLCP0002']
+    mol[1]['padres'].append('AKTNCP0001')
+    digrafo = ControlmContainer(armar_export({'CR-ARMOLDIA-T02': mol, 'CR-ARKTNDIA-T02': ktn})).digrafo
+
+    assert digrafo.ciclos() == [['AKTNCP0000', 'AKTNCP0001', 'AMOLCP0001', 'AMOLCP0002']]
+
+
+def test_ciclo_largo_sin_limite_de_recursion(armar_export, cadena):
+    jobs = cadena('AMOLCP', 5000)
+    jobs[0]['padres'] = ['AMOLCP4999']
+    for compacto in (False, True):
+        digrafo = ControlmContainer(armar_export({'CR-ARMOLDIA-T02': jobs}), digrafo_compacto=compacto).digrafo
+        ciclos = digrafo.ciclos()
+        assert len(ciclos) == 1 and len(ciclos[0]) == 5000
+
+
+def test_cadenas_global_informa_ciclos(armar_export, cadena, tmp_path, monkeypatch):
+    mol = cadena('AMOLCP', 3)
+    mol[0]['padres'] = ['AMOLCP0002']
+    contenedor = ControlmContainer(armar_export({'CR-ARMOLDIA-T02': mol, 'CR-ARKTNDIA-T02': cadena('AKTNCP', 2)}))
+
+    monkeypatch.chdir(tmp_path)
+    cadenas_global(contenedor.digrafo, contenedor)
+    with open(tmp_path / 'analisis_ciclos.csv', newline='', encoding='utf-8') as f_ciclo:
+        filas = list(csv.reader(f_ciclo))
+    assert filas == [['ID_CICLO', 'MALLAS', 'CANT_JOBS', 'JOBNAMES'],
+                     ['000', 'CR-ARMOLDIA-T02', '3', 'AMOLCP0000|AMOLCP0001|AMOLCP0002']]
+
+
+def _alcanzados(digrafo, jobname: str, inverso: bool = False) -> set[str]:
+    """Jobs alcanzables con un DFS, el propio job solamente si vuelve a él (forma parte de un ciclo)"""
+    recorrido = digrafo.recorrer_cadena_inversa(jobname) if inverso else digrafo.recorrer_cadena(jobname)
+    vecinos = digrafo.padres if inverso else digrafo.hijos
+    alcanzados = set(recorrido[1:])
+    if any(jobname in vecinos(otro) for otro in alcanzados | {jobname}):
+        alcanzados.add(jobname)
+    return alcanzados
+
+
+def test_indice_alcance_equivalente_a_dfs(digrafos):
+    for digrafo in digrafos:
+        jobnames = list(digrafo.grafo_csr().nombres)
+        descendientes = {jobname: _alcanzados(digrafo, jobname) for jobname in jobnames}
+        for jobname in jobnames:
+            ancestros = _alcanzados(digrafo, jobname, inverso=True)
+            assert set(digrafo.descendientes(jobname)) == descendientes[jobname]
+            assert set(digrafo.ancestros(jobname)) == ancestros
+            assert len(digrafo.descendientes(jobname)) == len(descendientes[jobname])
+            assert sorted(digrafo.recorrer_cadena_completa(jobname)) == sorted(
+                descendientes[jobname] | ancestros | {jobname})
+            for otro in jobnames:
+                assert digrafo.alcanza(jobname, otro) == (otro in descendientes[jobname])
+                assert digrafo.estan_conectados(jobname, otro) == (
+                    otro in descendientes[jobname] or jobname in descendientes[otro])
+
+
+def test_indice_alcance_jobs_inexistentes(digrafos):
+    for digrafo in digrafos:
+        assert digrafo.descendientes('AXXXCP0000') == []
+        assert digrafo.ancestros('AXXXCP0000') == []
+        assert digrafo.recorrer_cadena_completa('AXXXCP0000') == ['AXXXCP0000']
+        assert not digrafo.alcanza('AXXXCP0000', 'AXXXCP0000')
@@ -0,0 +1,42 @@
+"""
+Tests de la carga de duraciones historicas (estimacion.cargar_duraciones_*)
+"""
+
+import sqlite3
+
+import pytest
+
+from controlm.estimacion import cargar_duraciones_csv, cargar_duraciones_sqlite
+
+
+@pytest.fixture
+def base(tmp_path) -> str:
+    path = str(tmp_path / 'duraciones.db')
+    with sqlite3.connect(path) as conexion:
+        conexion.execute('CREATE TABLE duraciones (jobname TEXT, duracion REAL, "otra ""columna""" REAL)')
+        conexion.executemany('INSERT INTO duraciones VALUES (?, ?, ?)', [
+            ('AMOLCP0000', 10, 1), ('AMOLCP0000', 30, 2), ('AMOLCP0001', 5, None), ('AMOLCP0002', None, 3)])
+    conexion.close()
+    return path
+
+
+def test_sqlite_igual_que_csv(base, tmp_path):
+    path_csv = tmp_path / 'duraciones.csv'
+    path_csv.write_text('JOBNAME,DURACION\nAMOLCP0000,10\nAMOLCP0000,30\nAMOLCP0001,5\nAMOLCP0002,\n', encoding='utf-8')
+
+    for agregacion in ('media', 'maximo'):
+        assert cargar_duraciones_sqlite(base, agregacion) == cargar_duraciones_csv(str(path_csv), agregacion)
+    assert cargar_duraciones_sqlite(base, 'maximo', columna_duracion='otra "columna"') == {
+        'AMOLCP0000': 2, 'AMOLCP0002': 3}
+    assert cargar_duraciones_sqlite(base, tabla='DURACIONES', columna_jobname='JOBNAME') == cargar_duraciones_sqlite(base)
+
+
+@pytest.mark.parametrize('nombres, mensaje', [
+    ({'tabla': 'inexistente'}, r'tabla \[inexistente\] no existe'),
+    ({'tabla': 'duraciones" WHERE 1=1; --'}, 'no existe'),
+    ({'columna_duracion': 'duracion" FROM duraciones; --'}, r"columnas \['duracion\" FROM"),
+    ({'columna_jobname': 'job'}, r"columnas \['job'\]"),
+])
+def test_sqlite_tabla_o_columnas_invalidas(base, nombres, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        cargar_duraciones_sqlite(base, **nombres)
@@ -0,0 +1,88 @@
+"""
+Tests de la expansion de variables de los jobs (ControlmJob.expandir_string): variables anidadas, referencias
+circulares, limite de anidamiento y cache de expansiones
+"""
+
+from copy import deepcopy
+from xml.etree.ElementTree import Element, SubElement
+
+from controlm.structures import ControlmJob
+
+
+def _job(variables: dict[str, str], jobname: str = 'AAMOLCP0001') -> ControlmJob:
+    elemento = Element('JOB', {'JOBNAME': jobname, 'APPLICATION': 'AMOL-AR-DATIO', 'SUB_APPLICATION': 'AMOL-DATIO-CCR'})
+    for nombre, valor in variables.items():
+        SubElement(elemento, 'VARIABLE', {'NAME': nombre, 'VALUE': valor})
+    return ControlmJob(elemento, 'test.xml')
+
+
+def test_variables_anidadas():
+    job = _job({'%%PATH': '/data/%%FASE/%%TABLA', '%%FASE': 'raw', '%%TABLA': 't_%%UUAA%%._tabla', '%%UUAA': 'amol'})
+    assert job.expandir_string('ls %%PATH') == 'ls /data/raw/t_amol_tabla'
+
+
+def test_variables_por_defecto_y_no_definidas():
+    job = _job({'%%ASUNTO': 'OK %%JOBNAME'})
+    assert job.expandir_string('%%ASUNTO %%ODATE_INEXISTENTE') == 'OK AAMOLCP0001 CTMERR'
+
+
+def test_referencia_circular_directa():
+    job = _job({'%%A': 'x%%A', '%%B': 'ok'})
+    assert job.expandir_string('%%A') == 'CTMERR'
+    assert job.expandir_string('%%B') == 'ok'
+
+
+def test_referencia_circular_indirecta():
+    job = _job({'%%A': '1%%B', '%%B': '2%%C', '%%C': '3%%A', '%%D': 'd%%C'})
+    # Todas las variables del ciclo son CTMERR, sin importar por cuál se empiece a resolver
+    assert job.expandir_string('%%B') == 'CTMERR'
+    assert job.expandir_string('%%A') == 'CTMERR'
+    assert job.expandir_string('%%C') == 'CTMERR'
+    # Una variable que referencia al ciclo sin formar parte de él se resuelve con el CTMERR del ciclo
+    assert job.expandir_string('%%D') == 'dCTMERR'
+
+
+def test_limite_de_anidamiento():
+    limite = ControlmJob.cant_max_iteraciones
+
+    dentro = {f'%%V{nro}': f'%%V{nro + 1}' for nro in range(limite - 1)}
+    dentro[f'%%V{limite - 1}'] = 'fin'
+    assert _job(dentro).expandir_string('%%V0') == 'fin'
+
+    fuera = {f'%%V{nro}': f'%%V{nro + 1}' for nro in range(limite)}
+    fuera[f'%%V{limite}'] = 'fin'
+    assert _job(fuera).expandir_string('%%V0') == 'CTMERR'
+
+
+def test_invalidacion_al_renombrar():
+    job = _job({'%%ASUNTO': 'OK %%JOBNAME'})
+    assert job.expandir_string('%%ASUNTO') == 'OK AAMOLCP0001'
+    job.name = 'AAMOLCP0002'
+    assert job.expandir_string('%%ASUNTO') == 'OK AAMOLCP0002'
+
+
+def test_invalidacion_al_modificar_variables():
+    job = _job({'%%FASE': 'raw', '%%PATH': '/data/%%FASE'})
+    assert job.expandir_string('%%PATH') == '/data/raw'
+    job.variables['%%FASE'] = 'master'
+    assert job.expandir_string('%%PATH') == '/data/master'
+    job.variables.update({'%%FASE': 'staging'})
+    assert job.expandir_string('%%PATH') == '/data/staging'
+    del job.variables['%%FASE']
+    assert job.expandir_string('%%PATH') == '/data/CTMERR'
+
+
+def test_invalidacion_al_asignar_variables():
+    job = _job({'%%FASE': 'raw'})
+    assert job.expandir_string('/data/%%FASE') == '/data/raw'
+    job.variables = {'%%FASE': 'master'}
+    assert job.expandir_string('/data/%%FASE') == '/data/master'
+
+
+def test_invalidacion_en_copias():
+    job = _job({'%%FASE': 'raw'})
+    assert job.expandir_string('/data/%%FASE') == '/data/raw'
+    copia = deepcopy(job)
+    copia.variables['%%FASE'] = 'master'
+    assert copia.expandir_string('/data/%%FASE') == '/data/master'
+    assert job.expandir_string('/data/%%FASE') == '/data/raw'
@@ -0,0 +1,120 @@
+"""
+Tests del indice invertido de texto (ControlmIndiceTexto): busquedas contra recorrer los textos de los jobs, y
+guardado / carga del indice junto al export
+"""
+
+import json
+import os
+from xml.etree.ElementTree import ElementTree
+
+import pytest
+
+import controlm.structures as structures
+from controlm.structures import ControlmContainer, ControlmIndiceTexto
+
+
+def _tokens_jobs(contenedor: ControlmContainer) -> dict[str, set[str]]:
+    tokens = {}
+    for malla in contenedor.mallas:
+        for job in malla.jobs():
+            textos = [*job.variables, *job.variables.values(), job.command, job.atributos.get('DESCRIPTION')]
+            tokens[job.name] = set().union(*(ControlmIndiceTexto.tokenizar(texto) for texto in textos if texto))
+    return tokens
+
+
+@pytest.fixture
+def path_export(tmp_path, export_variado) -> str:
+    path = str(tmp_path / 'export.xml')
+    ElementTree(export_variado(0)).write(path)
+    return path
+
+
+def test_tokenizar():
+    assert ControlmIndiceTexto.tokenizar('hdfs dfs -rm /data/raw/AMOL/t_amol_x %%NS=ar.amol.app-id-1.dev') == {
+        'hdfs', 'dfs', '-rm', 'rm', 'data', 'raw', 'amol', 't_amol_x', '%%ns', 'ar.amol.app-id-1.dev', 'ar', 'app',
+        'id', '1', 'dev'}
+
+
+def test_busquedas_equivalentes_a_recorrer_los_textos(export_variado):
+    contenedor = ControlmContainer(export_variado(1), indice_texto=True)
+    indice = contenedor.indice_texto
+    tokens_jobs = _tokens_jobs(contenedor)
+
+    todos = set().union(*tokens_jobs.values())
+    assert indice.tokens.keys() == todos
+    for token in todos:
+        assert indice.buscar(token) == {jobname for jobname, tokens in tokens_jobs.items() if token in tokens}
+    assert indice.buscar('%%DPID') == indice.buscar('%%dpid')
+    assert indice.buscar('inexistente') == set()
+
+    for prefijo in ('t_mol_', 'T_KTN_TABLA', 'ar.', '%%', 'zzz'):
+        assert indice.buscar_prefijo(prefijo) == {
+            jobname for jobname, tokens in tokens_jobs.items() if any(t.startswith(prefijo.lower()) for t in tokens)}
+
+    for texto in ('/data/raw/y', 'dataproc_sentry.py mol', 'ar.ktn.app-id-11.pro', ''):
+        buscados = ControlmIndiceTexto.tokenizar(texto)
+        assert indice.buscar_texto(texto) == {
+            jobname for jobname, tokens in tokens_jobs.items() if buscados and buscados <= tokens}
+
+
+def test_guardar_y_cargar(path_export, tmp_path, monkeypatch):
+    path_indice = str(tmp_path / 'indice.json')
+    armado = ControlmContainer(path_export, indice_texto=path_indice).indice_texto
+    assert os.path.exists(path_indice)
+
+    # Con el mismo export se carga el guardado, sin volver a indexar los jobs
+    with monkeypatch.context() as parche:
+        parche.setattr(ControlmIndiceTexto, 'agregar_job', lambda *_: pytest.fail('No se debe volver a armar'))
+        cargado = ControlmContainer(path_export, indice_texto=path_indice).indice_texto
+    assert cargado.tokens == armado.tokens
+    assert cargado.buscar_prefijo('t_mol_') == armado.buscar_prefijo('t_mol_')
+
+
+def test_indice_de_otro_export_o_version(path_export, tmp_path):
+    path_indice = str(tmp_path / 'indice.json')
+    huella = ControlmIndiceTexto.huella_export(path_export)
+    ControlmContainer(path_export, indice_texto=path_indice)
+
+    assert ControlmIndiceTexto.cargar(path_indice, huella) is not None
+    assert ControlmIndiceTexto.cargar(path_indice, None) is None
+    assert ControlmIndiceTexto.cargar(path_indice, huella + 'x') is None
+    assert ControlmIndiceTexto.cargar(str(tmp_path / 'inexistente.json'), huella) is None
+
+    with open(path_indice, encoding='utf-8') as archivo:
+        guardado = json.load(archivo)
+    guardado['version'] = ControlmIndiceTexto.version + 1
+    with open(path_indice, 'w', encoding='utf-8') as archivo:
+        json.dump(guardado, archivo)
+    assert ControlmIndiceTexto.cargar(path_indice, huella) is None
+
+
+@pytest.mark.parametrize('contenido', ['{"version": 1, "huel', '[]', '{"version": 1, "huella": "%s"}',
+                                       '{"version": 1, "huella": "%s", "jobnames": [], "tokens": {"a": [3]}}'])
+def test_indice_corrupto_se_vuelve_a_armar(path_export, tmp_path, capsys, contenido):
+    path_indice = str(tmp_path / 'indice.json')
+    huella = ControlmIndiceTexto.huella_export(path_export)
+    with open(path_indice, 'w', encoding='utf-8') as archivo:
+        archivo.write(contenido.replace('%s', huella.replace('\\', '\\\\')))
+
+    contenedor = ControlmContainer(path_export, indice_texto=path_indice)
+    assert contenedor.indice_texto.tokens
+    assert 'WARNING' in capsys.readouterr().out
+    # Se reemplazó por uno válido
+    assert ControlmIndiceTexto.cargar(path_indice, huella).tokens == contenedor.indice_texto.tokens
+
+
+def test_guardado_interrumpido_no_pisa_el_indice(path_export, tmp_path, monkeypatch):
+    path_indice = str(tmp_path / 'indice.json')
+    indice = ControlmContainer(path_export, indice_texto=path_indice).indice_texto
+    with open(path_indice, encoding='utf-8') as archivo:
+        anterior = archivo.read()
+
+    def cortar(*_args, **_kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(structures.json, 'dump', cortar)
+    with pytest.raises(KeyboardInterrupt):
+        indice.guardar(path_indice, 'otra huella')
+
+    with open(path_indice, encoding='utf-8') as archivo:
+        assert archivo.read() == anterior
+    assert sorted(os.listdir(tmp_path)) == ['export.xml', 'indice.json']
@@ -0,0 +1,64 @@
+"""
+Tests del internado de strings (TablaInternado): los strings repetidos entre los jobs de un contenedor tienen que ser el
+mismo objeto, sin cambiar su valor
+"""
+
+from copy import deepcopy
+from xml.etree.ElementTree import fromstring, tostring
+
+from controlm.structures import ControlmContainer, ControlmFolder, TablaInternado
+
+
+def _contenedor(armar_export, cadena) -> ControlmContainer:
+    variables = {'%%MAIL': 'a@b.com', '%%DPID': 'mol-ar-krb-inr-tabla-01'}
+    mallas = {'CR-ARMOLDIA-T02': cadena('AMOLCP', 4, variables=variables, recursos=['ARD']),
+              'CR-ARKTNDIA-T02': cadena('AKTNCP', 3, variables=variables, recursos=['ARD'])}
+    # Se vuelve a parsear el texto para que, como al leer un export, cada atributo sea un string nuevo
+    return ControlmContainer(fromstring(tostring(armar_export(mallas))))
+
+
+def _todos_iguales_e_identicos(valores: list) -> bool:
+    return len(set(valores)) == 1 and len({id(valor) for valor in valores}) == 1
+
+
+def test_tabla_internado():
+    tabla = TablaInternado()
+    primero = ''.join(['AR', 'D'])
+    segundo = ''.join(['A', 'RD'])
+    assert primero is not segundo
+    assert tabla[primero] is primero
+    assert tabla[segundo] is primero
+
+
+def test_strings_compartidos_entre_jobs_y_mallas(armar_export, cadena):
+    contenedor = _contenedor(armar_export, cadena)
+    jobs = [job for malla in contenedor.mallas for job in malla.jobs()]
+
+    assert _todos_iguales_e_identicos([job.atributos['APPLICATION'] for job in jobs])
+    assert _todos_iguales_e_identicos([clave for job in jobs for clave in job.atributos if clave == 'APPLICATION'])
+    assert _todos_iguales_e_identicos([nombre for job in jobs for nombre in job.variables if nombre == '%%MAIL'])
+    assert _todos_iguales_e_identicos([job.variables['%%DPID'] for job in jobs])
+    assert _todos_iguales_e_identicos([recurso.name for job in jobs for recurso in job.recursos_cuantitativos])
+    assert _todos_iguales_e_identicos([marca.odate for job in jobs for marca in job.marcasin + job.marcasout])
+
+    # La marca AMOLCP0000-TO-AMOLCP0001 aparece en los dos jobs, sus jobnames son los mismos objetos
+    marca_out = contenedor.get_job('AMOLCP0000').marcasout[0]
+    marca_in = contenedor.get_job('AMOLCP0001').marcasin[0]
+    assert marca_out.name is marca_in.name
+    assert marca_out.destino is marca_in.destino
+
+
+def test_atributos_sin_internar(armar_export, cadena):
+    contenedor = _contenedor(armar_export, cadena)
+    descripciones = [job.atributos['DESCRIPTION'] for job in contenedor.get_malla('CR-ARMOLDIA-T02').jobs()]
+    assert descripciones == [f'job AMOLCP{nro:04}' for nro in range(4)]
+    assert all(descripcion not in contenedor.internado for descripcion in descripciones)
+
+
+def test_tabla_no_se_copia_con_los_jobs(armar_export, cadena):
+    malla = ControlmFolder(fromstring(tostring(armar_export({'CR-ARMOLDIA-T02': cadena('AMOLCP', 2)}))))
+    job = malla.obtener_job('AMOLCP0000')
+    assert job._internado is malla.internado
+    copia = deepcopy(job)
+    assert job._internado is None and copia._internado is None
+    assert copia.variables == job.variables and copia.marcasout[0].name == job.marcasout[0].name
@@ -0,0 +1,135 @@
+"""
+Tests de las propiedades derivadas de ControlmJob (info del jobname, application y dataproc, fase), que se calculan al
+pedirlas y quedan cacheadas hasta que se modifica el job
+"""
+
+import itertools
+from xml.etree.ElementTree import Element, SubElement
+
+import pytest
+
+from controlm.structures import ControlmJob
+
+_TIPOS = 'CTPSBVWGD'
+_DATAPROCS = [None] + [
+    f"{uuaa}-{pais}-{tipo}-{subtipo}-{nombre}-01"
+    for uuaa, pais, tipo, subtipo, nombre in itertools.product(
+        ('amol', 'kdat'), ('ar', 'gl'), ('krb', 'spk', 'hmm', 'dfs', 'biz', 'sbx', 'psp', 'xyz'),
+        ('inm', 'inr', 'ins', 'in', 'inx', 'trn', 'qlt', 'rmv', 'abc'), ('tablam', 'tablar', 'tablas', 'hdfsrename', 'otra'))
+]
+_PATHS = [None, '/in/staging/x', '/data/raw/y', '/data/master/z']
+_DESCRIPCIONES = ['carga raw', 'master algo', 'de staging', 'nada']
+
+
+def _job(tipo: str = 'C', variables: dict[str, str] = None, descripcion: str = 'nada',
+         application: str = 'AMOL-AR-DATIO') -> ControlmJob:
+    elemento = Element('JOB', {'JOBNAME': f'AAMOL{tipo}P0001', 'APPLICATION': application,
+                               'SUB_APPLICATION': 'AMOL-DATIO-CCR', 'DESCRIPTION': descripcion})
+    for nombre, valor in (variables or {}).items():
+        SubElement(elemento, 'VARIABLE', {'NAME': nombre, 'VALUE': valor})
+    return ControlmJob(elemento, 'test.xml')
+
+
+def _fase_original(job: ControlmJob) -> str | None:
+    """La inferencia de fase tal cual estaba antes de la tabla reglas_fase, como referencia"""
+    fase = None
+    info = job.get_info_dataproc_id()
+    match job.tipo:
+        case 'P' | 'T':
+            fase = 'staging'
+        case 'B' | 'S':
+            if info is not None and (info['tipo'] == 'dfs' or info['subtipo'] == 'rmv'):
+                for valor in job.variables.values():
+                    if valor is None:
+                        continue
+                    if '/in/staging/' in valor:
+                        fase = 'staging'
+                        break
+                    if '/data/raw/' in valor:
+                        fase = 'raw'
+                        break
+                    if '/data/master/' in valor:
+                        fase = 'master'
+                        break
+        case 'C':
+            if info is not None:
+                if info['tipo'] in ['spk', 'biz', 'psp', 'sbx', 'hmm'] or info['nombre'] == 'hdfsrename':
+                    fase = 'master'
+                if info['tipo'] == 'krb' and info['subtipo'].startswith('in'):
+                    if info['subtipo'].endswith('m'):
+                        fase = 'master'
+                    if info['subtipo'].endswith('r'):
+                        fase = 'raw'
+                    if info['subtipo'].endswith('s'):
+                        fase = 'staging'
+                if info['tipo'] == 'krb' and info['subtipo'] == 'trn':
+                    fase = 'master'
+        case 'V':
+            if info is not None:
+                if info['tipo'] in ['spk', 'hmm'] and info['subtipo'] == 'qlt':
+                    if info['nombre'].endswith('m'):
+                        fase = 'master'
+                    if info['nombre'].endswith('r'):
+                        fase = 'raw'
+                    if info['nombre'].endswith('s'):
+                        fase = 'staging'
+                    if fase is None and (info['pais'] == 'gl' or info['uuaa'].startswith('k')):
+                        fase = 'master'
+                    if fase is None:
+                        descripcion = job.atributos.get('DESCRIPTION').lower()
+                        if 'raw' in descripcion:
+                            fase = 'raw'
+                        elif 'master' in descripcion:
+                            fase = 'master'
+                        elif 'staging' in descripcion:
+                            fase = 'staging'
+                if info['tipo'] == 'hmm' and info['subtipo'] == 'trn':
+                    fase = 'master'
+    return fase
+
+
+@pytest.mark.parametrize('tipo', _TIPOS)
+def test_reglas_fase_equivalentes_a_la_inferencia_original(tipo):
+    paths = _PATHS if tipo in 'BS' else [None]
+    descripciones = _DESCRIPCIONES if tipo == 'V' else ['nada']
+    for dataproc, path, descripcion in itertools.product(_DATAPROCS, paths, descripciones):
+        variables = {}
+        if dataproc is not None:
+            variables['%%DPID'] = dataproc
+        if path is not None:
+            variables['%%PATH'] = path
+        job = _job(tipo, variables, descripcion)
+        assert job.fase == _fase_original(job), (tipo, dataproc, path, descripcion)
+
+
+def test_info_application_y_tipo():
+    job = _job('V')
+    assert job.get_info_application() == {'uuaa': 'AMOL', 'pais': 'AR', 'app': 'DATIO'}
+    assert job.application_valida()
+    assert job.tipo == 'V'
+    assert job.get_info_jobname()['uuaa'] == 'AMOL'
+
+    invalido = _job('V', application='cualquiera')
+    assert invalido.get_info_application() is None
+    assert not invalido.application_valida()
+
+
+def test_propiedades_se_recalculan_al_modificar_variables():
+    job = _job('C', {'%%DPID': 'amol-ar-krb-inr-tabla-01'})
+    assert job.dataproc_id == 'amol-ar-krb-inr-tabla-01'
+    assert job.fase == 'raw'
+
+    job.variables['%%DPID'] = 'amol-ar-krb-inm-tabla-01'
+    assert job.dataproc_id == 'amol-ar-krb-inm-tabla-01'
+    assert job.fase == 'master'
+
+    del job.variables['%%DPID']
+    assert job.dataproc_id is None
+    assert job.fase is None
+
+
+def test_propiedades_se_recalculan_al_renombrar():
+    job = _job('C')
+    assert job.tipo == 'C'
+    job.name = 'AAMOLVP0001'
+    assert job.tipo == 'V'
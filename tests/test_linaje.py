@@ -0,0 +1,85 @@
+"""
+Tests del linaje de tablas (ControlmLinaje): productores, consumidores y fases de cada tabla, y las tablas que se
+escriben antes o despues en las cadenas, contra recorrer el digrafo con DFS
+"""
+
+import pytest
+
+from controlm.structures import ControlmContainer, ControlmLinaje
+
+
+def _contenedor(armar_export) -> ControlmContainer:
+    mol = [
+        {'jobname': 'AMOLTP0000', 'variables': {'%%TABLENAME': 't_mol_a'}},
+        {'jobname': 'AMOLCP0001', 'padres': ['AMOLTP0000'],
+         'variables': {'%%TABLE_NAME': 't_mol_a', '%%DPID': 'mol-ar-krb-inr-a-01'}},
+        {'jobname': 'AMOLVP0002', 'padres': ['AMOLCP0001'],
+         'variables': {'%%TABLENAME': 't_mol_a', '%%DPID': 'mol-ar-hmm-qlt-ar-01'}},
+        {'jobname': 'AMOLCP0003', 'padres': ['AMOLVP0002'],
+         'variables': {'%%TABLA': 't_mol_b', '%%DPID': 'mol-ar-spk-trn-b-01'}},
+        {'jobname': 'AMOLCP0004', 'variables': {'%%TABLENAME': 't_mol_suelta', '%%OTRA': 't_mol_no_es_tabla'}},
+    ]
+    ktn = [{'jobname': 'AKTNCP0000', 'padres': ['AMOLCP0003'], 'variables': {'%%TABLENAME': 't_ktn_c'}},
+           {'jobname': 'AKTNSP0001', 'padres': ['AKTNCP0000'], 'variables': {'%%TABLENAME': 't_mol_a'}}]
+    return ControlmContainer(armar_export({'CR-ARMOLDIA-T02': mol, 'CR-ARKTNDIA-T02': ktn}))
+
+
+def test_tablas_productores_y_consumidores(armar_export):
+    linaje = _contenedor(armar_export).linaje
+
+    assert linaje.tablas() == ['t_ktn_c', 't_mol_a', 't_mol_b', 't_mol_suelta']
+    assert linaje.productores['t_mol_a'] == {'AMOLTP0000', 'AMOLCP0001'}
+    assert linaje.consumidores['t_mol_a'] == {'AMOLVP0002', 'AKTNSP0001'}
+    assert linaje.fases('t_mol_a') == ['raw', 'staging']
+    assert linaje.fases('t_mol_b') == ['master']
+    assert linaje.mallas('t_mol_a') == ['CR-ARMOLDIA-T02']
+    assert linaje.mallas('t_ktn_c') == ['CR-ARKTNDIA-T02']
+    assert linaje.tablas_job('AMOLCP0004') == ['t_mol_suelta']
+
+
+def test_aguas_arriba_y_abajo(armar_export):
+    linaje = _contenedor(armar_export).linaje
+
+    assert linaje.aguas_abajo('t_mol_a') == ['t_ktn_c', 't_mol_b']
+    assert linaje.aguas_arriba('t_mol_b') == ['t_mol_a']
+    assert linaje.aguas_arriba('t_ktn_c') == ['t_mol_a', 't_mol_b']
+    assert linaje.aguas_abajo('t_ktn_c') == []
+    assert linaje.aguas_arriba('t_mol_suelta') == linaje.aguas_abajo('t_mol_suelta') == []
+    assert linaje.jobs_aguas_abajo('t_mol_b') == {'AKTNCP0000', 'AKTNSP0001'}
+    # Una tabla que ningun job declara no tiene linaje
+    assert linaje.aguas_abajo('t_mol_inexistente') == []
+    assert linaje.fases('t_mol_inexistente') == []
+
+
+@pytest.mark.parametrize('semilla', range(3))
+def test_linaje_equivalente_a_dfs(export_variado, semilla):
+    contenedor = ControlmContainer(export_variado(semilla))
+    linaje = contenedor.linaje
+    digrafo = contenedor.digrafo
+    jobs = {job.name: job for malla in contenedor.mallas for job in malla.jobs()}
+    productores = {jobname: job.tablas() for jobname, job in jobs.items()
+                   if job.jobname_valido() and job.tipo in ControlmLinaje.tipos_productores}
+
+    for tabla in linaje.tablas():
+        escriben = [jobname for jobname, tablas in productores.items() if tabla in tablas]
+        abajo = {hijo for jobname in escriben for hijo in digrafo.recorrer_cadena(jobname)[1:]}
+        abajo |= {jobname for jobname in escriben if jobname in digrafo.descendientes(jobname)}
+        arriba = {padre for jobname in escriben for padre in digrafo.recorrer_cadena_inversa(jobname)[1:]}
+        arriba |= {jobname for jobname in escriben if jobname in digrafo.ancestros(jobname)}
+        leen = {jobname for jobname, job in jobs.items() if tabla in job.tablas() and jobname not in productores}
+
+        assert linaje.jobs_aguas_abajo(tabla) == abajo | leen
+        assert linaje.jobs_aguas_arriba(tabla) == arriba
+        assert linaje.aguas_abajo(tabla) == sorted({t for j in abajo | leen for t in productores.get(j, ())} - {tabla})
+        assert linaje.aguas_arriba(tabla) == sorted({t for j in arriba for t in productores.get(j, ())} - {tabla})
+
+
+def test_linaje_con_y_sin_indice_de_jobs(export_variado):
+    contenedor = ControlmContainer(export_variado(0))
+    sin_indice = contenedor.linaje
+    con_indice = ControlmLinaje(contenedor._jobs, contenedor.digrafo, contenedor.indice_jobs)
+
+    assert con_indice.productores == sin_indice.productores
+    assert con_indice.consumidores == sin_indice.consumidores
+    assert [con_indice.aguas_abajo(tabla) for tabla in con_indice.tablas()] == [
+        sin_indice.aguas_abajo(tabla) for tabla in sin_indice.tablas()]
@@ -0,0 +1,83 @@
+"""
+Tests del indice de marcas del contenedor (ControlmIndiceMarcas) y de validaciones.global_marcas, que se apoya en él
+"""
+
+from controlm.structures import ControlmContainer, ControlmIndiceMarcas
+from controlm.validaciones import global_marcas
+
+
+def _mallas(cadena) -> dict[str, list[dict]]:
+    mol = cadena('AMOLCP', 3)
+    # Marca entre mallas, la agrega AMOLCP0002 y la espera y elimina AKTNCP0000
+    mol[2]['outcond'] = [('AMOLCP0002-TO-AKTNCP0000', '+')]
+    # Misma marca por OUTCOND y por DOCOND, se indexa una sola vez
+    mol[0]['outcond'] = [('AMOLCP0000-TO-AMOLCP0001', '+')]
+    mol[0]['on'] = {'OK': [('DOCOND', {'NAME': 'AMOLCP0000-TO-AMOLCP0001', 'ODATE': 'ODAT', 'SIGN': '+'})]}
+
+    ktn = cadena('AKTNCP', 2)
+    ktn[0]['incond'] = ['AMOLCP0002-TO-AKTNCP0000']
+    ktn[0]['outcond'] = [('AMOLCP0002-TO-AKTNCP0000', '-'),
+                         ('AKTNCP0000-TO-AZZZCP0000', '+')]  # Nadie la espera ni la elimina
+    ktn[1]['incond'] = ['AXXXCP0000-TO-AKTNCP0001']  # Nadie la agrega
+    ktn[1]['outcond'] = [('COMPARTIDA', '+')]
+    mol[1]['outcond'] = [('COMPARTIDA', '+')]
+    mol[2]['incond'] = ['COMPARTIDA']
+    mol[2]['outcond'].append(('COMPARTIDA', '-'))
+    return {'CR-ARMOLDIA-T02': mol, 'CR-ARKTNDIA-T02': ktn}
+
+
+def _indice_por_fuerza_bruta(contenedor: ControlmContainer) -> tuple[dict, dict, dict]:
+    """Las mismas consultas que el indice, recorriendo todos los jobs por cada marca"""
+    jobs = [job for malla in contenedor.mallas for job in malla.jobs()]
+    marcas = {marca.name for job in jobs for marca in job.marcasin + job.marcasout}
+    agregan, eliminan, esperan = {}, {}, {}
+    for marca in marcas:
+        for indice, jobnames in (
+            (agregan, [job.name for job in jobs if any(m.name == marca and m.signo == '+' for m in job.marcasout)]),
+            (eliminan, [job.name for job in jobs if any(m.name == marca and m.signo == '-' for m in job.marcasout)]),
+            (esperan, [job.name for job in jobs if any(m.name == marca for m in job.marcasin)]),
+        ):
+            if jobnames:
+                indice[marca] = jobnames
+    return agregan, eliminan, esperan
+
+
+def test_indice_equivalente_a_recorrer_los_jobs(armar_export, cadena):
+    contenedor = ControlmContainer(armar_export(_mallas(cadena)))
+    agregan, eliminan, esperan = _indice_por_fuerza_bruta(contenedor)
+    indice = contenedor.indice_marcas
+
+    assert indice.agregan == agregan
+    assert indice.eliminan == eliminan
+    assert indice.esperan == esperan
+    assert indice.marcas() == agregan.keys() | eliminan.keys() | esperan.keys()
+    assert indice.agregan['AMOLCP0000-TO-AMOLCP0001'] == ['AMOLCP0000']
+
+
+def test_consultas_del_indice(armar_export, cadena):
+    indice = ControlmContainer(armar_export(_mallas(cadena))).indice_marcas
+
+    assert indice.huerfanas() == {'AXXXCP0000-TO-AKTNCP0001': ['AKTNCP0001']}
+    assert indice.no_consumidas() == {'AKTNCP0000-TO-AZZZCP0000': ['AKTNCP0000']}
+    assert indice.no_eliminadas() == {'AKTNCP0000-TO-AZZZCP0000': ['AKTNCP0000']}
+    assert indice.multiples_productores() == {'COMPARTIDA': ['AMOLCP0001', 'AKTNCP0001']}
+
+
+def test_indice_incremental(armar_export, cadena):
+    contenedor = ControlmContainer(armar_export(_mallas(cadena)))
+    indice = ControlmIndiceMarcas()
+    for malla in contenedor.mallas:
+        for job in malla.jobs():
+            indice.agregar_job(job)
+    assert indice.agregan == contenedor.indice_marcas.agregan
+    assert indice.esperan == contenedor.indice_marcas.esperan
+
+
+def test_global_marcas(armar_export, cadena):
+    contenedor = ControlmContainer(armar_export(_mallas(cadena)))
+    cr = global_marcas(contenedor)
+
+    assert any('AXXXCP0000-TO-AKTNCP0001' in item for item in cr.info['AKTNCP0001'])
+    assert any('no es esperada' in item for item in cr.info['AKTNCP0000'])
+    assert any("['CR-ARKTNDIA-T02', 'CR-ARMOLDIA-T02']" in item for item in cr.info['AMOLCP0001'])
+    assert 'AMOLCP0000' not in cr.info
@@ -0,0 +1,38 @@
+"""
+Tests del simulador de ejecucion (Simulador): jobs que se vuelven a ordenar a sí mismos
+"""
+
+import pytest
+
+from controlm.simulacion import Simulador
+from controlm.structures import ControlmContainer
+
+
+@pytest.fixture
+def jobs(armar_export, cadena):
+    # El segundo job se reintenta a sí mismo cada vez que finaliza NOTOK
+    mol = cadena('AMOLCP', 3)
+    mol[1]['on'] = {'NOTOK': [('DOFORCEJOB', {'TABLE_NAME': 'CR-ARMOLDIA-T02', 'NAME': 'AMOLCP0001', 'ODATE': 'ODAT'})]}
+    return ControlmContainer(armar_export({'CR-ARMOLDIA-T02': mol})).mallas[0].jobs()
+
+
+def test_reintento_que_siempre_falla_llega_al_limite(jobs, capsys):
+    resultado = Simulador(jobs, retornos={'AMOLCP0001': 1}, max_ordenes_por_job=5).simular()
+
+    assert [jobname for jobname, *_ in resultado.ejecuciones] == ['AMOLCP0000'] + ['AMOLCP0001'] * 5
+    assert resultado.limitados == ['AMOLCP0001']
+    assert resultado.bloqueados == {('AMOLCP0002', '00000000'): ['AMOLCP0001-TO-AMOLCP0002']}
+    assert 'WARNING' in capsys.readouterr().out
+    assert 'limite de ordenes' in str(resultado)
+
+
+def test_reintento_sin_fallos(jobs):
+    resultado = Simulador(jobs, max_ordenes_por_job=1).simular()
+
+    assert [jobname for jobname, *_ in resultado.ejecuciones] == ['AMOLCP0000', 'AMOLCP0001', 'AMOLCP0002']
+    assert resultado.limitados == []
+
+
+def test_limite_invalido(jobs):
+    with pytest.raises(ValueError, match='mayor a 0'):
+        Simulador(jobs, max_ordenes_por_job=0)
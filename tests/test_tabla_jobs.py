@@ -0,0 +1,86 @@
+"""
+Tests de la tabla columnar de jobs del contenedor (ControlmTablaJobs): sus columnas y agregaciones tienen que dar lo
+mismo que recorrer los jobs y pedirles cada campo
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from controlm.structures import ControlmContainer, ControlmJob
+
+
+def _campos(job: ControlmJob, malla: str) -> dict:
+    """Los campos de la tabla, pedidos directamente al job"""
+    info = job.get_info_jobname()
+    info_dataproc = job.get_info_dataproc_id()
+    return {
+        'malla': malla,
+        'tipo': info['tipo'] if info else None,
+        'periodicidad': info['periodicidad'] if info else None,
+        'fase': job.fase if info else None,
+        'ruta_critica': job.es_ruta_critica(),
+        'uuaa': info['uuaa'] if info else None,
+        'dataproc_tipo': info_dataproc['tipo'] if info_dataproc else None,
+        'dataproc_subtipo': info_dataproc['subtipo'] if info_dataproc else None,
+    }
+
+
+@pytest.fixture(params=range(3))
+def contenedor(request, export_variado):
+    return ControlmContainer(export_variado(request.param))
+
+
+def _campos_jobs(contenedor: ControlmContainer) -> dict[str, dict]:
+    return {job.name: _campos(job, malla.name) for malla in contenedor.mallas for job in malla.jobs()}
+
+
+def test_columnas_equivalentes_a_los_jobs(contenedor):
+    tabla = contenedor.tabla_jobs
+    campos = _campos_jobs(contenedor)
+
+    assert len(tabla) == len(campos)
+    for jobname, campos_job in campos.items():
+        for columna in tabla.columnas:
+            assert tabla.valor(columna, jobname) == campos_job[columna], (jobname, columna)
+    assert tabla.columna('tipo').typecode == 'B'
+
+
+def test_contar_equivalente_a_recorrer_los_jobs(contenedor):
+    tabla = contenedor.tabla_jobs
+    campos = _campos_jobs(contenedor)
+    azar = random.Random(0)
+
+    for agrupar_por in (('tipo',), ('tipo', 'fase'), ('malla', 'ruta_critica', 'dataproc_tipo'), tabla.columnas):
+        esperado = Counter(tuple(campos_job[columna] for columna in agrupar_por) for campos_job in campos.values())
+        assert tabla.contar(agrupar_por) == esperado
+
+        for cantidad in (0, 1, 2, 10):
+            jobnames = azar.sample(sorted(campos), cantidad)
+            esperado = Counter(tuple(campos[jobname][columna] for columna in agrupar_por) for jobname in jobnames)
+            assert tabla.contar(agrupar_por, tabla.ids_jobs(jobnames)) == esperado
+
+
+def test_contar_por_cadena(contenedor):
+    tabla = contenedor.tabla_jobs
+    for cadena in contenedor.digrafo.obtener_arboles():
+        esperado = Counter((contenedor.get_job(jobname).tipo, contenedor.get_job(jobname).fase) for jobname in cadena
+                           if contenedor.get_job(jobname).jobname_valido())
+        conteo = tabla.contar(('tipo', 'fase'), tabla.ids_jobs(cadena))
+        conteo.pop((None, None), None)  # Jobname invalido
+        assert conteo == esperado
+
+
+def test_filtrar_y_codigos(contenedor):
+    tabla = contenedor.tabla_jobs
+    campos = _campos_jobs(contenedor)
+
+    ingestas = tabla.filtrar('tipo', ['T', 'P', 'C', 'inexistente'])
+    assert sorted(tabla.jobnames[fila] for fila in ingestas) == sorted(
+        jobname for jobname, campos_job in campos.items() if campos_job['tipo'] in ('T', 'P', 'C'))
+    ruta_critica = tabla.filtrar('ruta_critica', [True], ingestas)
+    assert all(campos[tabla.jobnames[fila]]['ruta_critica'] for fila in ruta_critica)
+    assert tabla.codigo('tipo', 'inexistente') is None
+    assert tabla.valores['tipo'][tabla.codigo('tipo', 'C')] == 'C'
+    assert tabla.ids_jobs(['AXXXCP0000']) == []
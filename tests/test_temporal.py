@@ -0,0 +1,248 @@
+"""
+Tests de la generacion de temporales (MallaMaxi): la temporal generada se valida en memoria con tmp_enlaces y se
+simula su ejecucion para ver en qué orden corre cada ODATE
+"""
+
+import os
+
+import pytest
+
+from controlm.record import RecorderTmp
+from controlm.simulacion import simular_temporal
+from controlm.constantes import RECURSO_TEMPORALES
+from controlm.structures import ControlmContainer, MallaMaxi, ReglasAmbientacion
+from controlm.validaciones import tmp_enlaces
+
+FOLDER_TMP = 'CR-ARMOLTMP-T11'
+ODATES = ['2024-10-14', '2024-10-15', '2024-10-17']
+
+
+@pytest.fixture
+def malla_origen(armar_export, cadena):
+    return ControlmContainer(armar_export({'CR-ARMOLDIA-T02': cadena('AMOLCP', 4, recursos=['ARD'])})).mallas[0]
+
+
+def _malla_maxi(malla_origen, reglas: ReglasAmbientacion = None) -> MallaMaxi:
+    malla_maxi = MallaMaxi(malla_origen.jobs(), malla_origen, reglas_ambientacion=reglas)
+    malla_maxi.ordenar()
+    return malla_maxi
+
+
+def _errores_enlaces(malla_maxi: MallaMaxi) -> dict[str, list[str]]:
+    recorder = RecorderTmp()
+    tmp_enlaces(malla_maxi, recorder)
+    return {clave: items for clave, items in recorder.info.items() if items}
+
+
+def _inicios_raiz(malla_maxi: MallaMaxi, resultado) -> dict[str, float]:
+    raiz = malla_maxi.cadena_completa_temporal[1].name
+    return {odate: inicio for jobname, odate, inicio, _, _ in resultado.ejecuciones if jobname == raiz}
+
+
+@pytest.mark.parametrize('max_jobs', [None, 3])
+def test_iterar_de_a_un_odate(malla_origen, tmp_path, max_jobs):
+    malla_maxi = _malla_maxi(malla_origen)
+    malla_maxi.replicar_iterando_odates(ODATES)
+    malla_maxi.ambientar('a@bbva.com', FOLDER_TMP, 'caso', 'X123', False)
+    if max_jobs is not None:
+        malla_maxi.particionar(max_jobs)
+
+    # Iterador + cadena + un job por cada ODATE luego del primero
+    assert len(malla_maxi.cadena_completa_temporal) == 1 + 4 + 2
+    assert _errores_enlaces(malla_maxi) == {}
+
+    resultado = simular_temporal(malla_maxi)
+    assert resultado.bloqueados == {}
+    fines = resultado.fin_por_odate
+    inicios = _inicios_raiz(malla_maxi, resultado)
+    odates = [odate.replace('-', '') for odate in ODATES]
+    assert list(inicios) == odates
+    # Cada ODATE arranca recién cuando terminó el anterior
+    for anterior, odate in zip(odates, odates[1:]):
+        assert inicios[odate] >= fines[anterior]
+
+    paths = malla_maxi.exportar(str(tmp_path / f'{FOLDER_TMP}.xml'))
+    contenido = ''.join(open(path, encoding='utf-8').read() for path in paths)
+    assert f'NAME="{malla_maxi.marca_iteracion}" ODATE="1014"' in contenido
+    assert f'NAME="{malla_maxi.marca_iteracion}" ODATE="1015"' in contenido
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_iterar_odates_en_paralelo(malla_origen):
+    malla_maxi = _malla_maxi(malla_origen)
+    malla_maxi.replicar_iterando_odates(ODATES, concurrente=True)
+    malla_maxi.ambientar('a@bbva.com', FOLDER_TMP, 'caso', 'X123', False)
+
+    assert len(malla_maxi.cadena_completa_temporal) == 1 + 4
+    assert malla_maxi.marca_iteracion is None
+    assert _errores_enlaces(malla_maxi) == {}
+    inicios = _inicios_raiz(malla_maxi, simular_temporal(malla_maxi))
+    assert set(inicios.values()) == {0.0}
+
+
+def test_iterar_un_solo_odate(malla_origen):
+    malla_maxi = _malla_maxi(malla_origen)
+    malla_maxi.replicar_iterando_odates(ODATES[:1])
+    malla_maxi.ambientar('a@bbva.com', FOLDER_TMP, 'caso', 'X123', False)
+
+    assert len(malla_maxi.cadena_completa_temporal) == 1 + 4
+    assert _errores_enlaces(malla_maxi) == {}
+
+
+@pytest.mark.parametrize('concurrente', [False, True])
+def test_iterar_odates_con_el_mismo_dia(malla_origen, concurrente):
+    # Las marcas de control-M no tienen año, las de ambos ODATES se pisarían
+    with pytest.raises(Exception, match='repiten dia y mes'):
+        _malla_maxi(malla_origen).replicar_iterando_odates(['2024-10-14', '2025-10-14'], concurrente)
+
+
+def _recursos(malla_maxi: MallaMaxi) -> set[tuple[str, ...]]:
+    return {tuple(recurso.name for recurso in job.recursos_cuantitativos) for job in malla_maxi.cadena_completa_temporal}
+
+
+@pytest.mark.parametrize('forzar', [False, True])
+def test_carriles_con_recurso_de_temporales(malla_origen, forzar):
+    # Aunque las reglas no asignen ARD-TMP, los jobs de los carriles lo llevan
+    reglas = ReglasAmbientacion({'recursos_cuantitativos': ['ARD']})
+    malla_maxi = _malla_maxi(malla_origen, reglas)
+    malla_maxi.replicar_y_enlazar(ODATES, carriles=2)
+    malla_maxi.ambientar('a@bbva.com', FOLDER_TMP, 'caso', 'X123', forzar)
+
+    assert malla_maxi.es_paralela()
+    assert _recursos(malla_maxi) == {('ARD', RECURSO_TEMPORALES)}
+    assert _errores_enlaces(malla_maxi) == {}
+
+    # Los dos primeros ODATES arrancan juntos solamente si hay 2 unidades de ARD-TMP
+    raices = {job.name for job in malla_maxi.cadena_completa_temporal[::len(malla_maxi.cadena_primordial)]}
+    for capacidad, juntos in ((1, False), (2, True)):
+        resultado = simular_temporal(malla_maxi, {RECURSO_TEMPORALES: capacidad})
+        assert resultado.bloqueados == {}
+        inicios = [inicio for jobname, _, inicio, _, _ in resultado.ejecuciones if jobname in raices]
+        assert (inicios[0] == inicios[1]) == juntos
+        assert inicios[2] > inicios[1]
+
+def test_linea_sin_recurso_de_temporales(malla_origen):
+    # En una sola linea corre un job a la vez, se respetan las reglas
+    malla_maxi = _malla_maxi(malla_origen, ReglasAmbientacion({'recursos_cuantitativos': ['ARD']}))
+    malla_maxi.replicar_y_enlazar(ODATES)
+    malla_maxi.ambientar('a@bbva.com', FOLDER_TMP, 'caso', 'X123', False)
+
+    assert not malla_maxi.es_paralela()
+    assert _recursos(malla_maxi) == {('ARD',)}
+
+
+def _normalizada(malla_maxi: MallaMaxi) -> list:
+    """
+    La temporal con cada jobname reemplazado por (job original, ODATE), para comparar temporales cuyos jobnames se
+    asignaron en otro orden
+    """
+    cadena = malla_maxi.cadena_completa_temporal
+    nombres = {job.name: f'{job.jobname_plantilla}@{job.odate}' for job in cadena}
+    carpetas = {nombre: f'carpeta{nro}' for nro, (nombre, _) in enumerate(malla_maxi.particiones or [])}
+
+    def reemplazar(texto: str) -> str:
+        if texto in carpetas:
+            return carpetas[texto]
+        return '-TO-'.join(nombres.get(parte, parte) for parte in texto.split('-TO-'))
+
+    return [(
+        nombres[job.name],
+        {clave: reemplazar(valor) for clave, valor in job.atributos.items() if clave != 'JOBNAME'},
+        job.variables,
+        [recurso.name for recurso in job.recursos_cuantitativos],
+        [(marca.name and reemplazar(marca.name), marca.odate) for marca in job.marcasin or []],
+        [(reemplazar(marca.name), marca.odate, marca.signo) for marca in job.marcasout or []],
+        {codigo: [(accion.id, {clave: reemplazar(valor) for clave, valor in accion.attrs.items()}) for accion in acciones]
+         for codigo, acciones in job.onconditions.items()},
+    ) for job in cadena]
+
+
+@pytest.mark.parametrize('forzar', [False, True])
+@pytest.mark.parametrize('max_jobs', [None, 5])
+def test_actualizar_equivalente_a_generar_de_nuevo(armar_export, cadena, forzar, max_jobs):
+    jobs = cadena('AMOLCP', 6, recursos=['ARD'], variables={'%%FECHA': 'f=%%$ODATE', '%%MAIL': 'x@bbva.com'})
+    malla_origen = ControlmContainer(armar_export({'CR-ARMOLDIA-T02': jobs})).mallas[0]
+    todos = malla_origen.jobs()
+
+    def generar(seleccion, odates) -> MallaMaxi:
+        malla_maxi = MallaMaxi(seleccion, malla_origen)
+        malla_maxi.ordenar()
+        malla_maxi.replicar_y_enlazar(odates)
+        malla_maxi.ambientar('a@bbva.com', FOLDER_TMP, 'caso', 'X123', forzar)
+        if max_jobs is not None:
+            malla_maxi.particionar(max_jobs)
+        return malla_maxi
+
+    malla_maxi = generar(todos[:4], ['2024-10-01', '2024-10-02', '2024-10-03'])
+    for seleccion, odates in (
+        (todos[1:], ['2024-10-01', '2024-10-03', '2024-10-04']),  # Cambian jobs y ODATES a la vez
+        (todos[1:], ['2024-09-30', '2024-10-01', '2024-10-03', '2024-10-04']),  # ODATE agregado al comienzo
+        (todos[:2], ['2024-10-03']),
+    ):
+        assert malla_maxi.admite_actualizacion(malla_origen, 'a@bbva.com', 'caso', 'X123', forzar)
+        malla_maxi.actualizar(seleccion, odates)
+
+        regenerada = generar(seleccion, odates)
+        assert _normalizada(malla_maxi) == _normalizada(regenerada)
+        assert [len(jobs) for _, jobs in malla_maxi.particiones or []] == [
+            len(jobs) for _, jobs in regenerada.particiones or []]
+        assert _errores_enlaces(malla_maxi) == {}
+
+
+@pytest.mark.parametrize('generar', [
+    lambda malla_maxi: malla_maxi.replicar_y_enlazar(ODATES, carriles=2),
+    lambda malla_maxi: malla_maxi.replicar_iterando_odates(ODATES),
+])
+def test_actualizar_solo_la_linea_unica(malla_origen, generar):
+    malla_maxi = _malla_maxi(malla_origen)
+    generar(malla_maxi)
+    malla_maxi.ambientar('a@bbva.com', FOLDER_TMP, 'caso', 'X123', True)
+
+    assert not malla_maxi.admite_actualizacion(malla_origen, 'a@bbva.com', 'caso', 'X123', True)
+    with pytest.raises(Exception, match='sin carriles ni iterando'):
+        malla_maxi.actualizar(malla_origen.jobs(), ODATES[:1])
+
+
+@pytest.mark.parametrize('generar', [
+    lambda malla_maxi: malla_maxi.replicar_y_enlazar(ODATES),
+    lambda malla_maxi: malla_maxi.replicar_y_enlazar(ODATES, carriles=2),
+    lambda malla_maxi: malla_maxi.replicar_iterando_odates(ODATES),
+])
+def test_particionar_apunta_los_force_a_la_carpeta_del_job(malla_origen, tmp_path, generar):
+    malla_maxi = _malla_maxi(malla_origen)
+    generar(malla_maxi)
+    malla_maxi.ambientar('a@bbva.com', FOLDER_TMP, 'caso', 'X123', True)
+    malla_maxi.particionar(3, carpetas_ocupadas={'CR-ARMOLTMP-T12'})
+
+    nombres = [nombre for nombre, _ in malla_maxi.particiones]
+    assert nombres[:3] == [FOLDER_TMP, 'CR-ARMOLTMP-T13', 'CR-ARMOLTMP-T14']
+    assert [job for _, jobs in malla_maxi.particiones for job in jobs] == malla_maxi.cadena_completa_temporal
+    assert all(len(jobs) <= 3 for _, jobs in malla_maxi.particiones)
+
+    carpeta_job = {job.name: nombre for nombre, jobs in malla_maxi.particiones for job in jobs}
+    forzados = 0
+    for job in malla_maxi.cadena_completa_temporal:
+        assert job.atributos['PARENT_FOLDER'] == carpeta_job[job.name]
+        for accion in job.onconditions['OK']:
+            if accion.id == 'DOFORCEJOB':
+                assert accion.attrs['TABLE_NAME'] == carpeta_job[accion.attrs['NAME']]
+                forzados += carpeta_job[accion.attrs['NAME']] != carpeta_job[job.name]
+    assert forzados >= len(nombres) - 1  # Cada carpeta la ordena un job de otra
+    assert _errores_enlaces(malla_maxi) == {}
+    assert simular_temporal(malla_maxi).bloqueados == {}
+
+    paths = malla_maxi.exportar(str(tmp_path / f'{FOLDER_TMP}.xml'))
+    assert [os.path.basename(path) for path in paths] == [f'{nombre}.xml' for nombre in nombres]
+
+
+def test_nombres_particiones():
+    assert MallaMaxi._nombres_particiones('CR-ARMOLTMP-T98', 5, {'CR-ARMOLTMP-T00'}) == [
+        'CR-ARMOLTMP-T98', 'CR-ARMOLTMP-T99', 'CR-ARMOLTMP-T01', 'CR-ARMOLTMP-T03', 'CR-ARMOLTMP-T04']
+    # Agotados los numeros de la T se sigue con la K
+    ocupados = {f'CR-ARMOLTMP-T{nro:02}' for nro in range(100)}
+    assert MallaMaxi._nombres_particiones('CR-ARMOLTMP-T50', 3, ocupados) == [
+        'CR-ARMOLTMP-T50', 'CR-ARMOLTMP-K00', 'CR-ARMOLTMP-K01']
+    with pytest.raises(Exception, match='No alcanzan'):
+        MallaMaxi._nombres_particiones('CR-ARMOLTMP-X50', 101)
+    with pytest.raises(Exception, match='dos digitos'):
+        MallaMaxi._nombres_particiones('CR-ARMOLTMP-T5', 2)
@@ -0,0 +1,41 @@
+"""
+Tests de utils.AsignadorJobnames: orden de los sufijos, prefijos independientes y reserva en bloque
+"""
+
+import pytest
+
+from controlm.utils import AsignadorJobnames
+
+
+def test_sufijos_en_orden_y_salteando_ocupados():
+    asignador = AsignadorJobnames(['AMOLCP9000', 'AMOLCP9002'])
+    assert asignador.reservar(['AMOLCP9'] * 3) == ['AMOLCP9001', 'AMOLCP9003', 'AMOLCP9004']
+    assert asignador.obtener_jobname('AMOLCP9') == 'AMOLCP9005'
+
+
+def test_prefijos_independientes():
+    asignador = AsignadorJobnames()
+    assert asignador.reservar(['AMOLCP9', 'AMOLTP9', 'AMOLCP9']) == ['AMOLCP9000', 'AMOLTP9000', 'AMOLCP9001']
+    assert asignador.obtener_jobname('AMOLVP9') == 'AMOLVP9000'
+
+
+def test_reserva_sin_sufijos_no_asigna_nada():
+    asignador = AsignadorJobnames()
+    asignador.agregar_ocupados(f'AMOLTP9{sufijo}' for sufijo in AsignadorJobnames._generar_sufijos())
+    ocupados = set(asignador.ocupados)
+    with pytest.raises(Exception):
+        asignador.reservar(['AMOLCP9', 'AMOLTP9'])
+    assert asignador.ocupados == ocupados
+    assert asignador.obtener_jobname('AMOLCP9') == 'AMOLCP9000'
+
+
+def test_registro(tmp_path):
+    registro = tmp_path / 'jobnames.txt'
+    asignador = AsignadorJobnames()
+    asignador.cargar_registro(str(registro))
+    asignador.reservar(['AMOLCP9', 'AMOLCP9'])
+    asignador.guardar_registro(str(registro))
+
+    otro = AsignadorJobnames()
+    otro.cargar_registro(str(registro))
+    assert otro.obtener_jobname('AMOLCP9') == 'AMOLCP9002'
@@ -0,0 +1,110 @@
+"""
+Tests de la validacion en memoria de las temporales (validaciones.tmp_enlaces y tmp_parametros sobre
+MallaMaxi.vistas): las temporales que genera MallaMaxi no tienen errores, y cada error que se introduce se informa
+"""
+
+import pytest
+
+from controlm.record import RecorderTmp
+from controlm.structures import ControlmContainer, MallaMaxi
+from controlm.validaciones import tmp_enlaces, tmp_parametros
+
+ODATES = ['2024-10-14', '2024-10-15']
+
+
+@pytest.fixture
+def malla_origen(armar_export, cadena):
+    jobs = cadena('AMOLCP', 4, recursos=['ARD'], variables={'%%FECHA': '%%$ODATE'})
+    return ControlmContainer(armar_export({'CR-ARMOLDIA-T02': jobs})).mallas[0]
+
+
+def _generar(malla_origen, forzar: bool, modo: str = 'linea', max_jobs: int = None) -> MallaMaxi:
+    malla_maxi = MallaMaxi(malla_origen.jobs(), malla_origen)
+    malla_maxi.ordenar()
+    if modo == 'linea':
+        malla_maxi.replicar_y_enlazar(ODATES)
+    elif modo == 'carriles':
+        malla_maxi.replicar_y_enlazar(ODATES + ['2024-10-16'], carriles=2)
+    else:
+        malla_maxi.replicar_iterando_odates(ODATES, concurrente=modo == 'iterar_concurrente')
+    malla_maxi.ambientar('a@bbva.com', 'CR-ARMOLTMP-T11', 'caso', 'X123', forzar)
+    if max_jobs is not None:
+        malla_maxi.particionar(max_jobs)
+    return malla_maxi
+
+
+def _validar(malla_maxi: MallaMaxi) -> RecorderTmp:
+    recorder = RecorderTmp()
+    for vista in malla_maxi.vistas():
+        tmp_parametros(vista, recorder)
+    tmp_enlaces(malla_maxi, recorder)
+    return recorder
+
+
+@pytest.mark.parametrize('modo', ['linea', 'carriles', 'iterar', 'iterar_concurrente'])
+@pytest.mark.parametrize('forzar', [False, True])
+@pytest.mark.parametrize('max_jobs', [None, 3])
+def test_temporales_generadas_sin_errores(malla_origen, modo, forzar, max_jobs):
+    recorder = _validar(_generar(malla_origen, forzar, modo, max_jobs))
+    assert not recorder.hay_errores(), recorder.info
+
+
+def _acciones(job, accion_id: str) -> list:
+    return [accion for accion in job.onconditions['OK'] if accion.id == accion_id]
+
+
+def _renombrar_marca(cadena, index: int):
+    job = cadena[index]
+    anterior = cadena[index - 1]
+    for marca in [*job.marcasin, *job.marcasout, *anterior.marcasout]:
+        if marca.destino == job.name:
+            marca.name = f'OTRA-TO-{job.name}'
+
+
+def _cambiar_odates(cadena, odate: str, desde: int = 0, hasta: int = None):
+    for job in cadena[desde:hasta]:
+        job.odate = odate
+
+
+ROTURAS = {
+    'jobname repetido': (False, lambda c: setattr(c[3], 'name', c[2].name), 'GENERAL', 'están repetidos'),
+    'jobname de la malla origen': (False, lambda c: setattr(c[0], 'name', 'AMOLCP0000'), 'GENERAL', 'ya existen en la malla origen'),
+    'marca que nadie espera': (False, lambda c: setattr(c[5], 'marcasin', None), None, 'que no espera ningun job'),
+    'marca que nadie agrega': (False, lambda c: c[4].marcasout.pop(0), None, 'que no agrega ningun job'),
+    'marca sin eliminar': (False, lambda c: c[5].marcasout.pop(), None, 'No elimina la marca'),
+    'marca sin formato': (False, lambda c: _renombrar_marca(c, 5), None, 'no respeta el formato ORIGEN-TO-DESTINO'),
+    'force a un job inexistente': (True, lambda c: _acciones(c[2], 'DOFORCEJOB')[0].attrs.update(NAME='AMOLCP9999'), None, 'que no existe en la temporal'),
+    'force a otra carpeta': (True, lambda c: _acciones(c[2], 'DOFORCEJOB')[0].attrs.update(TABLE_NAME='CR-ARMOLTMP-T12'), None, 'pero se encuentra en'),
+    'dos cadenas sueltas': (False, lambda c: (setattr(c[4], 'marcasin', None), c[3].marcasout.pop(0)), 'GENERAL', 'un solo job inicial'),
+    'odate invalido': (False, lambda c: setattr(c[5], 'odate', '20241301'), None, 'no es una fecha valida'),
+    'odate no seleccionado': (False, lambda c: _cambiar_odates(c, '20241016', 4), None, 'no es uno de los seleccionados'),
+    'odate sin reemplazar': (False, lambda c: c[1].variables.update({'%%OTRA': 'x%%$ODATE'}), None, 'no tiene el ODATE'),
+    'odates desordenados': (False, lambda c: (_cambiar_odates(c, '20241015', 0, 4), _cambiar_odates(c, '20241014', 4)), 'GENERAL', 'no respetan el orden'),
+}
+
+
+@pytest.mark.parametrize('forzar, romper, clave, mensaje', ROTURAS.values(), ids=ROTURAS.keys())
+def test_temporal_rota(malla_origen, forzar, romper, clave, mensaje):
+    malla_maxi = _generar(malla_origen, forzar)
+    cadena = malla_maxi.cadena_completa_temporal
+    jobnames = [job.name for job in cadena]
+    romper(cadena)
+
+    recorder = _validar(malla_maxi)
+    assert recorder.hay_errores()
+    informados = [(clave_info, item) for clave_info, items in recorder.info.items() for item in items]
+    encontrados = [clave_info for clave_info, item in informados if mensaje in item]
+    assert encontrados, recorder.info
+    if clave is not None:
+        assert clave in encontrados
+    else:
+        assert set(encontrados) <= set(jobnames) | {job.name for job in cadena}  # Se informa en el job
+
+
+def test_carpeta_con_atributos_incorrectos(malla_origen):
+    malla_maxi = _generar(malla_origen, False, max_jobs=3)
+    malla_maxi.atributos_carpeta = dict(MallaMaxi.atributos_carpeta, FOLDER_ORDER_METHOD='SYSTEM', DATACENTER='OTRO')
+
+    generales = ''.join(_validar(malla_maxi).info['GENERAL'])
+    assert generales.count("El 'ORDER METHOD' de la malla no es el correcto") == len(malla_maxi.particiones)
+    assert generales.count("El servidor no es el correcto") == len(malla_maxi.particiones)